@@ -2,8 +2,11 @@
 
 import itertools
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 import copy
 from typing import Union, Optional, List
+
+import numpy as np
 # from abc import ABC, abstractmethod
 
 from pymatgen.core.structure import Structure
@@ -12,7 +15,11 @@ from cuivesta.template.vesta.sbond_default_dict import sbond_default_dict
 # from cuivesta.template.vesta.sbond_middle_dict import sbond_middle_dict
 # from cuivesta.template.vesta.sbond_large_dict import sbond_large_dict
 from cuivesta.utils.func_tools import (val_to_str_line,
+                                       val_to_str_lines,
                                        structure_to_dict_for_vesta)
+from cuivesta.utils.vector_set import VectorSet
+from cuivesta.utils.neighbors import species_pairs_within
+from cuivesta.utils.bond_cutoffs import inferred_sbond_lines
 from cuivesta.options import actual_options
 
 
@@ -23,23 +30,41 @@ def replace_dummy_to_xx(target_str: str) -> str:
 class VestaFile:
     """construct VESTA file object and from pymatgen Structure instance"""
 
+    block_order = ("title", "cellp", "struc", "boundary", "sbond",
+                   "vectr", "vectt", "splan", "style")
+
     def __init__(self, structure: Structure,
                  visible_bond: set = None,
-                 vectors: dict = None,
+                 vectors: Union[VectorSet, dict] = None,
                  boundary: Optional[Union[list, tuple]] = None,
                  planes: list = None,
-                 styles: dict = None):
+                 styles: dict = None,
+                 vector_styles: Optional[list] = None,
+                 prune_bonds: bool = False,
+                 infer_bonds: bool = False,
+                 bond_cache: Optional[str] = None,
+                 polyhedra: Optional[list] = None):
         """
         Args:
             structure: pymatgen Structure instance
             visible_bond: e.g., {('Ba', 'O'), ('Ti', 'O')}
                           if None is set, sbond_default_dict will be used
-            vectors: e.g., {1: [[x.xx], [x.xx], [x.xx]], 2:[[x.xx], ..], ..}
+            vectors: VectorSet or dict of site index and vector
+                     e.g., {1: [[x.xx], [x.xx], [x.xx]], 2:[[x.xx], ..], ..}
             boundary: control range of plot
                       e.g., "-0.5 0.5 -0.5 0.5 -0.5 0.5" means center to origin
             styles: control options such as radii of element
+            vector_styles: (size, color) of shared vector types
+                           when vectors have types (see VectorSet.types)
+            prune_bonds: write only bond pairs found within their max length
+            infer_bonds: infer max length of pairs missing from
+                         sbond_default_dict from the structure
+            bond_cache: json file to keep inferred bonds among runs
+            polyhedra: species drawn as centers of polyhedra, e.g., ['Ti']
+        structure is not copied: the blocks keep copies of its arrays, so
+        it can be changed (e.g., by add_vacancy_to_structure) afterwards.
         """
-        s = copy.deepcopy(structure)
+        s = structure
         d = structure_to_dict_for_vesta(s)
         self.blocks = OrderedDict()
         self.blocks["title"] = Title(d["formula"])
@@ -47,16 +72,69 @@ class VestaFile:
         self.blocks["struc"] = Struc(s)
         if boundary is not None:
             self.blocks["boundary"] = Bound(boundary)
-        self.blocks["sbond"] = SBond(d["composition"], visible_bond)
+        self.blocks["sbond"] = sbond_block(s, visible_bond, prune_bonds,
+                                           infer_bonds, bond_cache, polyhedra)
         if vectors is not None:
             # default_vct_size = s.volume/s.num_sites**1/3
-            self.blocks["vectr"] = Vectr(vectors)
-            self.blocks["vectt"] = Vectt(len(vectors))
+            self.blocks.update(vector_blocks(vectors, vector_styles))
         if planes is not None:
             self.blocks["splan"] = Splan(s, planes)
         if styles is not None:
             self.blocks["style"] = Style(styles)
 
+    @classmethod
+    def from_blocks(cls, blocks: dict) -> "VestaFile":
+        """construct VestaFile directly from (already built) blocks"""
+        vf = cls.__new__(cls)
+        vf.blocks = OrderedDict(
+            (key, blocks[key]) for key in cls.block_order if key in blocks)
+        return vf
+
+    def freeze(self) -> "VestaFile":
+        """return copy whose blocks are rendered once as plain text"""
+        return self.from_blocks({key: RenderedBlock(repr(block))
+                                 for key, block in self.blocks.items()})
+
+    def with_blocks(self, **blocks) -> "VestaFile":
+        """
+        return shallow copy in which the given blocks are replaced or added.
+        e.g., vf.freeze().with_blocks(struc=Struc.from_arrays(..))
+        """
+        new_blocks = dict(self.blocks)
+        new_blocks.update(blocks)
+        return self.from_blocks(new_blocks)
+
+    def frames(self,
+               species: List[str],
+               frac_coords_frames: np.ndarray) -> List["VestaFile"]:
+        """
+        Args:
+            species: species strings of sites, e.g., ['Ba', 'Ti', 'O', ..]
+            frac_coords_frames: array of (frames x sites x 3)
+        Return:
+            VestaFile for each frame sharing the other blocks rendered once
+        """
+        frozen = self.freeze()
+        return [frozen.with_blocks(struc=Struc.from_arrays(species, fc))
+                for fc in frac_coords_frames]
+
+    def vector_variants(self,
+                        vectors_list: List[VectorSet],
+                        vector_styles_list: Optional[List[list]] = None
+                        ) -> List["VestaFile"]:
+        """
+        Args:
+            vectors_list: list of VectorSet
+            vector_styles_list: list of vector_styles for each VectorSet
+        Return:
+            VestaFile for each vectors sharing the other blocks rendered once
+        """
+        frozen = self.freeze()
+        vector_styles_list = vector_styles_list or [None] * len(vectors_list)
+        return [frozen.with_blocks(**vector_blocks(vectors, vector_styles))
+                for vectors, vector_styles
+                in zip(vectors_list, vector_styles_list)]
+
     def __iter__(self):
         return self.blocks.values().__iter__()  # return iter(dict.values())
 
@@ -72,6 +150,79 @@ class VestaFile:
         print(f"<vesta_io>: generated {filename}.vesta.")
 
 
+def sbond_block(s: Structure,
+                visible_bond: set = None,
+                prune_bonds: bool = False,
+                infer_bonds: bool = False,
+                bond_cache: Optional[str] = None,
+                polyhedra: Optional[list] = None) -> "SBond":
+    """SBOND block of structure (see VestaFile for arguments)"""
+    sbond = SBond(structure_to_dict_for_vesta(s)["composition"], visible_bond)
+    species = [site.species_string for site in s]
+    if infer_bonds:
+        sbond.infer(s.lattice.matrix, s.frac_coords, species, bond_cache)
+    if prune_bonds:
+        sbond.prune(s.lattice.matrix, s.frac_coords, species)
+    if polyhedra is not None:
+        sbond.polyhedra_centers = set(polyhedra)
+    return sbond
+
+
+def vector_blocks(vectors: Union[VectorSet, dict],
+                  vector_styles: Optional[list] = None) -> dict:
+    """
+    VECTR and VECTT blocks. When vectors have types and vector_styles,
+    each VECTR entry gets the (size, color) of its type in VECTT,
+    otherwise one default VECTT row per vector. A VECTR entry holds a
+    single vector, so vectors of one type only share an entry (and a
+    VECTT row) when their components are the same.
+    """
+    vectr = Vectr(vectors)
+    if vector_styles is not None and vectr.vectors.types is not None:
+        vectt = Vectt.from_styles([vector_styles[_type - 1]
+                                   for _type in vectr.entry_types])
+    else:
+        vectt = Vectt(len(vectr.vectors))
+    return {"vectr": vectr, "vectt": vectt}
+
+
+def _write_vesta_file(vf: VestaFile, filename: str):
+    vf.write_file(filename=filename)
+
+
+def write_vesta_files(vesta_files: List[VestaFile],
+                      filenames: List[str],
+                      nprocs: Optional[int] = None):
+    """
+    render and write several VestaFile in parallel processes
+    Args:
+        vesta_files: list of VestaFile
+        filenames: output file names without '.vesta'
+        nprocs: number of processes (None: number of cpu, 1: serial)
+    """
+    if len(vesta_files) != len(filenames):
+        raise ValueError("number of vesta files and filenames are different")
+    if nprocs == 1 or len(vesta_files) < 2:
+        for vf, filename in zip(vesta_files, filenames):
+            _write_vesta_file(vf, filename)
+        return
+    with ProcessPoolExecutor(max_workers=nprocs) as executor:
+        list(executor.map(_write_vesta_file, vesta_files, filenames))
+
+
+class RenderedBlock:
+    """
+    This is class object of a block already rendered as text.
+    Used to share invariant blocks among several VestaFile.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def __repr__(self):
+        return self.text
+
+
 class Title:
     """
     This is class object of TITLE block in *.vesta files.
@@ -136,18 +287,35 @@ class Struc:
             structure: pymatgen Structure instance
         """
         self.occupation = f" {occupation} "
-        self.structure = structure
+        self.species = [site.species_string for site in structure]
+        self.frac_coords = np.array(structure.frac_coords, dtype=float)
+
+    @classmethod
+    def from_arrays(cls,
+                    species: List[str],
+                    frac_coords: np.ndarray,
+                    occupation: int = 1.0) -> "Struc":
+        """
+        Args:
+            species: species strings of sites, e.g., ['Ba', 'Ti', 'O', ..]
+            frac_coords: array of (sites x 3)
+        """
+        struc = cls.__new__(cls)
+        struc.occupation = f" {occupation} "
+        struc.species = list(species)
+        struc.frac_coords = np.array(frac_coords, dtype=float)
+        return struc
 
     def __repr__(self):
-        coords = []
-        for site, c in enumerate(self.structure, 1):
-            specifies = f'{site} {c.species_string} ' \
-                        f'{c.species_string}{site} {self.occupation} '
-            coord = val_to_str_line(c.frac_coords)
-            coords.append(specifies + coord)
-            coords.append(self.zero_coord)
+        sites = np.arange(1, len(self.species) + 1)
+        frac_coords = np.asarray(self.frac_coords, dtype=float).reshape(-1, 3)
+        line_format = f'%d %s %s%d {self.occupation} %.6f %.6f %.6f' \
+                      f'\n{self.zero_coord}'
+        str_coords = val_to_str_lines(
+            line_format,
+            [sites, self.species, self.species, sites] + list(frac_coords.T))
         # replace "X0+" (pmg dummy species) -> "XX" (vesta dummy species)
-        str_coords = replace_dummy_to_xx('\n'.join(coords))
+        str_coords = replace_dummy_to_xx(str_coords)
         outs = [f'{self.header}',
                 f'{str_coords}',
                 f'{self.separator}',
@@ -202,14 +370,73 @@ class SBond:
         if not user_define:
             user_define = pairs_in_composition
         self.pairs_of_bond = sorted(pairs_in_composition & user_define)
+        # SBOND lines of pairs missing from sbond_default_dict
+        self.inferred = {}
+        # species drawn as centers of polyhedra, None keeps template flags
+        self.polyhedra_centers = None
+
+    def template(self, pair: tuple) -> Optional[str]:
+        """ e.g., "0.00000    2.35391  0  1  1  0  1" or None """
+        return sbond_default_dict.get(pair, self.inferred.get(pair))
+
+    @property
+    def bond_lengths(self) -> dict:
+        """ {('Ti', 'O'): (min, max), ..} of pairs in the template """
+        lengths = {}
+        for _key in self.pairs_of_bond:
+            if self.template(_key) is not None:
+                min_length, max_length = self.template(_key).split()[:2]
+                lengths[_key] = (float(min_length), float(max_length))
+        return lengths
+
+    def infer(self, lattice: np.ndarray, frac_coords: np.ndarray,
+              species: List[str], cache_file: Optional[str] = None) -> None:
+        """
+        infer SBOND lines of pairs missing from sbond_default_dict
+        from the first-shell distances in the structure
+        """
+        missing = [_key for _key in self.pairs_of_bond
+                   if _key not in sbond_default_dict]
+        self.inferred = inferred_sbond_lines(lattice, frac_coords, species,
+                                             missing, cache_file)
+        for _key, line in self.inferred.items():
+            print(f"<vesta_io>: inferred bond {_key[0]}-{_key[1]}: "
+                  f"{line.split()[1]} A.")
+
+    def prune(self, lattice: np.ndarray, frac_coords: np.ndarray,
+              species: List[str]) -> None:
+        """
+        drop pairs never closer than their max length in the structure,
+        so that VESTA does not search bonds of them
+        """
+        found = species_pairs_within(lattice, frac_coords, species,
+                                     self.bond_lengths)
+        self.pairs_of_bond = [_key for _key in self.pairs_of_bond
+                              if _key in found]
+
+    def polyhedra_line(self, pair: tuple) -> tuple:
+        """
+        (pair, template) with show_polyhedra flag (5th field) set to 1 when
+        the first of pair is one of polyhedra_centers and 0 otherwise.
+        The pair is swapped if only the second is the center.
+        """
+        template = self.template(pair)
+        if self.polyhedra_centers is None:
+            return pair, template
+        if pair[1] in self.polyhedra_centers and \
+                pair[0] not in self.polyhedra_centers:
+            pair = (pair[1], pair[0])
+        fields = template.split()
+        fields[4] = "1" if pair[0] in self.polyhedra_centers else "0"
+        return pair, f"{fields[0]}    {fields[1]}  " + "  ".join(fields[2:])
 
     def __repr__(self):
         visible_bonds = []
         _idx = 1
         for _key in self.pairs_of_bond:
-            if _key in sbond_default_dict:
-                visible_bond = f'{_idx} {_key[0]} {_key[1]} ' \
-                               f'{sbond_default_dict[_key]}'
+            if self.template(_key) is not None:
+                pair, template = self.polyhedra_line(_key)
+                visible_bond = f'{_idx} {pair[0]} {pair[1]} {template}'
                 visible_bonds.append(visible_bond)  # + '\n'
                 _idx += 1
         str_visible_bonds = '\n'.join(visible_bonds)
@@ -231,29 +458,76 @@ class Vectr:
     header = "VECTR"
     separator = " 0 0 0 0 0 "
 
-    def __init__(self, vectors: dict):
+    def __init__(self, vectors: Union[VectorSet, dict]):
         """
         Args:
-            vectors (dict): dict of site index and vector.
+            vectors (VectorSet or dict): site indices and vectors.
                             e.g., {1: [[x.xx],[x.xx],[x.xx]], ..}
         """
         self.default_vct_options = " 0 0 0 0 "
+        if isinstance(vectors, dict):
+            vectors = VectorSet.from_dict(vectors)
         self.vectors = vectors
 
+    def typed_entries(self) -> tuple:
+        """
+        VECTR entries of vectors with types: vectors of the same type and
+        components share one entry listing their atoms, and entries are
+        numbered 1, 2, .. in order of appearance.
+        Return:
+            0-based index of the first vector of each entry,
+            0-based entry of each vector
+        """
+        keys = np.column_stack([self.vectors.types,
+                                np.round(self.vectors.vectors, 6)])
+        _, first, inverse = np.unique(keys, axis=0, return_index=True,
+                                      return_inverse=True)
+        order = np.argsort(first)
+        rank = np.empty(len(order), dtype=int)
+        rank[order] = np.arange(len(order))
+        return first[order], rank[inverse.reshape(-1)]
+
+    @property
+    def entry_types(self) -> np.ndarray:
+        """type of each VECTR entry (see typed_entries)"""
+        first, _ = self.typed_entries()
+        return self.vectors.types[first]
+
     def __repr__(self):
-        vectors = []
-        for _key in self.vectors:
-            vector = f'{val_to_str_line(self.vectors[_key])}'
-            option = f'{_key} {self.default_vct_options}'
-            vectors.append(f'{_key} ' + vector)
-            vectors.append(option + self.separator)
-            vectors.append(self.separator)
-        str_vectors = '\n'.join(vectors)
+        if self.vectors.types is not None and len(self.vectors):
+            str_vectors = self._typed_repr()
+        else:
+            # type vector / index options / separator for each vector
+            # one entry per vector (entry = site index)
+            line_format = f'%d %.6f %.6f %.6f\n' \
+                          f'%d {self.default_vct_options}{self.separator}\n' \
+                          f'{self.separator}'
+            indices = self.vectors.indices
+            xyz = self.vectors.vectors
+            str_vectors = val_to_str_lines(line_format, [indices, xyz[:, 0],
+                                                         xyz[:, 1], xyz[:, 2],
+                                                         indices])
         outs = [f'{self.header}',
                 f'{str_vectors}',
                 f'']
         return "\n".join(outs)
 
+    def _typed_repr(self) -> str:
+        first, entries = self.typed_entries()
+        xyz = self.vectors.vectors[first]
+        heads = val_to_str_lines('%d %.6f %.6f %.6f',
+                                 [np.arange(1, len(first) + 1), xyz[:, 0],
+                                  xyz[:, 1], xyz[:, 2]]).split("\n")
+        order = np.argsort(entries, kind="stable")
+        atoms = val_to_str_lines(
+            f'%d {self.default_vct_options}{self.separator}',
+            [self.vectors.indices[order]]).split("\n")
+        splits = np.cumsum(np.bincount(entries))[:-1]
+        lines = []
+        for head, group in zip(heads, np.split(np.array(atoms), splits)):
+            lines += [head] + group.tolist() + [self.separator]
+        return "\n".join(lines)
+
 
 class Vectt:
     """
@@ -277,13 +551,31 @@ class Vectt:
         self.color = color  # default black
         # self.length = length
         self.type = 2
+        self.styles = None
+
+    @classmethod
+    def from_styles(cls, styles: List[tuple]) -> "Vectt":
+        """
+        Args:
+            styles: (size, color) of each VECTR entry
+                    e.g., [(0.25, "255 0 0"), (0.5, "0 0 255")]
+        """
+        vectt = cls(len(styles))
+        vectt.styles = list(styles)
+        return vectt
 
     def __repr__(self):
-        vector_option = f"{self.size} {self.color} {self.type}"
-        vector_types = []
-        for _ in range(self.num_of_vectors):
-            vector_types.append(f'{_ + 1} {vector_option}')
-        str_vector_types = '\n'.join(vector_types)
+        if self.styles is not None:
+            str_vector_types = val_to_str_lines(
+                f'%d %s %s {self.type}',
+                [np.arange(1, self.num_of_vectors + 1),
+                 [size for size, _ in self.styles],
+                 [color for _, color in self.styles]])
+        else:
+            vector_option = f"{self.size} {self.color} {self.type}"
+            str_vector_types = val_to_str_lines(
+                '%d ' + vector_option.replace('%', '%%'),
+                [np.arange(1, self.num_of_vectors + 1)])
         outs = [f'{self.header}',
                 f'{str_vector_types}',
                 f'']
@@ -307,18 +599,30 @@ class Splan:
             hkls: list of h, k, l (reflection) index
         """
         hklds_copy = copy.deepcopy(hklds)
-        for _hkl in hklds_copy:
-            if len(_hkl) == 3:
-                _hkl.append(s.lattice.reciprocal_lattice.d_hkl(_hkl))
+        missing = [_hkl for _hkl in hklds_copy if len(_hkl) == 3]
+        if missing:
+            for _hkl, d in zip(missing, self.d_hkls(s, missing)):
+                _hkl.append(float(d))
         self.hklds = hklds_copy
         self.plane_color = "255 0 255 80"  # default pink
         # self.plane_color = "1 1 1 80"  # black
 
+    @staticmethod
+    def d_hkls(s: Structure, hkls: List[list]) -> np.ndarray:
+        """
+        d of all planes by one product with the metric tensor, same as
+        s.lattice.reciprocal_lattice.d_hkl(hkl) for each hkl
+        """
+        hkls = np.asarray(hkls, dtype=float)
+        metric = s.lattice.reciprocal_lattice \
+            .reciprocal_lattice_crystallographic.metric_tensor
+        return 1 / np.sqrt(np.einsum("ij,jk,ik->i", hkls, metric, hkls))
+
     def __repr__(self):
-        splanes = []
-        for _idx, hkld in enumerate(self.hklds, 1):
-            splanes.append(f'{_idx} {val_to_str_line(hkld)} {self.plane_color}')
-        str_splnes = '\n'.join(splanes)
+        hklds = np.array(self.hklds, dtype=float).reshape(-1, 4)
+        str_splnes = val_to_str_lines(
+            f'%d %.6f %.6f %.6f %.6f {self.plane_color}',
+            [np.arange(1, len(hklds) + 1)] + list(hklds.T))
         outs = [f'{self.header}',
                 f'{str_splnes}',
                 f'{self.footer}',
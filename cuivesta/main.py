@@ -2,35 +2,119 @@
 # coding: utf-8
 
 import argparse
+import shlex
 import sys
+from collections import OrderedDict
 from pathlib import Path
+from typing import List, Optional, Tuple
 
 import numpy as np
 
-from pymatgen.core.structure import Structure
+from pymatgen.core.structure import StructureError
 
 import cuivesta.utils.defect_extension as dex
-from cuivesta.blocks import VestaFile
+from cuivesta.utils.vector_set import (VectorSet,
+                                       overlay_vectors,
+                                       magnitude_classes,
+                                       species_classes,
+                                       orbit_representatives,
+                                       orbit_classes,
+                                       type_styles,
+                                       fractional_vectors,
+                                       transform_vectors)
+from cuivesta.utils.vasp_io import forces_from_file, structure_from_file
+from cuivesta.utils.phonon import (parse_phonon_yaml,
+                                   bloch_eigenvectors,
+                                   mode_displacement_vectors)
+from cuivesta.utils.coordination import (coordination_numbers,
+                                         coordination_summary,
+                                         write_coordination_summary)
+from cuivesta.utils.display_budget import (estimate_display,
+                                           trim_boundary,
+                                           drop_shorter_vectors)
+from cuivesta.utils.selection import select_sites, selection_mask
+from cuivesta.utils.symmetry import site_orbits
+from cuivesta.utils.supercell import (parse_supercell_matrix,
+                                      lattice_translations,
+                                      make_supercell,
+                                      supercell_frames,
+                                      tile_vectors)
+from cuivesta.utils.reduced_cell import (reduction_matrix,
+                                         reduce_structure,
+                                         transform_boundary,
+                                         transform_hkl)
+from cuivesta.blocks import (VestaFile,
+                             Bound,
+                             Splan,
+                             sbond_block,
+                             vector_blocks,
+                             write_vesta_files)
 from cuivesta.utils.func_tools import (
     structure_diff_vectors,
+    multi_structure_diff_vectors,
+    interpolate_frac_coords,
     make_visible_bond_set,
-    make_plane_list,
+    expand_plane_list,
+    fit_plane_through_sites,
     plane_option_parse,
     vector_option_parse,
     centering_atom,
+    periodic_centroid,
+    sphere_boundary,
+    shell_radius,
     boundary_option_preparse, add_dummy_to_structure)
 
 # command line option
 parser = argparse.ArgumentParser()
 parser.add_argument(
     "-p", "--poscar", type=str, default="POSCAR",
-    help="POSCAR file name.", metavar="FILE")
+    help="POSCAR file name. "
+         "The final structure of vasprun.xml or OUTCAR is also accepted.",
+    metavar="FILE")
 parser.add_argument(
     "-v", "--vectors", type=str, default=None,
-    help="vector set to be visible.", metavar="FILE")
+    help="vector set to be visible, in fractional coords as --diff.",
+    metavar="FILE")
 parser.add_argument(
-    "--diff", type=str, default=False,
-    help="2nd POSCAR file name for comparison.", metavar="FILE")
+    "--diff", type=str, default=False, nargs="+",
+    help="2nd POSCAR file name(s) for comparison. "
+         "For several files, FILE_2ndFILE.vesta is written for each "
+         "(FILE_dir_2ndFILE.vesta with the parent directory when the "
+         "file names are shared).",
+    metavar="FILE")
+parser.add_argument(
+    "--interpolate", type=int, default=None,
+    help="write N (>= 2) structures interpolated from POSCAR to --diff "
+         "POSCAR as FILE_000.vesta, FILE_001.vesta, .. Only frac coords "
+         "are interpolated: all frames keep the lattice of POSCAR",
+    metavar="N")
+parser.add_argument(
+    "--nprocs", type=int, default=None,
+    help="number of processes to write multiple files "
+         "(default: number of cpu)")
+parser.add_argument(
+    "--forces", type=str, default=None,
+    help="show forces in vasprun.xml or OUTCAR as vector "
+         "(cartesian eV/A converted to fractional coords as --diff)",
+    metavar="FILE")
+parser.add_argument(
+    "--ionic_step", type=int, default=-1,
+    help="ionic step of forces: 1-based index or negative index "
+         "from the end (default: -1, final step)")
+parser.add_argument(
+    "--phonon", type=str, default=None,
+    help="phonopy band.yaml or qpoints.yaml with eigenvectors: "
+         "write displacements of each mode as FILE_modeXXX.vesta "
+         "(fractional coords as --diff, the longest is 1 A; "
+         "exclusive with --diff, --forces and -v)",
+    metavar="FILE")
+parser.add_argument(
+    "--modes", type=int, default=None, nargs="+",
+    help="1-based indices of phonon modes (default: all modes)")
+parser.add_argument(
+    "--qpoint", type=int, default=None,
+    help="1-based index of q-point in phonon file "
+         "(default: the first Gamma point)")
 parser.add_argument(
     "--defect", action="store_true", default=False,
     help="show defect-induced displacements as vector "
@@ -41,12 +125,67 @@ parser.add_argument(
 parser.add_argument(
     "--all_sites", action="store_true", default=False,
     help="force vectors at all sites to be visible")
+parser.add_argument(
+    "--vector_classes", type=str, default=None,
+    choices=["magnitude", "species", "orbit"],
+    help="give vectors grouped by magnitude bins, by species, or by "
+         "symmetry orbits of sites (see --unique_vectors) a shared size "
+         "and color; VESTA keeps one vector per VECTR entry, so VECTT "
+         "still has a row per distinct vector")
+parser.add_argument(
+    "--overlay", action="store_true", default=False,
+    help="show vectors of all sources (-v, --diff, --forces, --defect) "
+         "together: each source is one vector type with its own color, "
+         "and the longest vector of each source is normalized to 1 "
+         "(exclusive with --vector_classes)")
+parser.add_argument(
+    "--unique_vectors", action="store_true", default=False,
+    help="show only one vector per symmetry orbit of sites: orbits of "
+         "the point group around the defect center (--defect, "
+         "--vacancy) or of the space group")
+parser.add_argument(
+    "--vector_bins", type=int, default=4,
+    help="number of magnitude bins for --vector_classes magnitude")
+parser.add_argument(
+    "--vector_size", type=float, default=0.5,
+    help="base size of vectors for --vector_classes and --overlay")
 parser.add_argument(
     "-m", "--amplitude", type=float, default=1.0,
     help="amount of displacement")
 parser.add_argument(
     "-b", "--bonds", type=str, default=None, nargs="+",
     help="customize bonds to be visible")
+parser.add_argument(
+    "--prune_bonds", action="store_true", default=False,
+    help="write only bond pairs closer than their max length "
+         "in the structure (faster loading in VESTA)")
+parser.add_argument(
+    "--infer_bonds", action="store_true", default=False,
+    help="infer max length of bond pairs missing from the template "
+         "at the gap after the first coordination shell")
+parser.add_argument(
+    "--bond_cache", type=str, default=None,
+    help="json file to keep inferred bonds of the same composition and "
+         "lattice among runs", metavar="FILE")
+parser.add_argument(
+    "--polyhedra", type=str, default=None, nargs="+",
+    help="species drawn as centers of coordination polyhedra, e.g., Ti")
+parser.add_argument(
+    "--coordination", type=str, default=None,
+    help="write coordination numbers of sites with the bond lengths "
+         "as csv (or json for *.json)", metavar="FILE")
+parser.add_argument(
+    "--supercell", type=str, default=None,
+    help="write supercell with vectors on every image: e.g., 3x3x2, or "
+         "9 integers of general matrix whose rows are the new lattice "
+         "vectors in units of the old ones. Other options (boundary, "
+         "atom indices, planes, ..) refer to the supercell",
+    metavar="MATRIX")
+parser.add_argument(
+    "--reduce", type=str, default=None, choices=["primitive", "niggli"],
+    help="write the Niggli-reduced primitive cell (primitive) or "
+         "Niggli-reduced cell (niggli) with vectors of the kept atoms "
+         "and range of plot covering the same region")
 parser.add_argument(
     "--atoms", type=str, default="atomic",
     help="customize radii of element: "
@@ -59,49 +198,428 @@ parser.add_argument(
     "--centering", type=int, default=None,
     help="centering the specified atom: " 
          "specify atom index")
+parser.add_argument(
+    "--centroid", type=str, default=None, nargs="+",
+    help="centering the periodic centroid of selected atoms: "
+         "specify atom indices, elements, selection, or point in "
+         "fractional coords, e.g., 12 15 O, 'species O and z > 0.5', "
+         "or 0.5,0.5,0.5 with --centroid_radius")
+parser.add_argument(
+    "--centroid_radius", type=float, default=None,
+    help="select atoms within RADIUS (A) from the points (or the first "
+         "atom) of --centroid", metavar="RADIUS")
+parser.add_argument(
+    "--select", type=str, default=None, nargs="+",
+    help="show vectors only at atoms of selection, e.g., "
+         "'species O and within 5.0 of 64', 'index 1:100', 'z > 0.5'",
+    metavar="SELECTION")
+parser.add_argument(
+    "--keep", type=str, default=None, nargs="+",
+    help="write only atoms of selection (and their vectors), "
+         "e.g., 'within 6.0 of 64'", metavar="SELECTION")
+parser.add_argument(
+    "--auto_boundary", type=float, default=None,
+    help="set range of plot to the smallest box containing all atoms "
+         "within RADIUS (A) from the center: --centering atom, "
+         "defect center (--defect, --vacancy), or --adx dummy",
+    metavar="RADIUS")
+parser.add_argument(
+    "--shells", type=int, default=None,
+    help="same as --auto_boundary with the radius reaching "
+         "N-th neighbor shell of the center", metavar="N")
+parser.add_argument(
+    "--max_displayed", type=int, default=None,
+    help="budget of atoms, bonds and vectors drawn by VESTA: "
+         "shrink range of plot, cut it around the center, "
+         "and drop shorter vectors to stay under N. Files of --phonon, "
+         "--diff and --interpolate share the range of plot, and each "
+         "drops its own vectors (not combined with --variants)",
+    metavar="N")
 parser.add_argument(
     "--planes", type=str, default=None, nargs="+",
     help="specify index of plane: " 
          "e.g., '100' for hkl index or '100-3.0' for hkl-d "
          "-3 means d=3.0 A for inter-plane distance"
-         "default d is determined by reciprocal_lattice.d_hkl() of pmg")
+         "default d is determined by reciprocal_lattice.d_hkl() of pmg. "
+         "Indices are separated by comma for negative or multi-digit ones "
+         "(e.g., '1,-1,10-3.0'), and '{110}' means all "
+         "symmetry-equivalent planes")
+parser.add_argument(
+    "--plane_through", type=int, default=None, nargs="+",
+    help="add plane fitted through atoms: specify atom indices, "
+         "e.g., 12 15 33 40", metavar="INDEX")
+parser.add_argument(
+    "--variants", type=str, default=None,
+    help="write one file per line of FILE with the options in the line "
+         "(--boundary, --centering, --centroid, --centroid_radius, "
+         "--auto_boundary, --shells, -b, "
+         "--prune_bonds, --infer_bonds, --polyhedra, --planes, "
+         "--plane_through, -f; other options are an error) reading the "
+         "structure only once. "
+         "Not combined with --supercell, --reduce and --keep, which "
+         "change the sites that variant options refer to, nor with "
+         "--interpolate, --phonon and --diff of several files, which "
+         "write their own series of files",
+    metavar="FILE")
 parser.add_argument(
     "-f", "--filename", type=str, default=None,
     help="output file name.", metavar="FILE")
 parser.add_argument(
     "--adx", type=str, default=None,
-    help="add dummy specie.")
+    help="add dummy specie: specify fractional coords 'x y z' "
+         "(within -1 to 2), or "
+         "selection of atoms to put it at their periodic centroid, "
+         "e.g., 'species O and within 2.5 of 12'")
 # args = parser.parse_args()
 
 # style_dict = {"amplitude": args.amplitude,
 #               "atoms": args.atoms}
 
 
+def classify_vectors(vectors: VectorSet, args, species: list) -> tuple:
+    """ group vectors into shared types by --vector_classes """
+    if args.vector_classes == "magnitude":
+        return magnitude_classes(vectors, args.vector_bins, args.vector_size)
+    if args.vector_classes == "species":
+        return species_classes(vectors, species, args.vector_size)
+    if args.vector_classes == "orbit":
+        # types are given by orbit_vectors before sites are transformed
+        num_types = int(vectors.types.max()) if len(vectors) else 0
+        return vectors, type_styles(num_types, args.vector_size)
+    return vectors, None
+
+
+def classify_vectors_list(vectors_list: list, args, species: list) -> tuple:
+    classified = [classify_vectors(vectors, args, species)
+                  for vectors in vectors_list]
+    return ([vectors for vectors, _ in classified],
+            [vector_styles for _, vector_styles in classified])
+
+
+def forces_vectors(s, args) -> VectorSet:
+    """ cartesian --forces in fractional coords as the other vectors """
+    forces = forces_from_file(args.forces, args.ionic_step)
+    if len(forces) != s.num_sites:
+        raise StructureError("The number of forces are different from "
+                             "number of atoms.")
+    return VectorSet.from_array(fractional_vectors(forces, s.lattice.matrix))
+
+
+def orbits_from_args(s, defect) -> np.ndarray:
+    """
+    symmetry orbits of sites: the point group around the defect center,
+    or the space group of s without defect
+    """
+    if defect is None:
+        orbits = site_orbits(s)
+    else:
+        center = defect.defect_center
+        if isinstance(center, int):
+            center = defect.initial_structure[center].frac_coords
+        orbits = site_orbits(defect.initial_structure, center)
+    print(f"<vesta_io>: {len(np.unique(orbits))} symmetry orbits of "
+          f"{len(orbits)} sites.")
+    return orbits
+
+
+def orbit_vectors(vectors: VectorSet, orbits: np.ndarray, args) -> VectorSet:
+    """ vectors of --unique_vectors and types of --vector_classes orbit """
+    if args.unique_vectors:
+        vectors = orbit_representatives(vectors, orbits)
+    if args.vector_classes == "orbit":
+        vectors, _ = orbit_classes(vectors, orbits, args.vector_size)
+    return vectors
+
+
+def plane_list_from_args(s, args) -> Optional[list]:
+    """ planes of --planes and --plane_through """
+    plane_list = None
+    if args.planes:
+        planes = plane_option_parse(args.planes, path=Path.cwd())
+        plane_list = expand_plane_list(s, planes)
+    if args.plane_through:
+        hkl, d, rms = fit_plane_through_sites(s.lattice.matrix, s.frac_coords,
+                                              args.plane_through)
+        print(f"<vesta_io>: plane through "
+              f"{' '.join(str(i) for i in args.plane_through)}: "
+              f"hkl {' '.join(str(i) for i in hkl)}, d {d:.6f} A "
+              f"(rms {rms:.3f} A).")
+        plane_list = (plane_list or []) + [[float(i) for i in hkl] + [d]]
+    return plane_list
+
+
+def reduced_plane_list(s, plane_list: list, matrix: np.ndarray) -> list:
+    """ the same planes in the reduced cell (default d is taken of s) """
+    reduced = []
+    for hkld in plane_list:
+        d = hkld[3] if len(hkld) == 4 else float(Splan.d_hkls(s, [hkld])[0])
+        reduced.append([float(_) for _ in transform_hkl(hkld[:3], matrix)]
+                       + [d])
+    return reduced
+
+
+def bond_set_from_args(args) -> Optional[set]:
+    if args.bonds:
+        return make_visible_bond_set(args.bonds)
+    return args.bonds
+
+
+def centroid_from_args(s, args) -> np.ndarray:
+    """ periodic centroid of sites selected by --centroid """
+    site_indices = select_sites(s, args.centroid, args.centroid_radius)
+    centroid = periodic_centroid(s.frac_coords, site_indices)
+    print(f"<vesta_io>: centroid of {len(site_indices)} sites: "
+          f"{' '.join(f'{c:.3f}' for c in centroid)}")
+    return centroid
+
+
+def boundary_from_args(s, args) -> np.ndarray:
+    """ range of plot of --boundary shifted by --centering or --centroid """
+    boundary = boundary_option_preparse(args.boundary)
+    if args.centroid:
+        shift = centering_atom(centroid_from_args(s, args), boundary)
+    elif args.centering is not None:  # To use 0 index
+        center_site = s[args.centering-1]  # pmg Site object
+        center_frac_coord = center_site.frac_coords
+        shift = centering_atom(center_frac_coord, boundary)
+    else:
+        shift = np.array([0, 0, 0, 0, 0, 0])
+    return boundary + shift
+
+
+def uses_auto_boundary(args) -> bool:
+    """ --auto_boundary or --shells is given (0 is rejected later) """
+    return args.auto_boundary is not None or args.shells is not None
+
+
+def auto_boundary_from_args(s, args, defect) -> np.ndarray:
+    """ range of plot of --auto_boundary or --shells """
+    if (args.auto_boundary is not None and args.auto_boundary <= 0) \
+            or (args.shells is not None and args.shells <= 0):
+        print('auto_boundary and shells options need positive values')
+        sys.exit()
+    if args.centroid:
+        center = centroid_from_args(s, args)
+    elif args.centering is not None:
+        center = s[args.centering - 1].frac_coords
+    elif defect is not None:
+        center = s[defect.defect_center].frac_coords \
+            if isinstance(defect.defect_center, int) \
+            else np.array(defect.defect_center)
+    elif args.adx:
+        center = s[-1].frac_coords
+    else:
+        print('auto_boundary and shells options need center: '
+              'centering, centroid, defect, vacancy or adx option')
+        sys.exit()
+    radius = args.auto_boundary
+    if args.shells is not None:
+        radius = shell_radius(s.lattice.matrix, s.frac_coords, center,
+                              args.shells)
+    boundary = sphere_boundary(s.lattice.matrix, s.frac_coords, center,
+                               radius)
+    print(f"<vesta_io>: boundary within {radius:.3f} A: "
+          f"{' '.join(f'{b:.3f}' for b in boundary)}")
+    return boundary
+
+
+def adx_coord_from_args(s, args) -> np.ndarray:
+    """
+    --adx: fractional coords (three numbers in [-1, 2]) or centroid of
+    selected sites otherwise, e.g., "12" is the 12th site
+    """
+    try:
+        coords = np.array([float(_) for _ in args.adx.split()])
+    except ValueError:
+        coords = None
+    if coords is not None and len(coords) == 3 \
+            and np.all((coords >= -1) & (coords <= 2)):
+        return coords
+    site_indices = select_sites(s, [args.adx])
+    return periodic_centroid(s.frac_coords, site_indices)
+
+
+def select_vectors(vectors: Optional[VectorSet], site_mask: np.ndarray
+                   ) -> Optional[VectorSet]:
+    """ vectors at sites of --select """
+    if vectors is None:
+        return None
+    return vectors.select(np.nonzero(site_mask)[0] + 1)
+
+
+def diff_filenames(filename: str, diffs: List[str]) -> List[str]:
+    """
+    FILE_2ndFILE for each --diff file, or FILE_dir_2ndFILE with the parent
+    directory when the file names are shared, e.g., run1/CONTCAR and
+    run2/CONTCAR
+    """
+    names = [Path(diff).name for diff in diffs]
+    if len(set(names)) != len(names):
+        names = [f"{Path(diff).resolve().parent.name}_{Path(diff).name}"
+                 for diff in diffs]
+    if len(set(names)) != len(names):
+        raise ValueError(f"diff files give the same output names: "
+                         f"{' '.join(diffs)}.")
+    return [f"{filename}_{name}" for name in names]
+
+
+# options that a line of --variants may set
+variant_options = ("boundary", "centering", "centroid", "centroid_radius",
+                   "auto_boundary", "shells", "bonds", "prune_bonds",
+                   "infer_bonds", "polyhedra", "planes", "plane_through",
+                   "filename")
+
+
+def read_variants(filename) -> List[List[str]]:
+    """ options of each variant: one line per variant, '#' for comment """
+    with open(filename) as file:
+        variants = [shlex.split(line, comments=True) for line in file]
+    return [variant for variant in variants if variant]
+
+
+def variant_vesta_files(vf: VestaFile, s, args, defect, filename: str
+                        ) -> Tuple[List[VestaFile], List[str]]:
+    """
+    VestaFile of each line of --variants. Options of a line override those
+    of the command line, and only BOUND, SBOND and SPLAN are built again:
+    the other blocks are rendered once and shared, so a line setting any
+    other option is an error. A line names its file by -f, otherwise
+    FILE_variantXXX.
+    """
+    frozen = vf.freeze()
+    vesta_files, filenames = [], []
+    for i, variant in enumerate(read_variants(args.variants)):
+        variant_args = parser.parse_args(sys.argv[1:] + variant)
+        # other options would be silently ignored since blocks are shared
+        unsupported = [action.option_strings[-1] for action in parser._actions
+                       if action.dest not in variant_options
+                       and getattr(variant_args, action.dest, None)
+                       != getattr(args, action.dest, None)]
+        if unsupported:
+            raise ValueError(f"variant{i:03d} sets options not "
+                             f"supported by variants: "
+                             f"{' '.join(unsupported)}.")
+        if uses_auto_boundary(variant_args):
+            boundary = auto_boundary_from_args(s, variant_args, defect)
+        else:
+            boundary = boundary_from_args(s, variant_args)
+        blocks = {"boundary": Bound(boundary),
+                  "sbond": sbond_block(s, bond_set_from_args(variant_args),
+                                       variant_args.prune_bonds,
+                                       variant_args.infer_bonds,
+                                       variant_args.bond_cache,
+                                       variant_args.polyhedra)}
+        plane_list = plane_list_from_args(s, variant_args)
+        if plane_list is not None:
+            blocks["splan"] = Splan(s, plane_list)
+        vesta_files.append(frozen.with_blocks(**blocks))
+        # -f of the line itself, not inherited from the command line
+        line_args, _ = parser.parse_known_args(
+            variant, namespace=argparse.Namespace(filename=None))
+        filenames.append(line_args.filename or f"{filename}_variant{i:03d}")
+    duplicates = sorted({name for name in filenames
+                         if filenames.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"variants write the same file "
+                         f"{' '.join(duplicates)}.")
+    return vesta_files, filenames
+
+
 # WRITE *.vesta
 def main():
     args = parser.parse_args()
-    s = Structure.from_file(args.poscar)
+    s = structure_from_file(args.poscar)
 
     # manual vectors
-    if args.diff and args.defect:
+    if args.diff and args.defect and not args.overlay:
         print('diff and defect options are exclusive')
         sys.exit()
 
-    vectors_dict = None
+    # vectors of each source (later source is shown without --overlay)
+    vector_sources = OrderedDict()
     if args.vectors:
-        vectors_dict = vector_option_parse(args.vectors, s.num_sites)
+        vector_sources["vectors"] = vector_option_parse(args.vectors,
+                                                        s.num_sites)
+
+    if args.interpolate is not None and args.interpolate < 2:
+        print('interpolate option needs 2 or more frames')
+        sys.exit()
+
+    if args.interpolate and (not args.diff or len(args.diff) != 1):
+        print('interpolate option needs one file of diff option')
+        sys.exit()
+
+    if args.overlay and args.diff and len(args.diff) != 1:
+        print('overlay option needs one file of diff option')
+        sys.exit()
+
+    if args.variants and (args.supercell or args.reduce or args.keep):
+        # boundary, atom indices and planes of variant lines refer to
+        # the input cell and its sites
+        print('variants option is exclusive with supercell, reduce and '
+              'keep options')
+        sys.exit()
+
+    if args.phonon and (args.diff or args.forces or args.vectors):
+        # modes are written one file each, other vectors would be dropped
+        print('phonon option is exclusive with diff, forces and vectors '
+              'options')
+        sys.exit()
+
+    if args.variants and (args.interpolate or args.phonon
+                          or (args.diff and len(args.diff) > 1)):
+        # these write their own series of files
+        print('variants option is exclusive with interpolate, phonon and '
+              'diff of several files')
+        sys.exit()
 
+    if args.variants and args.max_displayed:
+        # BOUND of each line is its own, while vectors are shared
+        print('variants and max_displayed options are exclusive')
+        sys.exit()
+
+    if args.overlay and args.vector_classes:
+        # types of overlay are the sources, which replace vector classes
+        print('overlay and vector_classes options are exclusive')
+        sys.exit()
+
+    diff_vectors_list = None
     if args.diff:
         s1 = s
-        s2 = Structure.from_file(args.diff)
-        vectors_dict = structure_diff_vectors(s1, s2)
+        s2_list = [structure_from_file(diff) for diff in args.diff]
+        if args.interpolate:
+            frames = interpolate_frac_coords(s1, s2_list[0], args.interpolate)
+            if not np.allclose(s1.lattice.matrix, s2_list[0].lattice.matrix,
+                               atol=1e-3):
+                print(f"<vesta_io>: lattices are different; all frames "
+                      f"keep the lattice of {args.poscar}.")
+        elif len(s2_list) == 1:
+            vector_sources["diff"] = structure_diff_vectors(s1, s2_list[0])
+        else:
+            diff_vectors = multi_structure_diff_vectors(s1, s2_list)
+            diff_vectors_list = [VectorSet.from_array(displacements)
+                                 for displacements in diff_vectors]
+
+    if args.forces:
+        vector_sources["forces"] = forces_vectors(s, args)
+
+    # phonon modes
+    phonon = None
+    phonon_vectors_list = None
+    if args.phonon:
+        phonon = parse_phonon_yaml(args.phonon, args.qpoint, args.modes)
+        masses = np.array([site.specie.atomic_mass for site in s])
+        mode_vectors = mode_displacement_vectors(phonon["eigenvectors"],
+                                                 masses, s.lattice.matrix)
+        phonon_vectors_list = [VectorSet.from_array(displacements)
+                               for displacements in mode_vectors]
 
     # defect extension
     defect = None
     if args.defect:
         defect = dex.SDefect.from_defect_entry(s)
-        vectors_dict = dex.defect_induced_displacement_vectors(defect,
-                                                               args.all_sites)
+        vector_sources["defect"] = \
+            dex.defect_induced_displacement_vectors(defect, args.all_sites)
     if args.vacancy:
         if defect is None:
             defect = dex.SDefect.from_defect_entry(s)
@@ -109,41 +627,244 @@ def main():
             raise TypeError("defect is not vacancy")
         dex.add_vacancy_to_structure(s, defect.defect_center)
 
+    # vectors on symmetry orbits
+    if args.unique_vectors or args.vector_classes == "orbit":
+        orbits = orbits_from_args(s, defect)
+        for name in vector_sources:
+            vector_sources[name] = orbit_vectors(vector_sources[name],
+                                                 orbits, args)
+        if diff_vectors_list is not None:
+            diff_vectors_list = [orbit_vectors(v, orbits, args)
+                                 for v in diff_vectors_list]
+        if phonon_vectors_list is not None:
+            phonon_vectors_list = [orbit_vectors(v, orbits, args)
+                                   for v in phonon_vectors_list]
+
+    # supercell: sites and vectors tiled over the images (site-major)
+    if args.supercell:
+        matrix = parse_supercell_matrix(args.supercell)
+        lattice, frac_coords = s.lattice.matrix, s.frac_coords
+        s, _ = make_supercell(s, matrix)
+        num_images = int(round(abs(np.linalg.det(matrix))))
+
+        for name in vector_sources:
+            vector_sources[name] = tile_vectors(vector_sources[name], matrix)
+        if diff_vectors_list is not None:
+            diff_vectors_list = [tile_vectors(v, matrix)
+                                 for v in diff_vectors_list]
+        if phonon_vectors_list is not None:
+            # images differ by the Bloch phase of the q-point
+            image_vectors = mode_displacement_vectors(
+                bloch_eigenvectors(phonon["eigenvectors"],
+                                   frac_coords[:len(masses)],
+                                   phonon["q_position"],
+                                   lattice_translations(matrix)),
+                np.repeat(masses, num_images), lattice)
+            phonon_vectors_list = [
+                tile_vectors(v, matrix, displacements)
+                for v, displacements in zip(phonon_vectors_list,
+                                            image_vectors)]
+        if args.interpolate:
+            frames = supercell_frames(frames, matrix)
+        if defect is not None:
+            # the first image of the defect
+            defect.defect_center = \
+                defect.defect_center * num_images \
+                if isinstance(defect.defect_center, int) \
+                else np.dot(defect.defect_center, np.linalg.inv(matrix))
+        print(f"<vesta_io>: supercell of {num_images} cells "
+              f"({len(s)} sites).")
+
     # plane
-    plane_list = None
-    if args.planes:
-        planes = plane_option_parse(args.planes, path=Path.cwd())
-        plane_list = [make_plane_list(plane) for plane in planes]
+    plane_list = plane_list_from_args(s, args)
 
     # bond
-    if args.bonds:
-        bond_set = make_visible_bond_set(args.bonds)
-    else:
-        bond_set = args.bonds
+    bond_set = bond_set_from_args(args)
 
     # boundary
-    boundary = boundary_option_preparse(args.boundary)
-    if args.centering is not None:  # To use 0 index
-        center_site = s[args.centering-1]  # pmg Site object
-        center_frac_coord = center_site.frac_coords
-        shift = centering_atom(center_frac_coord, boundary)
-    else:
-        shift = np.array([0, 0, 0, 0, 0, 0])
-    boundary = boundary + shift
+    auto_boundary = uses_auto_boundary(args)
+    if not auto_boundary:
+        boundary = boundary_from_args(s, args)
 
     # adx
     if args.adx:
-        adx_coord = [float(_) for _ in args.adx.split()]
+        adx_coord = adx_coord_from_args(s, args)
         add_dummy_to_structure(s, adx_coord)
 
+    # auto boundary around the center
+    if auto_boundary:
+        boundary = auto_boundary_from_args(s, args, defect)
+
     # misc
     amplitude = args.amplitude * ((s.volume/s.num_sites)**1/3) * 1/10
     style_dict = {"amplitude": amplitude,
                   "atoms": args.atoms}
 
-    vf = VestaFile(s, bond_set, vectors_dict, boundary, plane_list, style_dict)
+    # shared vector types
+    species = [site.species_string for site in s]
+    vectors, vector_styles = None, None
+    if args.overlay and vector_sources:
+        vectors, vector_styles = overlay_vectors(
+            list(vector_sources.values()), args.vector_size)
+        for _type, (name, (_, color)) in enumerate(
+                zip(vector_sources, vector_styles), 1):
+            print(f"<vesta_io>: vector type {_type}: {name} ({color})")
+    elif vector_sources:
+        vectors = list(vector_sources.values())[-1]
+        vectors, vector_styles = classify_vectors(vectors, args, species)
+    if diff_vectors_list is not None:
+        diff_vectors_list, diff_styles_list = \
+            classify_vectors_list(diff_vectors_list, args, species)
+    if phonon_vectors_list is not None:
+        phonon_vectors_list, phonon_styles_list = \
+            classify_vectors_list(phonon_vectors_list, args, species)
+
+    if args.select:
+        site_mask = selection_mask(s, " ".join(args.select))
+        print(f"<vesta_io>: vectors at {site_mask.sum()} selected sites.")
+        vectors = select_vectors(vectors, site_mask)
+        if diff_vectors_list is not None:
+            diff_vectors_list = [select_vectors(v, site_mask)
+                                 for v in diff_vectors_list]
+        if phonon_vectors_list is not None:
+            phonon_vectors_list = [select_vectors(v, site_mask)
+                                   for v in phonon_vectors_list]
+
+    if args.interpolate:
+        # dummy sites added by --vacancy or --adx stay at the same position
+        extra = s.frac_coords[frames.shape[1]:]
+        frames = np.concatenate(
+            [frames, np.broadcast_to(extra, (len(frames),) + extra.shape)],
+            axis=1)
+
+    # trim sites out of --keep
+    if args.keep:
+        site_mask = selection_mask(s, " ".join(args.keep))
+        if not site_mask.any():
+            print('no site is selected by keep option')
+            sys.exit()
+        s.remove_sites(np.nonzero(~site_mask)[0].tolist())
+        species = [site.species_string for site in s]
+        print(f"<vesta_io>: {site_mask.sum()} sites kept.")
+        if vectors is not None:
+            vectors = vectors.take_sites(site_mask)
+        if diff_vectors_list is not None:
+            diff_vectors_list = [v.take_sites(site_mask)
+                                 for v in diff_vectors_list]
+        if phonon_vectors_list is not None:
+            phonon_vectors_list = [v.take_sites(site_mask)
+                                   for v in phonon_vectors_list]
+        if args.interpolate:
+            frames = frames[:, site_mask]
+
+    # reduced cell
+    if args.reduce:
+        matrix = reduction_matrix(s, args.reduce)
+        num_sites = len(s)
+        if plane_list is not None:
+            plane_list = reduced_plane_list(s, plane_list, matrix)
+        s, site_mask = reduce_structure(s, matrix)
+        species = [site.species_string for site in s]
+
+        def reduced(_vectors):
+            _vectors = _vectors.take_sites(site_mask)
+            return VectorSet(_vectors.indices,
+                             transform_vectors(_vectors.vectors, matrix),
+                             _vectors.types)
+
+        if vectors is not None:
+            vectors = reduced(vectors)
+        if diff_vectors_list is not None:
+            diff_vectors_list = [reduced(v) for v in diff_vectors_list]
+        if phonon_vectors_list is not None:
+            phonon_vectors_list = [reduced(v) for v in phonon_vectors_list]
+        if args.interpolate:
+            frames = np.dot(frames[:, site_mask], np.linalg.inv(matrix))
+            frames -= np.floor(frames[0])  # wrapped as s
+        boundary = transform_boundary(boundary, matrix)
+        print(f"<vesta_io>: {args.reduce} cell of {len(s)} sites "
+              f"(from {num_sites}), boundary "
+              f"{' '.join(f'{b:.3f}' for b in boundary)}.")
+
+    vf = VestaFile(s, bond_set, vectors, boundary, plane_list, style_dict,
+                   vector_styles, prune_bonds=args.prune_bonds,
+                   infer_bonds=args.infer_bonds, bond_cache=args.bond_cache,
+                   polyhedra=args.polyhedra)
+    if args.max_displayed:
+        # files of modes, diffs and frames share BOUND, so it is trimmed
+        # for the sites with vectors in any file (on the most crowded
+        # frame) and then shorter vectors are dropped in each file
+        coordination, _ = coordination_numbers(
+            s.lattice.matrix, s.frac_coords, species,
+            vf.blocks["sbond"].bond_lengths)
+        vectors_list = phonon_vectors_list if phonon is not None \
+            else diff_vectors_list
+        shown = [vectors] if vectors_list is None else vectors_list
+        vector_indices = None
+        if any(v is not None for v in shown):
+            vector_indices = np.unique(np.concatenate(
+                [v.indices for v in shown if v is not None]))
+        frac_coords = s.frac_coords
+        if args.interpolate:
+            frac_coords = max(frames, key=lambda frame: estimate_display(
+                frame, boundary, coordination, vector_indices)["total"])
+        estimate = estimate_display(frac_coords, boundary, coordination,
+                                    vector_indices)
+        print(f"<vesta_io>: estimated display: {estimate['atoms']} atoms, "
+              f"{estimate['bonds']} bonds, {estimate['vectors']} vectors.")
+        boundary, actions = trim_boundary(
+            s.lattice.matrix, frac_coords, coordination, boundary,
+            vector_indices, args.max_displayed)
+        for action in actions:
+            print(f"<vesta_io>: {action} "
+                  f"(max_displayed {args.max_displayed}).")
+        blocks = {"boundary": Bound(boundary)} if actions else {}
+        for i, v in enumerate(shown):
+            if v is None:
+                continue
+            trimmed, dropped = drop_shorter_vectors(
+                frac_coords, coordination, boundary, v, args.max_displayed)
+            where = "" if vectors_list is None else f" in file {i + 1}"
+            for action in dropped:
+                print(f"<vesta_io>: {action}{where} "
+                      f"(max_displayed {args.max_displayed}).")
+            if vectors_list is not None:
+                vectors_list[i] = trimmed
+            elif dropped:
+                vectors = trimmed
+                blocks.update(vector_blocks(vectors, vector_styles))
+        if blocks:
+            vf = vf.with_blocks(**blocks)
+    if args.coordination:
+        summary = coordination_summary(s.lattice.matrix, s.frac_coords,
+                                       species,
+                                       vf.blocks["sbond"].bond_lengths)
+        for status in ["under", "over"]:
+            sites = [str(site["index"]) for site in summary
+                     if site["status"] == status]
+            if sites:
+                print(f"<vesta_io>: {status}-coordinated sites: "
+                      f"{' '.join(sites)}")
+        write_coordination_summary(args.coordination, summary)
     filename = args.filename or args.poscar
-    vf.write_file(filename=filename)
+    if args.interpolate:
+        filenames = [f"{filename}_{i:03d}" for i in range(len(frames))]
+        write_vesta_files(vf.frames(species, frames), filenames, args.nprocs)
+    elif phonon is not None:
+        filenames = [f"{filename}_mode{mode:03d}" for mode in phonon["modes"]]
+        write_vesta_files(vf.vector_variants(phonon_vectors_list,
+                                             phonon_styles_list),
+                          filenames, args.nprocs)
+    elif diff_vectors_list is not None:
+        filenames = diff_filenames(filename, args.diff)
+        write_vesta_files(vf.vector_variants(diff_vectors_list,
+                                             diff_styles_list),
+                          filenames, args.nprocs)
+    elif args.variants:
+        write_vesta_files(*variant_vesta_files(vf, s, args, defect, filename),
+                          args.nprocs)
+    else:
+        vf.write_file(filename=filename)
 
 
 if __name__ == "__main__":
@@ -3,3 +3,13 @@
 actual_options = {"atomic": "0  0  1",
                   "ionic": "1  0  1",
                   "all_bold_cell": "0  2  3.000   0   0   0"}
+
+# RGB colors of shared vector types (VECTT)
+vector_palette = ["255 0 0",
+                  "0 0 255",
+                  "0 160 0",
+                  "255 160 0",
+                  "160 0 255",
+                  "0 200 200",
+                  "255 0 255",
+                  "128 80 0"]
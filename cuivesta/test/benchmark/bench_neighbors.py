@@ -0,0 +1,34 @@
+# coding: utf-8
+"""
+Scaling benchmark of the cell-list neighbor search.
+Random sites at a density of 0.08 atoms/A^3 (about that of oxides) in
+cubic cells from 100 to 1M atoms with a 3.0 A cutoff.
+    % python -m cuivesta.test.benchmark.bench_neighbors
+"""
+import timeit
+
+import numpy as np
+
+from cuivesta.utils.neighbors import find_neighbors
+
+density = 0.08
+cutoff = 3.0
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'atoms':>10} {'pairs':>12} {'time':>10} {'us/atom':>10}")
+    for num_sites in [100, 1000, 10000, 100000, 1000000]:
+        length = (num_sites / density) ** (1 / 3)
+        lattice = np.eye(3) * length
+        frac_coords = rng.random((num_sites, 3))
+        neighbors = find_neighbors(lattice, frac_coords, cutoff)
+        time = min(timeit.repeat(
+            lambda: find_neighbors(lattice, frac_coords, cutoff),
+            number=1, repeat=3 if num_sites < 1000000 else 1))
+        print(f"{num_sites:>10} {len(neighbors):>12} {time:>10.4f} "
+              f"{time / num_sites * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
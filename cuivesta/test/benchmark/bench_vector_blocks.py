@@ -0,0 +1,57 @@
+# coding: utf-8
+"""
+Benchmark of VECTR/VECTT rendering.
+    % python -m cuivesta.test.benchmark.bench_vector_blocks
+"""
+import timeit
+
+import numpy as np
+
+from cuivesta.blocks import Vectr, Vectt
+from cuivesta.utils.func_tools import val_to_str_line
+from cuivesta.utils.vector_set import VectorSet
+
+
+def legacy_vectr_repr(vectr: Vectr) -> str:
+    """VECTR rendering by a loop over vectors (before vectorization)"""
+    vectors = []
+    for _key, _vector in vectr.vectors:
+        vector = f'{val_to_str_line(_vector)}'
+        option = f'{_key} {vectr.default_vct_options}'
+        vectors.append(f'{_key} ' + vector)
+        vectors.append(option + vectr.separator)
+        vectors.append(vectr.separator)
+    outs = [f'{vectr.header}', '\n'.join(vectors), '']
+    return "\n".join(outs)
+
+
+def legacy_vectt_repr(vectt: Vectt) -> str:
+    """VECTT rendering by a loop over vectors (before vectorization)"""
+    vector_option = f"{vectt.size} {vectt.color} {vectt.type}"
+    vector_types = [f'{_ + 1} {vector_option}'
+                    for _ in range(vectt.num_of_vectors)]
+    outs = [f'{vectt.header}', '\n'.join(vector_types), '']
+    return "\n".join(outs)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'vectors':>10} {'legacy VECTR':>14} {'VECTR':>10} "
+          f"{'legacy VECTT':>14} {'VECTT':>10}  (sec)")
+    for num_vectors in [1000, 10000, 100000]:
+        vectors = VectorSet.from_array(rng.normal(size=(num_vectors, 3)))
+        vectr = Vectr(vectors)
+        vectt = Vectt(num_vectors)
+        assert repr(vectr) == legacy_vectr_repr(vectr)
+        assert repr(vectt) == legacy_vectt_repr(vectt)
+        times = [min(timeit.repeat(lambda: func(block), number=1, repeat=3))
+                 for func, block in [(legacy_vectr_repr, vectr),
+                                     (repr, vectr),
+                                     (legacy_vectt_repr, vectt),
+                                     (repr, vectt)]]
+        print(f"{num_vectors:>10} {times[0]:>14.4f} {times[1]:>10.4f} "
+              f"{times[2]:>14.4f} {times[3]:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
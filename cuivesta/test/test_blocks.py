@@ -1,8 +1,13 @@
 # coding: utf-8
 
 from pathlib import Path
+import tempfile
 import unittest
 
+import numpy as np
+
+from numpy import testing
+
 from pymatgen.core.structure import Structure
 
 from cuivesta.blocks import (VestaFile,
@@ -14,7 +19,14 @@ from cuivesta.blocks import (VestaFile,
                              Vectr,
                              Vectt,
                              Splan,
-                             Style)
+                             Style,
+                             RenderedBlock,
+                             vector_blocks,
+                             write_vesta_files)
+from cuivesta.utils.vector_set import (VectorSet, overlay_vectors,
+                                       magnitude_classes)
+from cuivesta.test.benchmark.bench_vector_blocks import (legacy_vectr_repr,
+                                                         legacy_vectt_repr)
 
 parent_dir = Path(__file__).parent
 
@@ -43,6 +55,13 @@ class VestaBlockTest(unittest.TestCase):
         expected = 'STRUC\n1 Ba Ba1  1.0  0.500000 0.500000 0.500000\n 0.0 0.0 0.0 \n2 Ti Ti2  1.0  0.000000 0.000000 0.000000\n 0.0 0.0 0.0 \n3 O O3  1.0  0.500000 0.000000 0.000000\n 0.0 0.0 0.0 \n4 O O4  1.0  0.000000 0.000000 0.500000\n 0.0 0.0 0.0 \n5 O O5  1.0  0.000000 0.500000 0.000000\n 0.0 0.0 0.0 \n 0 0 0 0 0 \n'
         self.assertEqual(actual, expected)
 
+    def test_struc_from_arrays(self):
+        s = Structure.from_file(self.poscar)
+        species = [site.species_string for site in s]
+        actual = repr(Struc.from_arrays(species, s.frac_coords))
+        expected = repr(Struc(s))
+        self.assertEqual(actual, expected)
+
     def test_bound(self):
         bound = Bound((0, 2, 0, 2, 0, 2))
         actual = repr(bound)
@@ -55,6 +74,42 @@ class VestaBlockTest(unittest.TestCase):
         expected = 'SBOND\n1 Ti O 0.00000  \t2.707\t 0  1  1  0  1\n 0 0 0 0 \n'
         self.assertEqual(actual, expected)
 
+    def test_sbond_prune(self):
+        sbond = SBond(('Ba', 'Ti', 'O'), None)
+        self.assertEqual(sbond.bond_lengths,
+                         {('Ba', 'O'): (0.0, 3.14795),
+                          ('O', 'O'): (0.0, 1.7),
+                          ('Ti', 'O'): (0.0, 2.35391)})
+        # Ba is far from O, Ti-O is 1.9 A and single O
+        lattice = np.eye(3) * 10.0
+        frac_coords = np.array([[0.5, 0.5, 0.5], [0., 0., 0.],
+                                [0.19, 0., 0.]])
+        sbond.prune(lattice, frac_coords, ['Ba', 'Ti', 'O'])
+        self.assertEqual(sbond.pairs_of_bond, [('Ti', 'O')])
+
+    def test_sbond_infer(self):
+        sbond = SBond(('Ni', 'Al'), {('Ni', 'Al')})
+        self.assertEqual(repr(sbond), 'SBOND\n\n 0 0 0 0 \n')
+        # B2 NiAl, Ni-Al is 2.49 A
+        lattice = np.eye(3) * 2.88
+        frac_coords = np.array([[0., 0., 0.], [0.5, 0.5, 0.5]])
+        sbond.infer(lattice, frac_coords, ['Ni', 'Al'])
+        expected = 'SBOND\n1 Ni Al 0.00000    2.65000  0  1  1  0  1\n' \
+                   ' 0 0 0 0 \n'
+        self.assertEqual(repr(sbond), expected)
+
+    def test_sbond_polyhedra(self):
+        sbond = SBond(('Ba', 'Ti', 'O'), None)
+        sbond.polyhedra_centers = {'O'}
+        expected = 'SBOND\n1 O Ba 0.00000    3.14795  0  1  1  0  1\n' \
+                   '2 O O 0.00000    1.70000  0  1  1  0  1\n' \
+                   '3 O Ti 0.00000    2.35391  0  1  1  0  1\n' \
+                   ' 0 0 0 0 \n'
+        self.assertEqual(repr(sbond), expected)
+        sbond.polyhedra_centers = {'Ti'}
+        self.assertIn('1 Ba O 0.00000    3.14795  0  1  0  0  1', repr(sbond))
+        self.assertIn('3 Ti O 0.00000    2.35391  0  1  1  0  1', repr(sbond))
+
     def test_vectr(self):
         vectr = Vectr({1: [0., 0., 0.],
                        2: [0., 0., -0.1],
@@ -65,12 +120,82 @@ class VestaBlockTest(unittest.TestCase):
         expected = 'VECTR\n1 0.000000 0.000000 0.000000\n1  0 0 0 0  0 0 0 0 0 \n 0 0 0 0 0 \n2 0.000000 0.000000 -0.100000\n2  0 0 0 0  0 0 0 0 0 \n 0 0 0 0 0 \n3 0.000000 0.000000 0.000000\n3  0 0 0 0  0 0 0 0 0 \n 0 0 0 0 0 \n4 0.000000 0.000000 0.000000\n4  0 0 0 0  0 0 0 0 0 \n 0 0 0 0 0 \n5 0.000000 0.000000 0.000000\n5  0 0 0 0  0 0 0 0 0 \n 0 0 0 0 0 \n'
         self.assertEqual(actual, expected)
 
+    def test_vectr_same_as_legacy(self):
+        rng = np.random.default_rng(0)
+        values = rng.normal(scale=100.0, size=(50, 3))
+        values[0] = [-0.0, 1e-9, -1e-9]
+        vectr = Vectr(VectorSet(rng.permutation(50) + 1, values))
+        self.assertEqual(repr(vectr), legacy_vectr_repr(vectr))
+        empty = Vectr(VectorSet.empty())
+        self.assertEqual(repr(empty), legacy_vectr_repr(empty))
+
+    def test_vectt_same_as_legacy(self):
+        for num_vectors in [0, 1, 20]:
+            vectt = Vectt(num_vectors, size=0.25, color="255 0 0")
+            self.assertEqual(repr(vectt), legacy_vectt_repr(vectt))
+
     def test_vectt(self):
         vectt = Vectt(3)
         actual = repr(vectt)
         expected = 'VECTT\n1 0.5 1 1 1 2\n2 0.5 1 1 1 2\n3 0.5 1 1 1 2\n'
         self.assertEqual(actual, expected)
 
+    def test_vectt_from_styles(self):
+        vectt = Vectt.from_styles([(0.25, "255 0 0"), (0.75, "0 0 255")])
+        actual = repr(vectt)
+        expected = 'VECTT\n1 0.25 255 0 0 2\n2 0.75 0 0 255 2\n'
+        self.assertEqual(actual, expected)
+
+    def test_vectr_with_types(self):
+        vectr = Vectr(VectorSet([2, 5], [[0., 0., 0.1], [0., 0., 0.2]],
+                                [1, 1]))
+        actual = repr(vectr)
+        expected = 'VECTR\n1 0.000000 0.000000 0.100000\n2  0 0 0 0  0 0 0 0 0 \n 0 0 0 0 0 \n2 0.000000 0.000000 0.200000\n5  0 0 0 0  0 0 0 0 0 \n 0 0 0 0 0 \n'
+        self.assertEqual(actual, expected)
+        # the same components and type share one entry listing the atoms
+        vectr = Vectr(VectorSet([1, 2, 3], [[0., 0., 0.1], [0., 0., 0.2],
+                                            [0., 0., 0.1]], [2, 1, 2]))
+        actual = repr(vectr)
+        expected = 'VECTR\n1 0.000000 0.000000 0.100000\n1  0 0 0 0  0 0 0 0 0 \n3  0 0 0 0  0 0 0 0 0 \n 0 0 0 0 0 \n2 0.000000 0.000000 0.200000\n2  0 0 0 0  0 0 0 0 0 \n 0 0 0 0 0 \n'
+        self.assertEqual(actual, expected)
+        testing.assert_array_equal(vectr.entry_types, [2, 1])
+
+    def test_vector_blocks_with_types(self):
+        vectors = VectorSet([1, 2, 3, 4], [[0., 0., 0.1], [0., 0., 0.2],
+                                           [0., 0., 0.1], [0., 0., 0.3]],
+                            [1, 2, 1, 2])
+        blocks = vector_blocks(vectors, [(0.25, "255 0 0"), (0.75, "0 0 255")])
+        expected = 'VECTT\n1 0.25 255 0 0 2\n2 0.75 0 0 255 2\n' \
+                   '3 0.75 0 0 255 2\n'
+        self.assertEqual(repr(blocks["vectt"]), expected)
+
+    def test_vector_blocks_vectt_rows(self):
+        # classes share styles, but each distinct vector keeps its own row
+        vectors, styles = magnitude_classes(
+            VectorSet([1, 2, 3, 4, 5], [[0.1, 0., 0.], [0., 0.2, 0.],
+                                        [0., 0., 0.3], [0.6, 0., 0.],
+                                        [0., 0.8, 0.]]), 2)
+        rows = repr(vector_blocks(vectors, styles)["vectt"]).split("\n")[1:-1]
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(len({row.split(" ", 1)[1] for row in rows}), 2)
+        # identical vectors of a class share one row
+        vectors, styles = magnitude_classes(
+            VectorSet([1, 2, 3], [[0., 0., 0.1], [0., 0., 0.1],
+                                  [0., 0., 0.4]]), 2)
+        rows = repr(vector_blocks(vectors, styles)["vectt"]).split("\n")[1:-1]
+        self.assertEqual(len(rows), 2)
+
+    def test_vector_blocks_overlay(self):
+        # the same site in two sources gets the color of each source
+        vectors, styles = overlay_vectors(
+            [VectorSet([1, 2], [[0., 0., 0.1], [0., 0.2, 0.]]),
+             VectorSet([2], [[4., 0., 0.]])])
+        blocks = vector_blocks(vectors, styles)
+        self.assertIn('3 1.000000 0.000000 0.000000\n2 ', repr(blocks["vectr"]))
+        expected = 'VECTT\n1 0.5 255 0 0 2\n2 0.5 255 0 0 2\n' \
+                   '3 0.5 0 0 255 2\n'
+        self.assertEqual(repr(blocks["vectt"]), expected)
+
     def test_splan(self):
         poscar = parent_dir / "POSCAR_BaTiO3"
         s = Structure.from_file(poscar)
@@ -79,6 +204,12 @@ class VestaBlockTest(unittest.TestCase):
         expected = 'SPLAN\n1 1.000000 0.000000 0.000000 3.000000 255 0 255 80\n2 1.000000 1.000000 1.000000 0.908517 255 0 255 80\n  0   0   0   0\n'
         self.assertEqual(actual, expected)
 
+    def test_splan_d_hkls(self):
+        s = Structure.from_file(parent_dir / "POSCAR_BaTiO3")
+        hkls = [[1, 0, 0], [1, 1, 1], [1, -1, 2], [10, 0, 3]]
+        expected = [s.lattice.reciprocal_lattice.d_hkl(hkl) for hkl in hkls]
+        np.testing.assert_array_almost_equal(Splan.d_hkls(s, hkls), expected)
+
     def test_style(self):
         style = Style({"amplitude": 5.0,
                        "atoms": "ionic"})
@@ -97,3 +228,59 @@ class VestaBlockTest(unittest.TestCase):
         with open(poscar_vesta, 'r') as expected_file:
             expected = expected_file.read()
         self.assertEqual(actual, expected)
+
+    def test_vesta_file_prune_bonds(self):
+        s = Structure.from_file(self.poscar)
+        # O-O (2.82 A) is longer than 1.7 A
+        self.assertEqual(VestaFile(s, prune_bonds=True)
+                         .blocks["sbond"].pairs_of_bond,
+                         [('Ba', 'O'), ('Ti', 'O')])
+        s.scale_lattice(s.volume * 8)
+        self.assertEqual(VestaFile(s, prune_bonds=True)
+                         .blocks["sbond"].pairs_of_bond, [])
+
+    def test_vesta_file_keeps_copy_of_structure(self):
+        s = Structure.from_file(self.poscar)
+        expected = repr(VestaFile(s.copy()))
+        vf = VestaFile(s)
+        s.translate_sites([0], [0.1, 0., 0.])
+        s.append("O", [0.25, 0.25, 0.25])
+        self.assertEqual(repr(vf), expected)
+
+    def test_vesta_file_freeze(self):
+        s = Structure.from_file(self.poscar)
+        vf = VestaFile(s, boundary=(0, 2, 0, 2, 0, 2))
+        frozen = vf.freeze()
+        self.assertIsInstance(frozen.blocks["struc"], RenderedBlock)
+        self.assertEqual(repr(frozen), repr(vf))
+
+    def test_vesta_file_frames(self):
+        s = Structure.from_file(self.poscar)
+        species = [site.species_string for site in s]
+        frames = np.array([s.frac_coords, s.frac_coords + 0.1])
+        vfs = VestaFile(s).frames(species, frames)
+        self.assertEqual(len(vfs), 2)
+        self.assertEqual(repr(vfs[0]), repr(VestaFile(s)))
+        self.assertEqual(list(vfs[1].blocks), ["title", "cellp",
+                                               "struc", "sbond"])
+        self.assertIn("1 Ba Ba1  1.0  0.600000 0.600000 0.600000",
+                      repr(vfs[1]))
+
+    def test_vesta_file_vector_variants(self):
+        s = Structure.from_file(self.poscar)
+        vectors_list = [{1: [0., 0., 0.1]}, {2: [0., 0.2, 0.]}]
+        vfs = VestaFile(s).vector_variants(vectors_list)
+        self.assertEqual(len(vfs), 2)
+        self.assertEqual(repr(vfs[1]),
+                         repr(VestaFile(s, vectors=vectors_list[1])))
+
+    def test_write_vesta_files(self):
+        s = Structure.from_file(self.poscar)
+        vfs = [VestaFile(s), VestaFile(s)]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filenames = [str(Path(tmp_dir) / f"POSCAR_{i:03d}")
+                         for i in range(2)]
+            write_vesta_files(vfs, filenames, nprocs=2)
+            for filename in filenames:
+                with open(filename + ".vesta") as vesta_file:
+                    self.assertEqual(vesta_file.read(), repr(VestaFile(s)))
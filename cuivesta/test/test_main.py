@@ -1,26 +1,174 @@
 # coding: utf-8
 
+from pathlib import Path
+import tempfile
 import unittest
+from unittest import mock
 from argparse import Namespace
 
+import numpy as np
+
+from pymatgen.core.structure import Structure
+
 from cuivesta import main
+from cuivesta.blocks import VestaFile, RenderedBlock
+
+parent_dir = Path(__file__).parent
 
 
 class CuiVestaMainTest(unittest.TestCase):
     def test_default_args(self):
         actual = main.parser.parse_args([])
-        expected = Namespace(all_sites=False,
+        expected = Namespace(adx=None,
+                             all_sites=False,
                              amplitude=1.0,
                              atoms='atomic',
+                             auto_boundary=None,
+                             bond_cache=None,
                              bonds=None,
                              boundary='0 1 0 1 0 1',
                              centering=None,
+                             centroid=None,
+                             centroid_radius=None,
+                             coordination=None,
                              defect=False,
                              diff=False,
                              filename=None,
+                             forces=None,
+                             infer_bonds=False,
+                             interpolate=None,
+                             ionic_step=-1,
+                             keep=None,
+                             max_displayed=None,
+                             modes=None,
+                             nprocs=None,
+                             overlay=False,
+                             phonon=None,
+                             plane_through=None,
                              planes=None,
+                             polyhedra=None,
                              poscar='POSCAR',
+                             prune_bonds=False,
+                             qpoint=None,
+                             reduce=None,
+                             select=None,
+                             shells=None,
+                             supercell=None,
+                             unique_vectors=False,
                              vacancy=False,
+                             variants=None,
+                             vector_bins=4,
+                             vector_classes=None,
+                             vector_size=0.5,
                              vectors=None)
         self.assertEqual(actual, expected)
 
+    def test_variant_vesta_files(self):
+        poscar = str(parent_dir / "POSCAR_BaTiO3")
+        s = Structure.from_file(poscar)
+        argv = ["cuivesta", "-p", poscar, "--variants", "variants.txt"]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            variants = Path(tmp_dir) / "variants.txt"
+            variants.write_text("# comment\n"
+                                "--boundary 2 -b Ti-O\n"
+                                "\n"
+                                "--planes 100 -f plane\n")
+            argv[-1] = str(variants)
+            with mock.patch("sys.argv", argv):
+                args = main.parser.parse_args(argv[1:])
+                vfs, filenames = main.variant_vesta_files(
+                    VestaFile(s), s, args, None, "POSCAR")
+        self.assertEqual(filenames, ["POSCAR_variant000", "plane"])
+        # STRUC is rendered once and shared
+        self.assertIsInstance(vfs[0].blocks["struc"], RenderedBlock)
+        self.assertIs(vfs[0].blocks["struc"], vfs[1].blocks["struc"])
+        self.assertEqual(repr(vfs[0]),
+                         repr(VestaFile(s, {("Ti", "O")},
+                                        boundary=[0, 2, 0, 2, 0, 2])))
+        self.assertEqual(repr(vfs[1]),
+                         repr(VestaFile(s, boundary=[0, 1, 0, 1, 0, 1],
+                                        planes=[[1, 0, 0]])))
+
+    def test_variant_vesta_files_filenames(self):
+        poscar = str(parent_dir / "POSCAR_BaTiO3")
+        s = Structure.from_file(poscar)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            variants = Path(tmp_dir) / "variants.txt"
+            argv = ["cuivesta", "-p", poscar, "-f", "main",
+                    "--variants", str(variants)]
+            variants.write_text("--boundary 2\n-f main\n--planes 100\n")
+            with mock.patch("sys.argv", argv):
+                args = main.parser.parse_args(argv[1:])
+                _, filenames = main.variant_vesta_files(
+                    VestaFile(s), s, args, None, "main")
+            self.assertEqual(filenames,
+                             ["main_variant000", "main", "main_variant002"])
+            variants.write_text("-f same\n--boundary 2 -f same\n")
+            with mock.patch("sys.argv", argv):
+                with self.assertRaises(ValueError):
+                    main.variant_vesta_files(VestaFile(s), s, args, None,
+                                             "main")
+
+    def test_variant_vesta_files_unsupported_options(self):
+        poscar = str(parent_dir / "POSCAR_BaTiO3")
+        s = Structure.from_file(poscar)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            variants = Path(tmp_dir) / "variants.txt"
+            argv = ["cuivesta", "-p", poscar, "-v", "1 0 0 1",
+                    "--variants", str(variants)]
+            for line in ["--supercell 2x1x1", "-v '2 0 0 1'",
+                         "--diff POSCAR2", "--select 1", "--keep 1"]:
+                variants.write_text(f"--boundary 2\n{line}\n")
+                with mock.patch("sys.argv", argv):
+                    args = main.parser.parse_args(argv[1:])
+                    with self.assertRaises(ValueError):
+                        main.variant_vesta_files(VestaFile(s), s, args,
+                                                 None, "main")
+            # repeating an option of the command line changes nothing
+            variants.write_text("--boundary 2 -v '1 0 0 1'\n")
+            with mock.patch("sys.argv", argv):
+                args = main.parser.parse_args(argv[1:])
+                _, filenames = main.variant_vesta_files(
+                    VestaFile(s), s, args, None, "main")
+            self.assertEqual(filenames, ["main_variant000"])
+
+    def test_adx_coord_from_args(self):
+        s = Structure.from_file(str(parent_dir / "POSCAR_BaTiO3"))
+        for adx, expected in [("0.5 0.5 0.25", [0.5, 0.5, 0.25]),
+                              ("2", s.frac_coords[1]),
+                              ("2 2", s.frac_coords[1])]:
+            actual = main.adx_coord_from_args(s, Namespace(adx=adx))
+            self.assertEqual(list(actual), list(expected))
+
+    def test_diff_filenames(self):
+        self.assertEqual(main.diff_filenames("POSCAR", ["a/POSCAR2",
+                                                        "a/POSCAR3"]),
+                         ["POSCAR_POSCAR2", "POSCAR_POSCAR3"])
+        self.assertEqual(main.diff_filenames("POSCAR", ["run1/CONTCAR",
+                                                        "run2/CONTCAR"]),
+                         ["POSCAR_run1_CONTCAR", "POSCAR_run2_CONTCAR"])
+        with self.assertRaises(ValueError):
+            main.diff_filenames("POSCAR", ["run1/CONTCAR", "run1/CONTCAR"])
+
+    def test_auto_boundary_from_args_not_positive(self):
+        s = Structure.from_file(str(parent_dir / "POSCAR_BaTiO3"))
+        for options in [["--auto_boundary", "0.0"], ["--shells", "0"],
+                        ["--auto_boundary", "-1"]]:
+            args = main.parser.parse_args(["--centering", "2"] + options)
+            self.assertTrue(main.uses_auto_boundary(args))
+            with self.assertRaises(SystemExit):
+                main.auto_boundary_from_args(s, args, None)
+
+    def test_forces_vectors(self):
+        # monoclinic cell: forces are written in fractional coords
+        lattice = np.array([[4., 0., 0.], [0., 5., 0.], [-1., 0., 6.]])
+        s = Structure(lattice, ["Ti", "O"], [[0, 0, 0], [0.5, 0.5, 0.5]])
+        forces = np.array([[0., 0., 0.], [-0.5, 2.5, 3.]])
+        args = main.parser.parse_args(["--forces", "vasprun.xml"])
+        with mock.patch("cuivesta.main.forces_from_file",
+                        return_value=forces):
+            actual = main.forces_vectors(s, args)
+        np.testing.assert_array_almost_equal(actual.vectors[1],
+                                             [0., 0.5, 0.5])
+        np.testing.assert_array_almost_equal(
+            np.dot(actual.vectors, lattice), forces)
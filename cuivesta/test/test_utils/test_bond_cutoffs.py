@@ -0,0 +1,54 @@
+# coding: utf-8
+
+from pathlib import Path
+import tempfile
+import unittest
+
+import numpy as np
+
+from pymatgen.core.structure import Structure
+
+import cuivesta.utils.bond_cutoffs as bond_cutoffs
+from cuivesta.utils.bond_cutoffs import (lattice_signature,
+                                         infer_bond_cutoffs,
+                                         inferred_sbond_lines)
+
+parent_dir = Path(__file__).parent
+
+
+class BondCutoffsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        s = Structure.from_file(parent_dir / "POSCAR_BaTiO3")
+        self.lattice = s.lattice.matrix
+        self.frac_coords = s.frac_coords
+        self.species = [site.species_string for site in s]
+        bond_cutoffs._cutoff_cache.clear()
+
+    def tearDown(self) -> None:
+        bond_cutoffs._cutoff_cache.clear()
+
+    def test_lattice_signature(self):
+        actual = lattice_signature(self.species, self.lattice)
+        self.assertEqual(actual, "Ba1Ti1O3_3.99_3.99_3.99_90.00_90.00_90.00")
+
+    def test_infer_bond_cutoffs(self):
+        actual = infer_bond_cutoffs(self.lattice, self.frac_coords,
+                                    self.species,
+                                    [('Ba', 'O'), ('Ti', 'O'), ('Ba', 'Ti'),
+                                     ('O', 'O'), ('Ba', 'Mg')])
+        # Ba-O: 2.82 A, Ti-O: 2.00 A, Ba-Ti and O-O are not first shell
+        self.assertEqual(actual, {('Ba', 'O'): 3.0, ('Ti', 'O'): 2.15})
+
+    def test_inferred_sbond_lines(self):
+        pairs = [('Ti', 'O'), ('Ba', 'Ti')]
+        expected = {('Ti', 'O'): "0.00000    2.15000  0  1  1  0  1"}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_file = Path(tmp_dir) / "bonds.json"
+            actual = inferred_sbond_lines(self.lattice, self.frac_coords,
+                                          self.species, pairs, cache_file)
+            self.assertEqual(actual, expected)
+            # cached by signature, positions are not looked at again
+            bond_cutoffs._cutoff_cache.clear()
+            actual = inferred_sbond_lines(self.lattice, np.zeros((5, 3)),
+                                          self.species, pairs, cache_file)
+            self.assertEqual(actual, expected)
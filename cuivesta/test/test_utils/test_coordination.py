@@ -0,0 +1,71 @@
+# coding: utf-8
+
+import csv
+import json
+from pathlib import Path
+import tempfile
+import unittest
+
+import numpy as np
+
+from numpy import testing
+
+from pymatgen.core.structure import Structure
+
+from cuivesta.utils.coordination import (coordination_numbers,
+                                         expected_coordination_numbers,
+                                         coordination_summary,
+                                         write_coordination_summary)
+
+parent_dir = Path(__file__).parent
+
+defect_dir = parent_dir / "Va_Se1_0"
+
+
+class CoordinationTest(unittest.TestCase):
+    def setUp(self) -> None:
+        s = Structure.from_file(parent_dir / "POSCAR_BaTiO3")
+        self.lattice = s.lattice.matrix
+        self.frac_coords = s.frac_coords
+        self.species = [site.species_string for site in s]
+        self.bond_lengths = {('Ba', 'O'): (0.0, 3.14795),
+                             ('Ti', 'O'): (0.0, 2.35391)}
+
+    def test_coordination_numbers(self):
+        cn, mean_lengths = coordination_numbers(
+            self.lattice, self.frac_coords, self.species, self.bond_lengths)
+        # O: 4 Ba and 2 Ti
+        testing.assert_array_equal(cn, [12, 6, 6, 6, 6])
+        self.assertAlmostEqual(mean_lengths[1], 3.9928776341656214 / 2)
+
+    def test_expected_coordination_numbers(self):
+        actual = expected_coordination_numbers(['Mg', 'Mg', 'Mg', 'O'],
+                                               np.array([6, 5, 6, 0]))
+        testing.assert_array_equal(actual, [6, 6, 6, 0])
+
+    def test_coordination_summary_vacancy(self):
+        s = Structure.from_file(defect_dir / "POSCAR")
+        species = [site.species_string for site in s]
+        summary = coordination_summary(s.lattice.matrix, s.frac_coords,
+                                       species, {('Mg', 'Se'): (0., 3.03293)})
+        under = [site["index"] for site in summary
+                 if site["status"] == "under"]
+        # four Mg around the Se vacancy
+        self.assertEqual(under, [1, 9, 17, 25])
+        self.assertEqual(summary[0]["cn"], 3)
+        self.assertEqual(summary[0]["expected_cn"], 4)
+
+    def test_write_coordination_summary(self):
+        summary = coordination_summary(self.lattice, self.frac_coords,
+                                       self.species, self.bond_lengths)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            json_file = Path(tmp_dir) / "cn.json"
+            write_coordination_summary(json_file, summary)
+            with open(json_file) as file:
+                self.assertEqual(json.load(file), summary)
+            csv_file = Path(tmp_dir) / "cn.csv"
+            write_coordination_summary(csv_file, summary)
+            with open(csv_file) as file:
+                rows = list(csv.DictReader(file))
+            self.assertEqual(rows[0]["species"], "Ba")
+            self.assertEqual(rows[0]["cn"], "12")
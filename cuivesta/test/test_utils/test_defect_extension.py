@@ -4,11 +4,17 @@ from pathlib import Path
 import unittest
 import copy
 
+import numpy as np
+
+from numpy import testing
+
 from pymatgen.core.structure import Structure
+from pymatgen.util.coord import pbc_shortest_vectors
 
 from monty.serialization import loadfn
 
-from cuivesta.utils.defect_extension import (SDefect,
+from cuivesta.utils.defect_extension import (get_displacements,
+                                             SDefect,
                                              add_vacancy_to_structure,
                                              replace_dummy_to_xx,
                                              defect_induced_displacement_vectors)
@@ -24,7 +30,7 @@ class DefectExtensionTest(unittest.TestCase):
         de = loadfn(defect_dir / "defect_entry.json")
         sd = SDefect(s, de)
         print(sd)
-        self.assertEqual(len(repr(sd)), 7462)
+        self.assertEqual(len(repr(sd)), 7576)
 
     def test_add_vacancy_to_structure(self):
         s = Structure.from_file(defect_dir / "CONTCAR-finish")
@@ -45,8 +51,22 @@ class DefectExtensionTest(unittest.TestCase):
         de = loadfn(defect_dir / "defect_entry.json")
         sd = SDefect(s, de)
         actual = defect_induced_displacement_vectors(sd, False)
+        # cartesian displacements (A), written as fractional vectors
         expected = {1: [0.135544575238062, 0.1328422727231546, 0.13580732052833855],
                     9: [-0.12598887820809024, -0.1299492678927452, 0.1303079120927934],
                     17: [-0.15074928879118676, 0.1521800279487935, -0.14457211955231042],
                     25: [0.1220996954162643, -0.12347033953810893, -0.11863793386708155]}
-        self.assertEqual(actual, expected)
+        testing.assert_array_equal(actual.indices, list(expected))
+        testing.assert_array_almost_equal(
+            np.dot(actual.vectors, sd.initial_structure.lattice.matrix),
+            list(expected.values()), decimal=12)
+
+    def test_get_displacements(self):
+        s1 = Structure.from_file(parent_dir / "diff" / "POSCAR1")
+        s2 = Structure.from_file(parent_dir / "diff" / "POSCAR2")
+        s2.translate_sites([0], [0.9, 0.0, 0.0])
+        actual = get_displacements(s2, s1)
+        expected = [pbc_shortest_vectors(s1.lattice, initial.frac_coords,
+                                         final.frac_coords)[0][0]
+                    for final, initial in zip(s2, s1)]
+        testing.assert_array_almost_equal(actual, expected)
@@ -0,0 +1,95 @@
+# coding: utf-8
+
+from pathlib import Path
+import unittest
+
+import numpy as np
+
+from numpy import testing
+
+from pymatgen.core.structure import Structure
+
+from cuivesta.utils.display_budget import (image_counts,
+                                           estimate_display,
+                                           trim_boundary,
+                                           drop_shorter_vectors)
+from cuivesta.utils.vector_set import VectorSet
+
+parent_dir = Path(__file__).parent
+
+
+class DisplayBudgetTest(unittest.TestCase):
+    def setUp(self) -> None:
+        s = Structure.from_file(parent_dir / "POSCAR_BaTiO3")
+        self.lattice = s.lattice.matrix
+        self.frac_coords = s.frac_coords
+        # Ba: 12 O, Ti: 6 O, O: 4 Ba and 2 Ti
+        self.coordination = np.array([12, 6, 6, 6, 6])
+        self.vectors = VectorSet([1, 2], [[0., 0., 0.1], [0., 0., 0.2]])
+
+    def test_image_counts(self):
+        # Ti at the origin, O at the faces
+        actual = image_counts(self.frac_coords, [0, 1, 0, 1, 0, 1])
+        testing.assert_array_equal(actual, [1, 8, 4, 4, 4])
+        actual = image_counts(self.frac_coords, [-0.5, 0.5] * 3)
+        testing.assert_array_equal(actual, [8, 1, 2, 2, 2])
+
+    def test_estimate_display(self):
+        actual = estimate_display(self.frac_coords, [0, 1, 0, 1, 0, 1],
+                                  self.coordination, self.vectors.indices)
+        self.assertEqual(actual, {"atoms": 21, "bonds": 66, "vectors": 9,
+                                  "total": 96})
+
+    def test_trim_boundary_not_needed(self):
+        boundary, actions = trim_boundary(
+            self.lattice, self.frac_coords, self.coordination,
+            np.array([0, 1, 0, 1, 0, 1]), self.vectors.indices, 1000)
+        self.assertEqual(actions, [])
+        testing.assert_array_equal(boundary, [0, 1, 0, 1, 0, 1])
+
+    def test_trim_boundary_shrink(self):
+        boundary, actions = trim_boundary(
+            self.lattice, self.frac_coords, self.coordination,
+            np.array([0, 4, 0, 4, 0, 4]), self.vectors.indices, 300)
+        self.assertEqual(len(actions), 1)
+        actual = estimate_display(self.frac_coords, boundary,
+                                  self.coordination, self.vectors.indices)
+        self.assertLessEqual(actual["total"], 300)
+        # shrunk about the center
+        testing.assert_array_almost_equal(
+            boundary.reshape(3, 2).mean(axis=1), [2., 2., 2.])
+
+    def test_trim_boundary_sphere_and_drop_vectors(self):
+        # sphere around Ti at (0.5, 0.5, 0.5) + (0.5, 0.5, 0.5) has only Ti
+        boundary, actions = trim_boundary(
+            self.lattice, self.frac_coords, self.coordination,
+            np.array([0, 2, 0, 2, 0, 2]), self.vectors.indices, 3)
+        self.assertEqual(len(actions), 2)
+        vectors, dropped = drop_shorter_vectors(
+            self.frac_coords, self.coordination, boundary, self.vectors, 3)
+        self.assertEqual(len(dropped), 1)
+        self.assertEqual(len(vectors), 0)
+
+    def test_trim_boundary_shared(self):
+        # BOUND fitted to sites with vectors in any of files
+        boundary, actions = trim_boundary(
+            self.lattice, self.frac_coords, self.coordination,
+            np.array([0, 4, 0, 4, 0, 4]), np.array([1, 2, 3]), 300)
+        self.assertEqual(len(actions), 1)
+        for vectors in [VectorSet([1], [[0., 0., 0.1]]),
+                        VectorSet([2, 3], [[0., 0.1, 0.], [0.1, 0., 0.]])]:
+            actual = estimate_display(self.frac_coords, boundary,
+                                      self.coordination, vectors.indices)
+            self.assertLessEqual(actual["total"], 300)
+
+    def test_drop_shorter_vectors(self):
+        boundary = np.array([0, 1, 0, 1, 0, 1])
+        vectors, actions = drop_shorter_vectors(
+            self.frac_coords, self.coordination, boundary, self.vectors, 96)
+        self.assertIs(vectors, self.vectors)
+        self.assertEqual(actions, [])
+        # 87 without vectors, the longer one on Ti (8 images) fits
+        vectors, actions = drop_shorter_vectors(
+            self.frac_coords, self.coordination, boundary, self.vectors, 95)
+        testing.assert_array_equal(vectors.indices, [2])
+        self.assertEqual(actions, ["1 shorter vectors dropped"])
@@ -1,22 +1,35 @@
 # coding: utf-8
 
 from pathlib import Path
+import tempfile
 import unittest
 
 import numpy as np
 
 from numpy import array, testing
 
-from pymatgen.core.structure import Structure
+from pymatgen.core.lattice import Lattice
+from pymatgen.core.structure import Structure, StructureError
 
 from cuivesta.utils.func_tools import (val_to_str_line,
                                        structure_to_dict_for_vesta,
                                        make_visible_bond_set,
                                        make_plane_list,
+                                       parse_plane,
+                                       expand_plane_list,
+                                       rational_hkl,
+                                       fit_plane_through_sites,
                                        plane_option_parse,
                                        vector_option_parse,
+                                       text_vector_parse,
                                        structure_diff_vectors,
+                                       multi_structure_diff_vectors,
+                                       interpolate_frac_coords,
                                        centering_atom,
+                                       periodic_centroid,
+                                       images_within_sphere,
+                                       sphere_boundary,
+                                       shell_radius,
                                        boundary_option_preparse)
 
 parent_dir = Path(__file__).parent
@@ -52,6 +65,70 @@ class FuncToolsTest(unittest.TestCase):
         expected = [1, 1, 1, 3.3]
         self.assertEqual(actual, expected)
 
+    def test_parse_plane(self):
+        self.assertEqual(parse_plane("111"), ([1, 1, 1], None, False))
+        self.assertEqual(parse_plane("1,-1,10-3.0"), ([1, -1, 10], 3.0, False))
+        self.assertEqual(parse_plane("1,-1,-2"), ([1, -1, -2], None, False))
+        self.assertEqual(parse_plane("{110}-2"), ([1, 1, 0], 2.0, True))
+        for plane in ["1-10", "{110", "1,1"]:
+            with self.assertRaises(ValueError):
+                parse_plane(plane)
+        with self.assertRaises(ValueError):
+            make_plane_list("{110}")
+
+    def test_expand_plane_list(self):
+        s = Structure.from_file(parent_dir / "POSCAR_BaTiO3")
+        actual = expand_plane_list(s, ["{110}-2.0", "0,0,-1"])
+        expected = [[1, 1, 0, 2.0], [1, 0, 1, 2.0], [1, 0, -1, 2.0],
+                    [1, -1, 0, 2.0], [0, 1, 1, 2.0], [0, 1, -1, 2.0],
+                    [0, 0, -1]]
+        self.assertEqual(actual, expected)
+
+    def test_rational_hkl(self):
+        testing.assert_array_equal(rational_hkl([0.5, -1.0, 0.0]), [1, -2, 0])
+        testing.assert_array_equal(rational_hkl([0.334, 0.0, 1.01]),
+                                   [1, 0, 3])
+
+    def test_fit_plane_through_sites(self):
+        # hexagonal cell, sites on (001) at z = 0.25 across the boundary
+        lattice = np.array([[3.0, 0.0, 0.0],
+                            [-1.5, 3.0 * np.sqrt(3) / 2, 0.0],
+                            [0.0, 0.0, 8.0]])
+        frac_coords = np.array([[0.1, 0.1, 0.25], [0.95, 0.2, 0.25],
+                                [0.3, 0.9, 1.25], [0.5, 0.5, 0.26]])
+        hkl, d, rms = fit_plane_through_sites(lattice, frac_coords, [1, 2, 3])
+        self.assertEqual(hkl, [0, 0, 1])
+        self.assertAlmostEqual(d, 2.0)
+        self.assertAlmostEqual(rms, 0.0)
+        hkl, d, rms = fit_plane_through_sites(lattice, frac_coords,
+                                              [1, 2, 3, 4])
+        self.assertEqual(hkl, [0, 0, 1])
+        self.assertAlmostEqual(d, 2.02)
+        self.assertTrue(0.0 < rms < 0.08)
+        # (1-10) through the origin, sign is canonical
+        frac_coords = np.array([[0., 0., 0.], [0.3, 0.3, 0.], [0., 0., 0.4],
+                                [0.2, 0.2, 0.3]])
+        hkl, d, rms = fit_plane_through_sites(lattice, frac_coords,
+                                              [1, 2, 3, 4])
+        self.assertEqual(hkl, [1, -1, 0])
+        self.assertAlmostEqual(d, 0.0)
+        with self.assertRaises(ValueError):
+            fit_plane_through_sites(lattice, frac_coords, [1, 2])
+        # plane h.x = 1 is at d_hkl as the default d of --planes
+        frac_coords = np.array([[0.5, 0.5, 0.], [0.5, 0., 0.5],
+                                [0., 0.5, 0.5]])
+        hkl, d, rms = fit_plane_through_sites(lattice, frac_coords, [1, 2, 3])
+        self.assertEqual(hkl, [1, 1, 1])
+        self.assertAlmostEqual(d, Lattice(lattice).d_hkl([1, 1, 1]))
+
+    def test_fit_plane_through_sites_error(self):
+        lattice = np.eye(3) * 4.0
+        frac_coords = np.array([[0., 0., 0.], [0.1, 0.1, 0.], [0.2, 0.2, 0.],
+                                [0., 0.1, 0.2]])
+        for site_indices in [[0, 1, 2], [1, 2, 5], [1, 2, 3], [4, 4, 4]]:
+            with self.assertRaises(ValueError):
+                fit_plane_through_sites(lattice, frac_coords, site_indices)
+
     def test_multi_plane_option_parse(self):
         path = parent_dir
         actual = plane_option_parse(["test_plane.txt", "111"], path)
@@ -60,17 +137,75 @@ class FuncToolsTest(unittest.TestCase):
 
     def test_multi_vector_option_parse_1(self):
         path = parent_dir / "test_vector_1.txt"
-        actual = vector_option_parse(path, 2)
+        actual = vector_option_parse(path, 3).to_dict()
         expected = {2: [1.0, 1.0, 1.0], 3: [1.0, 0.0, 0.0]}
         self.assertEqual(actual, expected)
+        with self.assertRaises(StructureError):
+            vector_option_parse(path, 2)  # index 3 is out of range
 
     def test_multi_vector_option_parse_2(self):
         path = parent_dir / "test_vector_2.txt"
-        actual = vector_option_parse(path, 2)
+        actual = vector_option_parse(path, 2).to_dict()
         expected = {1: [3.0, 3.0, 3.0], 2: [2.0, 2.0, 2.0]}
         self.assertEqual(actual, expected)
 
 
+    def test_text_vector_parse_chunks(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "vector.txt"
+            with open(path, "w") as vct_file:
+                vct_file.write("# comment\n\n1 0 0\n0\t2  0 # comment\n"
+                               "\n  0 0 3\n")
+            actual = text_vector_parse(path, 3, chunk_lines=2)
+            testing.assert_array_equal(actual.indices, [1, 2, 3])
+            testing.assert_array_equal(actual.norms, [1., 2., 3.])
+
+    def test_text_vector_parse_mixed_columns(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "vector.txt"
+            with open(path, "w") as vct_file:
+                vct_file.write("1 0 0 1\n2 0 0\n")
+            with self.assertRaises(StructureError):
+                text_vector_parse(path, 2, chunk_lines=1)
+            with self.assertRaises(StructureError):
+                text_vector_parse(path, 2)
+
+    def test_binary_vector_parse_npy(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "field.npy"
+            np.save(path, np.arange(15, dtype=float).reshape(5, 3))
+            actual = vector_option_parse(path, 5)
+            testing.assert_array_equal(actual.indices, [1, 2, 3, 4, 5])
+            testing.assert_array_equal(actual.vectors[1], [3., 4., 5.])
+            self.assertFalse(actual.vectors.flags.owndata)  # memory map
+            del actual
+            with self.assertRaises(StructureError):
+                vector_option_parse(path, 4)
+
+    def test_binary_vector_parse_npy_with_index(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "field.npy"
+            np.save(path, np.array([[2, 1., 1., 1.], [3, 1., 0., 0.]]))
+            actual = vector_option_parse(path, 3).to_dict()
+            expected = {2: [1.0, 1.0, 1.0], 3: [1.0, 0.0, 0.0]}
+            self.assertEqual(actual, expected)
+            for index in [0, 4, 2.5]:
+                np.save(path, np.array([[index, 1., 1., 1.]]))
+                with self.assertRaises(StructureError):
+                    vector_option_parse(path, 3)
+
+    def test_binary_vector_parse_npz(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "field.npz"
+            np.savez(path, indices=np.array([2, 3]),
+                     vectors=np.array([[1., 1., 1.], [1., 0., 0.]]))
+            actual = vector_option_parse(path, 3).to_dict()
+            expected = {2: [1.0, 1.0, 1.0], 3: [1.0, 0.0, 0.0]}
+            self.assertEqual(actual, expected)
+            with self.assertRaises(StructureError):
+                vector_option_parse(path, 2)
+
+
 # using numpy.testing
 def test_structure_diff_vectors():
     test_dir = parent_dir / "diff"
@@ -82,8 +217,38 @@ def test_structure_diff_vectors():
                 3: array([0., 0., 0.]),
                 4: array([0., 0., 0.]),
                 5: array([0., 0., 0.])}
-    for _key in actual:
-        testing.assert_array_equal(actual[_key], expected[_key])
+    testing.assert_array_equal(actual.indices, list(expected))
+    for _key, _vector in actual:
+        testing.assert_array_equal(_vector, expected[_key])
+
+
+def test_multi_structure_diff_vectors():
+    test_dir = parent_dir / "diff"
+    s1 = Structure.from_file(test_dir / "POSCAR1")
+    s2 = Structure.from_file(test_dir / "POSCAR2")
+    actual = multi_structure_diff_vectors(s1, [s2, s1, s2])
+    assert actual.shape == (3, 5, 3)
+    testing.assert_array_equal(actual[0, 1], [0., 0., -0.1])
+    testing.assert_array_equal(actual[1], np.zeros((5, 3)))
+    testing.assert_array_equal(actual[2], actual[0])
+
+
+def test_interpolate_frac_coords():
+    test_dir = parent_dir / "diff"
+    s1 = Structure.from_file(test_dir / "POSCAR1")
+    s2 = Structure.from_file(test_dir / "POSCAR2")
+    actual = interpolate_frac_coords(s1, s2, 3)
+    assert actual.shape == (3, 5, 3)
+    testing.assert_array_almost_equal(actual[0], s1.frac_coords)
+    testing.assert_array_almost_equal(actual[1, 1], [0.0, 0.0, 0.05])
+    testing.assert_array_almost_equal(actual[2, 1], [0.0, 0.0, 0.1])
+
+
+def test_interpolate_frac_coords_pbc():
+    s1 = Structure([[3, 0, 0], [0, 3, 0], [0, 0, 3]], ["H"], [[0.9, 0, 0]])
+    s2 = Structure([[3, 0, 0], [0, 3, 0], [0, 0, 3]], ["H"], [[0.1, 0, 0]])
+    actual = interpolate_frac_coords(s1, s2, 3)
+    testing.assert_array_almost_equal(actual[:, 0, 0], [0.9, 1.0, 1.1])
 
 
 def test_centering_atom():
@@ -93,6 +258,15 @@ def test_centering_atom():
     testing.assert_array_equal(actual, expected)
 
 
+def test_periodic_centroid():
+    frac_coords = np.array([[0.95, 0.5, 0.0], [0.05, 0.5, 0.0],
+                            [0.0, 0.6, 0.9]])
+    actual = periodic_centroid(frac_coords, [0, 1, 2])
+    testing.assert_array_almost_equal(actual, [1.0, 1.6 / 3, -0.1 / 3])
+    actual = periodic_centroid(frac_coords, [1], reference=[0.9, 0.5, 0.0])
+    testing.assert_array_almost_equal(actual, [1.05, 0.5, 0.0])
+
+
 def test_boundary_option_preparse1():
     actual = boundary_option_preparse("1/2")
     expected = np.array([0.0, 0.5, 0.0, 0.5, 0.0, 0.5])
@@ -105,3 +279,40 @@ def test_boundary_option_preparse2():
     testing.assert_array_equal(actual, expected)
 
 
+def test_images_within_sphere():
+    s = Structure.from_file(parent_dir / "POSCAR_BaTiO3")
+    # 6 O around Ti and Ti itself
+    images, site_indices, distances = images_within_sphere(
+        s.lattice.matrix, s.frac_coords, s.frac_coords[1], 2.1)
+    testing.assert_array_equal(np.sort(site_indices), [1, 2, 2, 3, 3, 4, 4])
+    testing.assert_array_almost_equal(
+        np.sort(distances), [0.0] + [3.9928776341656214 / 2] * 6)
+
+
+def test_sphere_boundary():
+    s = Structure.from_file(parent_dir / "POSCAR_BaTiO3")
+    actual = sphere_boundary(s.lattice.matrix, s.frac_coords,
+                             s.frac_coords[1], 2.1)
+    testing.assert_array_almost_equal(actual, [-0.501, 0.501] * 3)
+
+
+def test_sphere_boundary_without_sites():
+    # skewed cell, a sphere of radius 1.0 A at the origin has no site
+    lattice = np.array([[4., 0., 0.], [2., 4., 0.], [0., 0., 5.]])
+    actual = sphere_boundary(lattice, np.array([[0.5, 0.5, 0.5]]),
+                             np.zeros(3), 1.0)
+    half_widths = 1.0 / np.array([4 * 4 / np.sqrt(20), 4., 5.])
+    testing.assert_array_almost_equal(
+        actual, np.column_stack([-half_widths, half_widths]).reshape(-1))
+
+
+def test_shell_radius():
+    s = Structure.from_file(parent_dir / "POSCAR_BaTiO3")
+    # Ti: O at 2.00 A, Ba at 3.46 A
+    radius = shell_radius(s.lattice.matrix, s.frac_coords,
+                          s.frac_coords[1], 2)
+    assert abs(radius - (3.9928776341656214 * np.sqrt(3) / 2 + 0.01)) < 1e-8
+    # Ba: nothing but itself within the first guess of radius
+    radius = shell_radius(s.lattice.matrix, s.frac_coords,
+                          s.frac_coords[0], 1)
+    assert abs(radius - (3.9928776341656214 * np.sqrt(2) / 2 + 0.01)) < 1e-8
@@ -0,0 +1,119 @@
+# coding: utf-8
+
+import itertools
+from pathlib import Path
+import unittest
+
+import numpy as np
+
+from numpy import testing
+
+from pymatgen.core.structure import Structure
+
+from cuivesta.utils.neighbors import (NeighborList,
+                                      perpendicular_widths,
+                                      find_neighbors,
+                                      species_pairs_within)
+
+parent_dir = Path(__file__).parent
+
+
+def brute_force_pairs(lattice, frac_coords, cutoff, reach=4):
+    """(i, j, image) of all pairs by looping over images up to reach"""
+    images = np.array(list(itertools.product(range(-reach, reach + 1),
+                                             repeat=3)))
+    pairs = []
+    for i, center in enumerate(frac_coords):
+        cart = np.dot(frac_coords[None, :, :] + images[:, None, :] - center,
+                      lattice)
+        distances = np.linalg.norm(cart, axis=2)
+        for image, j in zip(*np.nonzero(distances <= cutoff)):
+            if i != j or images[image].any():
+                pairs.append((i, j) + tuple(images[image]))
+    return sorted(pairs)
+
+
+def neighbor_pairs(neighbors: NeighborList):
+    return sorted((i, j) + tuple(image) for i, j, image
+                  in zip(neighbors.centers.tolist(),
+                         neighbors.indices.tolist(),
+                         neighbors.images.tolist()))
+
+
+class FindNeighborsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.rng = np.random.default_rng(0)
+
+    def test_perpendicular_widths(self):
+        lattice = np.array([[2., 0., 0.], [1., 3., 0.], [0., 0., 4.]])
+        testing.assert_array_almost_equal(perpendicular_widths(lattice),
+                                          [6 / np.sqrt(10), 3., 4.])
+
+    def test_skewed_cell(self):
+        lattice = np.array([[5., 0., 0.], [4., 3., 0.], [1., 2., 4.]])
+        frac_coords = self.rng.random((30, 3))
+        actual = find_neighbors(lattice, frac_coords, 3.0)
+        self.assertEqual(neighbor_pairs(actual),
+                         brute_force_pairs(lattice, frac_coords, 3.0))
+
+    def test_cutoff_longer_than_cell(self):
+        lattice = np.eye(3) * 3.0
+        frac_coords = self.rng.random((4, 3))
+        actual = find_neighbors(lattice, frac_coords, 7.0)
+        self.assertEqual(neighbor_pairs(actual),
+                         brute_force_pairs(lattice, frac_coords, 7.0))
+
+    def test_unwrapped_frac_coords(self):
+        lattice = np.diag([10., 10., 3.])
+        frac_coords = self.rng.random((40, 3)) * 1.4 - 0.2
+        actual = find_neighbors(lattice, frac_coords, 2.5)
+        self.assertEqual(neighbor_pairs(actual),
+                         brute_force_pairs(lattice, frac_coords, 2.5))
+        cart = np.dot(frac_coords[actual.indices] + actual.images
+                      - frac_coords[actual.centers], lattice)
+        testing.assert_array_almost_equal(np.linalg.norm(cart, axis=1),
+                                          actual.distances)
+
+    def test_pymatgen_neighbors(self):
+        s = Structure.from_file(parent_dir / "POSCAR_BaTiO3")
+        actual = find_neighbors(s.lattice.matrix, s.frac_coords, 3.0)
+        expected = [len(n) for n in s.get_all_neighbors(3.0)]
+        testing.assert_array_equal(actual.counts, expected)
+        indices, _, distances = actual.neighbors_of(1)
+        self.assertTrue(np.all(np.diff(distances[indices == indices[0]])
+                               >= 0.0))
+
+    def test_filter(self):
+        lattice = np.eye(3) * 4.0
+        frac_coords = self.rng.random((10, 3))
+        neighbors = find_neighbors(lattice, frac_coords, 4.0)
+        actual = neighbors.filter(neighbors.distances <= 2.0)
+        expected = find_neighbors(lattice, frac_coords, 2.0)
+        testing.assert_array_equal(actual.indptr, expected.indptr)
+        testing.assert_array_equal(actual.indices, expected.indices)
+        testing.assert_array_equal(actual.images, expected.images)
+
+    def test_empty(self):
+        actual = find_neighbors(np.eye(3), np.zeros((2, 3)), 0.0)
+        self.assertEqual(len(actual), 0)
+        testing.assert_array_equal(actual.counts, [0, 0])
+
+
+class SpeciesPairsWithinTest(unittest.TestCase):
+    def test_species_pairs_within(self):
+        lattice = np.eye(3) * 4.0
+        frac_coords = np.array([[0., 0., 0.], [0.5, 0., 0.],
+                                [0.5, 0.5, 0.5]])
+        species = ['Ti', 'O', 'Ba']
+        bond_lengths = {('Ti', 'O'): (0.0, 2.1),  # 2.0 A
+                        ('Ba', 'O'): (0.0, 2.5),  # 2.83 A
+                        ('O', 'O'): (0.0, 3.0),  # 4.0 A (image)
+                        ('Ti', 'Mg'): (0.0, 3.0)}
+        actual = species_pairs_within(lattice, frac_coords, species,
+                                      bond_lengths)
+        self.assertEqual(actual, {('Ti', 'O')})
+        bond_lengths[('O', 'O')] = (0.0, 4.0)
+        bond_lengths[('Ti', 'O')] = (2.5, 2.8)  # min excludes 2.0 A
+        actual = species_pairs_within(lattice, frac_coords, species,
+                                      bond_lengths)
+        self.assertEqual(actual, {('O', 'O')})
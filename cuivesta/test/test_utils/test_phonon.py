@@ -0,0 +1,113 @@
+# coding: utf-8
+
+from pathlib import Path
+import unittest
+
+import numpy as np
+
+from numpy import testing
+
+from cuivesta.utils.phonon import (parse_phonon_yaml,
+                                   bloch_eigenvectors,
+                                   mode_displacement_vectors)
+from cuivesta.utils.supercell import lattice_translations, tile_vectors
+from cuivesta.utils.vector_set import VectorSet
+
+parent_dir = Path(__file__).parent
+
+phonon_dir = parent_dir / "phonon"
+
+
+class PhononTest(unittest.TestCase):
+    def test_parse_phonon_yaml_gamma(self):
+        actual = parse_phonon_yaml(phonon_dir / "qpoints.yaml")
+        testing.assert_array_equal(actual["q_position"], [0., 0., 0.])
+        self.assertEqual(actual["modes"], list(range(1, 16)))
+        self.assertEqual(actual["eigenvectors"].shape, (15, 5, 3))
+        self.assertAlmostEqual(actual["frequencies"][0], -2.3675761471)
+        testing.assert_array_almost_equal(
+            actual["eigenvectors"][0, 1].real,
+            [-0.06796717207255, -0.20770682527929, 0.26924919655261])
+
+    def test_parse_phonon_yaml_selected_modes(self):
+        actual = parse_phonon_yaml(phonon_dir / "qpoints.yaml",
+                                   qpoint=2, modes=[2, 15])
+        testing.assert_array_equal(actual["q_position"], [0.5, 0., 0.])
+        self.assertEqual(actual["modes"], [2, 15])
+        self.assertEqual(actual["eigenvectors"].shape, (2, 5, 3))
+
+    def test_parse_phonon_yaml_missing_mode(self):
+        with self.assertRaises(ValueError):
+            parse_phonon_yaml(phonon_dir / "qpoints.yaml", modes=[16])
+
+
+def test_mode_displacement_vectors():
+    eigenvectors = np.array([[[1., 0., 0.], [0., 2., 0.]]]) + 0j
+    actual = mode_displacement_vectors(eigenvectors, np.array([1.0, 16.0]),
+                                       np.diag([4.0, 2.0, 2.0]))
+    # 1 A and 0.5 A in fractional coords
+    expected = np.array([[[0.25, 0., 0.], [0., 0.25, 0.]]])
+    testing.assert_array_almost_equal(actual, expected)
+
+
+def test_bloch_eigenvectors_zone_boundary():
+    # q = (0.5, 0, 0) in 2x1x1 cell: the images move in antiphase
+    eigenvectors = np.array([[[1., 0., 0.], [0., 1., 0.]]]) + 0j
+    frac_coords = np.array([[0., 0., 0.], [0.5, 0., 0.]])
+    translations = lattice_translations(np.diag([2, 1, 1]))
+    actual = bloch_eigenvectors(eigenvectors, frac_coords,
+                                np.array([0.5, 0., 0.]), translations)
+    # phase of the image position: x = 0.5 and 1.5 of the second site
+    expected = np.array([[[1., 0., 0.], [-1., 0., 0.],
+                          [0., 1j, 0.], [0., -1j, 0.]]])
+    testing.assert_array_almost_equal(actual, expected)
+
+
+def test_bloch_eigenvectors_gamma():
+    eigenvectors = np.array([[[1., 0.5j, 0.]]])
+    actual = bloch_eigenvectors(eigenvectors, np.zeros((1, 3)),
+                                np.zeros(3),
+                                lattice_translations(np.diag([2, 1, 1])))
+    testing.assert_array_almost_equal(actual, np.repeat(eigenvectors, 2,
+                                                        axis=1))
+
+
+def test_mode_displacement_vectors_in_supercell():
+    # the longest arrow stays 1 A in the 2x1x1 supercell of a non-cubic cell
+    lattice = np.array([[4., 0., 0.], [0., 5., 0.], [-1., 0., 6.]])
+    matrix = np.diag([2, 1, 1])
+    eigenvectors = np.array([[[0.6, 0., 0.8], [0., 0.5, 0.]]]) + 0j
+    frac_coords = np.array([[0., 0., 0.], [0.5, 0.5, 0.5]])
+    masses = np.array([1.0, 1.0])
+    displacements = mode_displacement_vectors(
+        bloch_eigenvectors(eigenvectors, frac_coords, np.zeros(3),
+                           lattice_translations(matrix)),
+        np.repeat(masses, 2), lattice)[0]
+    tiled = tile_vectors(VectorSet.from_array(
+        mode_displacement_vectors(eigenvectors, masses, lattice)[0]),
+        matrix, displacements)
+    norms = np.linalg.norm(np.dot(tiled.vectors, np.dot(matrix, lattice)),
+                           axis=1)
+    testing.assert_array_almost_equal(norms, [1., 1., 0.5, 0.5])
+
+
+def test_mode_displacement_vectors_zone_boundary():
+    # q = (0.5, 0, 0) in 2x1x1 supercell: real eigenvector of the atom at
+    # x = 0.5 gets the phases i and -i, whose real parts are zero
+    eigenvectors = np.array([[[0., 0., 0.], [1., 0., 0.]]]) + 0j
+    frac_coords = np.array([[0., 0., 0.], [0.5, 0., 0.]])
+    translations = lattice_translations(np.diag([2, 1, 1]))
+    bloch = bloch_eigenvectors(eigenvectors, frac_coords,
+                               np.array([0.5, 0., 0.]), translations)
+    actual = mode_displacement_vectors(bloch, np.ones(4), np.eye(3))
+    testing.assert_array_almost_equal(np.abs(actual[0]),
+                                      [[0., 0., 0.], [0., 0., 0.],
+                                       [1., 0., 0.], [1., 0., 0.]])
+    # the two images move in antiphase
+    testing.assert_array_almost_equal(actual[0, 2], -actual[0, 3])
+
+
+def test_mode_displacement_vectors_zero():
+    eigenvectors = np.array([[[1e-17, 0., 0.], [0., 1e-17j, 0.]]])
+    actual = mode_displacement_vectors(eigenvectors, np.ones(2), np.eye(3))
+    testing.assert_array_equal(actual, np.zeros((1, 2, 3)))
@@ -0,0 +1,97 @@
+# coding: utf-8
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from numpy import testing
+
+from pymatgen.core.structure import Structure
+
+from cuivesta.utils.reduced_cell import (pure_translations,
+                                         translation_basis,
+                                         reduction_matrix,
+                                         reduce_structure,
+                                         reduce_arrays,
+                                         transform_boundary,
+                                         transform_hkl)
+
+parent_dir = Path(__file__).parent
+
+
+@pytest.fixture
+def fcc():
+    return Structure(np.eye(3) * 3.6, ["Cu"] * 4,
+                     [[0, 0, 0], [0, .5, .5], [.5, 0, .5], [.5, .5, 0]])
+
+
+def test_pure_translations(fcc):
+    actual = pure_translations(fcc)
+    testing.assert_array_almost_equal(
+        actual[np.lexsort(actual.T)],
+        [[0, 0, 0], [.5, .5, 0], [.5, 0, .5], [0, .5, .5]])
+
+
+def test_translation_basis():
+    actual = translation_basis(np.array([[0, 0, 0], [.5, .5, .5]]))
+    assert np.isclose(abs(np.linalg.det(actual)), 0.5)
+    # unit vectors and the body center are generated by the basis
+    for vector in [[1, 0, 0], [0, 1, 0], [0, 0, 1], [.5, .5, .5]]:
+        coefficients = np.linalg.solve(actual.T, vector)
+        testing.assert_array_almost_equal(coefficients,
+                                          np.rint(coefficients))
+
+
+def test_reduction_matrix(fcc):
+    actual = reduction_matrix(fcc)
+    assert np.isclose(np.linalg.det(actual), 0.25)
+    lengths = np.linalg.norm(np.dot(actual, fcc.lattice.matrix), axis=1)
+    testing.assert_array_almost_equal(lengths, [3.6 / np.sqrt(2)] * 3)
+    testing.assert_array_equal(reduction_matrix(fcc, "niggli"), np.eye(3))
+    with pytest.raises(ValueError):
+        reduction_matrix(fcc, "conventional")
+
+
+def test_reduce_structure():
+    s = Structure.from_file(parent_dir / "POSCAR_BaTiO3")
+    s.make_supercell([2, 2, 3])
+    reduced, kept = reduce_structure(s, reduction_matrix(s))
+    assert reduced.composition == Structure.from_file(
+        parent_dir / "POSCAR_BaTiO3").composition
+    assert [site.species_string for site in reduced] == \
+           ["Ba", "Ti", "O", "O", "O"]
+    testing.assert_array_equal(np.nonzero(kept)[0], [0, 12, 24, 36, 48])
+    testing.assert_array_almost_equal(reduced.lattice.abc, [3.992878] * 3)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_reduce_structure_perturbed(seed):
+    s = Structure.from_file(parent_dir / "POSCAR_BaTiO3")
+    s.make_supercell([2, 2, 3])
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(scale=0.001, size=(len(s), 3))
+    s = Structure(s.lattice, s.species,
+                  s.cart_coords + noise, coords_are_cartesian=True)
+    reduced, kept = reduce_structure(s, reduction_matrix(s))
+    assert [site.species_string for site in reduced] == \
+           ["Ba", "Ti", "O", "O", "O"]
+    assert kept.sum() == 5
+
+
+def test_reduce_arrays_error():
+    with pytest.raises(ValueError):
+        reduce_arrays(np.diag([2.0, 4.0, 4.0]),
+                      np.array([[0.0, 0.0, 0.0], [0.1, 0.0, 0.0]]),
+                      np.diag([0.5, 1.0, 1.0]), ["O", "O"])
+
+
+def test_transform_boundary():
+    actual = transform_boundary([0, 2, 0, 2, 0, 1], np.diag([2, 2, 1]))
+    testing.assert_array_almost_equal(actual, [0, 1, 0, 1, 0, 1])
+
+
+def test_transform_hkl(fcc):
+    matrix = np.array([[0, .5, .5], [.5, 0, .5], [.5, .5, 0]])
+    testing.assert_array_equal(transform_hkl([1, 1, 1], matrix), [1, 1, 1])
+    testing.assert_array_equal(transform_hkl([1, 0, 0], matrix), [0, 1, 1])
@@ -0,0 +1,90 @@
+# coding: utf-8
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from numpy import testing
+
+from pymatgen.core.structure import Structure
+
+from cuivesta.utils.selection import (tokenize,
+                                      Selection,
+                                      SelectionContext,
+                                      selection_mask,
+                                      select_sites)
+
+parent_dir = Path(__file__).parent
+
+
+@pytest.fixture
+def structure():
+    return Structure.from_file(parent_dir / "POSCAR_BaTiO3")
+
+
+def test_tokenize():
+    actual = tokenize("species O and within 5.0 of 0.5,0,0.5 or 1:3 z>=0.5")
+    assert actual == [("name", "species"), ("name", "O"), ("name", "and"),
+                      ("name", "within"), ("number", "5.0"), ("name", "of"),
+                      ("point", "0.5,0,0.5"), ("name", "or"),
+                      ("range", "1:3"), ("name", "z"), ("op", ">="),
+                      ("number", "0.5")]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("species O", [2, 3, 4]),
+    ("O Ba", [0, 2, 3, 4]),
+    ("index 2:3", [1, 2]),
+    ("1 5", [0, 4]),
+    ("0", [4]),
+    ("z > 0.25", [0, 3]),
+    ("O and not z > 0.25", [2, 4]),
+    ("not (Ti or O) or x == 0.5", [0, 2]),
+    ("within 2.1 of Ti", [1, 2, 3, 4]),
+    ("species O and within 2.1 of 2", [2, 3, 4]),
+    ("within 2.1 of 0.5,0.5,0", [0, 2, 4]),
+    ("all and not none", [0, 1, 2, 3, 4]),
+    ("x == 0.49999 or z != 0.50001", [0, 1, 2, 4]),
+    ("z < 0.49999", [1, 2, 4]),
+    ("z >= 0.50001", [0, 3]),
+])
+def test_selection(structure, text, expected):
+    testing.assert_array_equal(
+        np.nonzero(selection_mask(structure, text))[0], expected)
+
+
+def test_selection_context():
+    context = SelectionContext(np.eye(3) * 4.0,
+                               [[0.0, 0.0, 0.0], [0.5, 0.0, 0.0]],
+                               ["Ti", "O"])
+    actual = Selection("within 2.0 of index 1").indices(context)
+    testing.assert_array_equal(actual, [0, 1])
+
+
+@pytest.mark.parametrize("text", ["species", "(O", "O and", "z 0.5",
+                                  "within 2 of", "Ti ) O", "O @ Ti"])
+def test_selection_error(text):
+    with pytest.raises(ValueError):
+        Selection(text)
+
+
+@pytest.mark.parametrize("text", ["index 9", "3:9", "Fe2+", "O or Mg"])
+def test_selection_mask_error(structure, text):
+    with pytest.raises(ValueError):
+        selection_mask(structure, text)
+
+
+def test_select_sites(structure):
+    testing.assert_array_equal(select_sites(structure, ["2", "O"]),
+                               [1, 2, 3, 4])
+    testing.assert_array_equal(select_sites(structure, ["0"]), [4])
+    testing.assert_array_equal(
+        select_sites(structure, ["O and z > 0.25"]), [3])
+    # O around Ti at the origin
+    testing.assert_array_equal(
+        select_sites(structure, ["0,0,0"], radius=2.1), [1, 2, 3, 4])
+    testing.assert_array_equal(select_sites(structure, ["1"], radius=2.9),
+                               [0, 2, 3, 4])
+    with pytest.raises(ValueError):
+        select_sites(structure, ["Mg"])
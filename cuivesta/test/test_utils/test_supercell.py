@@ -0,0 +1,103 @@
+# coding: utf-8
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from numpy import testing
+
+from pymatgen.core.structure import Structure
+
+from cuivesta.utils.func_tools import structure_diff_vectors
+from cuivesta.utils.supercell import (parse_supercell_matrix,
+                                      lattice_translations,
+                                      supercell_arrays,
+                                      supercell_frames,
+                                      tile_vectors,
+                                      make_supercell)
+from cuivesta.utils.vector_set import VectorSet
+
+parent_dir = Path(__file__).parent
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("3x3x2", np.diag([3, 3, 2])),
+    ("2", np.eye(3) * 2),
+    ("1,-1,0,1,1,0,0,0,1", [[1, -1, 0], [1, 1, 0], [0, 0, 1]]),
+])
+def test_parse_supercell_matrix(text, expected):
+    testing.assert_array_equal(parse_supercell_matrix(text), expected)
+
+
+@pytest.mark.parametrize("text", ["1 2", "1 0 0 1 0 0 0 0 1"])
+def test_parse_supercell_matrix_error(text):
+    with pytest.raises(ValueError):
+        parse_supercell_matrix(text)
+
+
+def test_lattice_translations():
+    actual = lattice_translations([[1, -1, 0], [1, 1, 0], [0, 0, 1]])
+    testing.assert_array_equal(actual, [[0, 0, 0], [1, 0, 0]])
+
+
+def test_supercell_arrays():
+    lattice, frac_coords, site_map = supercell_arrays(
+        np.eye(3), np.array([[0.0, 0.0, 0.0], [0.5, 0.5, 0.5]]),
+        np.diag([2, 1, 1]))
+    testing.assert_array_equal(lattice, np.diag([2., 1., 1.]))
+    testing.assert_array_almost_equal(
+        frac_coords, [[0., 0., 0.], [0.5, 0., 0.],
+                      [0.25, 0.5, 0.5], [0.75, 0.5, 0.5]])
+    testing.assert_array_equal(site_map, [0, 0, 1, 1])
+    frames = np.array([[[0.0, 0.0, 0.0]], [[0.2, 0.0, 0.0]]])
+    testing.assert_array_almost_equal(
+        supercell_frames(frames, np.diag([2, 1, 1])),
+        [[[0., 0., 0.], [0.5, 0., 0.]], [[0.1, 0., 0.], [0.6, 0., 0.]]])
+
+
+def test_tile_vectors():
+    tiled = tile_vectors(VectorSet([2], [[1., 2., 3.]]), np.diag([2, 1, 1]))
+    testing.assert_array_equal(tiled.indices, [3, 4])
+    testing.assert_array_almost_equal(tiled.vectors, [[0.5, 2., 3.]] * 2)
+
+
+def test_tile_vectors_keeps_diff_length():
+    s1 = Structure.from_file(parent_dir / "POSCAR_BaTiO3")
+    s2 = s1.copy()
+    s2.translate_sites([1], [0.0, 0.05, -0.1])
+    diff = structure_diff_vectors(s1, s2)
+    for matrix in [np.diag([2, 1, 1]),
+                   np.array([[1, -1, 0], [1, 1, 0], [0, 0, 2]])]:
+        supercell, _ = make_supercell(s1, matrix)
+        tiled = tile_vectors(diff, matrix)
+        testing.assert_array_almost_equal(
+            np.linalg.norm(np.dot(tiled.vectors, supercell.lattice.matrix),
+                           axis=1),
+            np.repeat(np.linalg.norm(np.dot(diff.vectors, s1.lattice.matrix),
+                                     axis=1), len(lattice_translations(matrix))))
+
+
+def test_tile_vectors_image_vectors():
+    image_vectors = np.array([[0., 0., 0.], [0., 0., 0.],
+                              [1., 0., 0.], [-1., 0., 0.]])
+    tiled = tile_vectors(VectorSet([2], [[1., 0., 0.]]), np.diag([2, 1, 1]),
+                         image_vectors)
+    testing.assert_array_equal(tiled.indices, [3, 4])
+    testing.assert_array_almost_equal(tiled.vectors, [[0.5, 0., 0.],
+                                                      [-0.5, 0., 0.]])
+
+
+def test_make_supercell():
+    s = Structure.from_file(parent_dir / "POSCAR_BaTiO3")
+    supercell, site_map = make_supercell(s, np.diag([3, 3, 2]))
+    expected = s.copy()
+    expected.make_supercell([3, 3, 2])
+    assert supercell.composition == expected.composition
+    testing.assert_array_almost_equal(supercell.lattice.matrix,
+                                      expected.lattice.matrix)
+    testing.assert_array_almost_equal(
+        np.sort(supercell.frac_coords % 1.0, axis=0),
+        np.sort(expected.frac_coords % 1.0, axis=0))
+    assert [site.species_string for site in supercell][17:19] == ["Ba", "Ti"]
+    assert len(site_map) == 90
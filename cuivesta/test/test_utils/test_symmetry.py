@@ -0,0 +1,97 @@
+# coding: utf-8
+
+from pathlib import Path
+import unittest
+
+import numpy as np
+
+from numpy import testing
+
+from pymatgen.core.structure import Structure
+from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
+
+from cuivesta.utils.symmetry import (symmetry_analyzer,
+                                     canonical_sign,
+                                     equivalent_hkls,
+                                     site_symmetry_operations,
+                                     site_permutations,
+                                     site_orbits)
+
+parent_dir = Path(__file__).parent
+
+
+class SymmetryTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.s = Structure.from_file(parent_dir / "POSCAR_BaTiO3")
+
+    def test_symmetry_analyzer_cache(self):
+        sga = symmetry_analyzer(self.s)
+        same = Structure.from_file(parent_dir / "POSCAR_BaTiO3")
+        self.assertIs(symmetry_analyzer(same), sga)
+        self.assertEqual(sga.get_space_group_symbol(), "Pm-3m")
+
+    def test_canonical_sign(self):
+        actual = canonical_sign([[0, -1, 1], [-1, 0, 0], [1, -1, 0]])
+        testing.assert_array_equal(actual, [[0, 1, -1], [1, 0, 0],
+                                            [1, -1, 0]])
+
+    def test_equivalent_hkls(self):
+        testing.assert_array_equal(equivalent_hkls(self.s, [0, 0, 2]),
+                                   [[2, 0, 0], [0, 2, 0], [0, 0, 2]])
+        self.assertEqual(len(equivalent_hkls(self.s, [1, 2, 3])), 24)
+
+    def test_site_symmetry_operations(self):
+        rotations, translations = site_symmetry_operations(self.s, None)
+        self.assertEqual(len(rotations), 48)
+        # 4/mmm around O at (0.5, 0, 0)
+        rotations, _ = site_symmetry_operations(self.s, [0.5, 0.0, 0.0])
+        self.assertEqual(len(rotations), 16)
+
+    def test_site_permutations(self):
+        swap_yz = [[1, 0, 0], [0, 0, 1], [0, 1, 0]]
+        rotations = np.array([np.eye(3), swap_yz, np.eye(3)])
+        translations = np.array([[0.0, 0.0, 0.0], [0.0, 0.0, 0.0],
+                                 [0.5, 0.5, 0.5]])
+        actual = site_permutations(
+            self.s.lattice.matrix, self.s.frac_coords,
+            [site.species_string for site in self.s], rotations,
+            translations)
+        # translation by (1/2, 1/2, 1/2) maps no site onto the same species
+        testing.assert_array_equal(actual, [[0, 1, 2, 3, 4],
+                                            [0, 1, 2, 4, 3],
+                                            [-1, -1, -1, -1, -1]])
+
+    def test_site_orbits(self):
+        testing.assert_array_equal(site_orbits(self.s), [0, 1, 2, 2, 2])
+        testing.assert_array_equal(site_orbits(self.s),
+                                   spglib_orbits(self.s))
+        testing.assert_array_equal(site_orbits(self.s, [0.5, 0.0, 0.0]),
+                                   [0, 1, 2, 3, 3])
+        # Va_O in 2x2x2 supercell: orbits of the point group 4/mmm, same
+        # as the space group of the defective supercell
+        s = self.s.copy()
+        s.make_supercell([2, 2, 2])
+        center = s[16].frac_coords
+        s.remove_sites([16])
+        orbits = site_orbits(s, center)
+        self.assertEqual(len(np.unique(orbits)), 12)
+        testing.assert_array_equal(orbits, site_orbits(s))
+        testing.assert_array_equal(orbits, spglib_orbits(s))
+
+    def test_site_orbits_same_as_spglib(self):
+        s = self.s.copy()
+        s.make_supercell([2, 1, 1])
+        s.translate_sites([0], [0.01, 0.02, 0.03])
+        testing.assert_array_equal(site_orbits(s), spglib_orbits(s))
+
+
+def spglib_orbits(s: Structure) -> np.ndarray:
+    """equivalent_atoms of spglib as the smallest index in each orbit"""
+    dataset = SpacegroupAnalyzer(s).get_symmetry_dataset()
+    # dataset is an object in spglib >= 2.5 and a dict before
+    equivalent_atoms = dataset.equivalent_atoms \
+        if hasattr(dataset, "equivalent_atoms") \
+        else dataset["equivalent_atoms"]
+    _, first, inverse = np.unique(equivalent_atoms, return_index=True,
+                                  return_inverse=True)
+    return first[inverse]
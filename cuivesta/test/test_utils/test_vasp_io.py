@@ -0,0 +1,96 @@
+# coding: utf-8
+
+from io import BytesIO
+from pathlib import Path
+import unittest
+
+from numpy import testing
+
+from pymatgen.core.structure import Structure
+
+import cuivesta.utils.vasp_io as vasp_io
+from cuivesta.utils.vasp_io import (rfind_in_file,
+                                    read_until,
+                                    vasprun_forces,
+                                    outcar_forces,
+                                    forces_from_file,
+                                    vasprun_final_structure_arrays,
+                                    outcar_final_structure_arrays,
+                                    structure_from_file)
+
+parent_dir = Path(__file__).parent
+
+defect_dir = parent_dir / "Va_Se1_0"
+
+
+class VaspIoTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.vasprun = defect_dir / "vasprun-finish.xml"
+        self.outcar = defect_dir / "OUTCAR-finish"
+        self.chunk_size = vasp_io.chunk_size
+
+    def tearDown(self) -> None:
+        vasp_io.chunk_size = self.chunk_size
+
+    def test_rfind_in_file(self):
+        vasp_io.chunk_size = 4  # pattern across chunk boundary
+        file = BytesIO(b"abc pattern def pattern ghi")
+        self.assertEqual(rfind_in_file(file, b"pattern"), 16)
+        self.assertEqual(rfind_in_file(file, b"pattern", 16), 4)
+        self.assertEqual(rfind_in_file(file, b"pattern", 4), -1)
+
+    def test_read_until(self):
+        vasp_io.chunk_size = 4
+        file = BytesIO(b"abc pattern def pattern ghi")
+        self.assertEqual(read_until(file, 5, b"pattern"), b"attern def ")
+
+    def test_vasprun_forces(self):
+        actual = vasprun_forces(self.vasprun)
+        self.assertEqual(actual.shape, (63, 3))
+        testing.assert_array_almost_equal(
+            actual[0], [0.00188862, 0.00896973, 0.00664266])
+        testing.assert_array_equal(vasprun_forces(self.vasprun, 1), actual)
+
+    def test_outcar_forces(self):
+        actual = outcar_forces(self.outcar)
+        self.assertEqual(actual.shape, (63, 3))
+        testing.assert_array_equal(outcar_forces(self.outcar, 1), actual)
+        testing.assert_array_almost_equal(actual,
+                                          vasprun_forces(self.vasprun),
+                                          decimal=5)
+
+    def test_missing_ionic_step(self):
+        with self.assertRaises(ValueError):
+            vasprun_forces(self.vasprun, 2)
+        with self.assertRaises(ValueError):
+            outcar_forces(self.outcar, -2)
+
+    def test_forces_from_file(self):
+        with self.assertRaises(ValueError):
+            forces_from_file(defect_dir / "POSCAR")
+
+    def test_vasprun_final_structure_arrays(self):
+        actual = vasprun_final_structure_arrays(self.vasprun)
+        expected = Structure.from_file(defect_dir / "CONTCAR-finish")
+        self.assertEqual(actual["species"],
+                         [site.species_string for site in expected])
+        testing.assert_array_almost_equal(actual["lattice"],
+                                          expected.lattice.matrix)
+        self.assertEqual(actual["frac_coords"].shape, (63, 3))
+
+    def test_outcar_final_structure_arrays(self):
+        actual = outcar_final_structure_arrays(self.outcar)
+        expected = vasprun_final_structure_arrays(self.vasprun)
+        self.assertEqual(actual["species"], expected["species"])
+        testing.assert_array_almost_equal(actual["lattice"],
+                                          expected["lattice"])
+        diff = actual["frac_coords"] - expected["frac_coords"]
+        testing.assert_array_almost_equal(diff - diff.round(), 0.0,
+                                          decimal=4)
+
+    def test_structure_from_file(self):
+        for filename in [self.vasprun, self.outcar]:
+            actual = structure_from_file(filename)
+            self.assertEqual(actual.composition.formula, "Mg32 Se31")
+        actual = structure_from_file(defect_dir / "POSCAR")
+        self.assertEqual(len(actual), 63)
@@ -0,0 +1,139 @@
+# coding: utf-8
+
+import unittest
+
+import numpy as np
+
+from numpy import testing
+
+from cuivesta.utils.vector_set import (VectorSet,
+                                       overlay_vectors,
+                                       magnitude_classes,
+                                       species_classes,
+                                       orbit_representatives,
+                                       orbit_classes,
+                                       type_styles,
+                                       fractional_vectors,
+                                       transform_vectors)
+
+
+class VectorSetTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.vectors = VectorSet([1, 3, 4], [[0., 0., 1.],
+                                             [0., 2., 0.],
+                                             [3., 0., 0.]])
+
+    def test_from_array(self):
+        actual = VectorSet.from_array(np.ones((2, 3)))
+        testing.assert_array_equal(actual.indices, [1, 2])
+
+    def test_from_dict_to_dict(self):
+        expected = {1: [0.0, 0.0, 1.0], 3: [0.0, 2.0, 0.0],
+                    4: [3.0, 0.0, 0.0]}
+        self.assertEqual(self.vectors.to_dict(), expected)
+        self.assertEqual(VectorSet.from_dict(expected), self.vectors)
+
+    def test_norms(self):
+        testing.assert_array_equal(self.vectors.norms, [1., 2., 3.])
+
+    def test_filter(self):
+        actual = self.vectors.filter(self.vectors.norms > 1.5)
+        testing.assert_array_equal(actual.indices, [3, 4])
+
+    def test_select(self):
+        actual = self.vectors.select([4, 1, 2])
+        testing.assert_array_equal(actual.indices, [1, 4])
+
+    def test_take_sites(self):
+        actual = self.vectors.take_sites(np.array([True, False, False, True]))
+        testing.assert_array_equal(actual.indices, [1, 2])
+        testing.assert_array_equal(actual.norms, [1., 3.])
+
+    def test_tile(self):
+        actual = self.vectors.with_types([1, 2, 2]).tile(2)
+        testing.assert_array_equal(actual.indices, [1, 2, 5, 6, 7, 8])
+        testing.assert_array_equal(actual.norms, [1., 1., 2., 2., 3., 3.])
+        testing.assert_array_equal(actual.types, [1, 1, 2, 2, 2, 2])
+
+    def test_scale(self):
+        testing.assert_array_equal(self.vectors.scale(2.0).norms, [2., 4., 6.])
+        testing.assert_array_equal(
+            self.vectors.scale(np.array([1., 0., 1.])).norms, [1., 0., 3.])
+
+    def test_merge(self):
+        other = VectorSet([2, 3], [[1., 1., 1.], [9., 9., 9.]])
+        actual = self.vectors.merge(other)
+        testing.assert_array_equal(actual.indices, [1, 2, 3, 4])
+        testing.assert_array_equal(actual.vectors[2], [9., 9., 9.])
+
+    def test_types_follow_filter_and_merge(self):
+        typed = self.vectors.with_types([1, 2, 2])
+        testing.assert_array_equal(typed.select([3, 4]).types, [2, 2])
+        other = VectorSet([2], [[1., 1., 1.]], [3])
+        testing.assert_array_equal(typed.merge(other).types, [1, 3, 2, 2])
+        self.assertIsNone(self.vectors.merge(other).types)
+
+    def test_iter(self):
+        actual = [index for index, _ in self.vectors]
+        self.assertEqual(actual, [1, 3, 4])
+
+    def test_length_mismatch(self):
+        with self.assertRaises(ValueError):
+            VectorSet([1, 2], [[0., 0., 0.]])
+
+
+def test_magnitude_classes():
+    vectors = VectorSet([1, 2, 3, 4], [[0., 0., 0.1], [0., 0., 0.4],
+                                       [0., 0., 0.6], [0., 0., 1.0]])
+    actual, styles = magnitude_classes(vectors, num_bins=2, size=0.5)
+    testing.assert_array_equal(actual.types, [1, 1, 2, 2])
+    assert styles == [(0.25, "255 0 0"), (0.75, "0 0 255")]
+
+
+def test_species_classes():
+    vectors = VectorSet([1, 3, 5], np.ones((3, 3)))
+    actual, styles = species_classes(vectors, ["Ba", "Ti", "O", "O", "Ti"])
+    testing.assert_array_equal(actual.types, [1, 2, 3])
+    assert [size for size, _ in styles] == [0.5, 0.5, 0.5]
+
+
+def test_orbit_representatives():
+    vectors = VectorSet([2, 3, 4, 5], np.ones((4, 3)))
+    actual = orbit_representatives(vectors, np.array([0, 1, 2, 2, 1]))
+    testing.assert_array_equal(actual.indices, [2, 3])
+
+
+def test_orbit_classes():
+    vectors = VectorSet([2, 3, 4, 5], np.ones((4, 3)))
+    actual, styles = orbit_classes(vectors, np.array([0, 1, 2, 2, 1]))
+    testing.assert_array_equal(actual.types, [1, 2, 2, 1])
+    assert styles == type_styles(2)
+    assert [size for size, _ in type_styles(3, 0.2)] == [0.2, 0.2, 0.2]
+
+
+def test_fractional_vectors():
+    # monoclinic cell: cartesian vectors come back from the fractional ones
+    lattice = np.array([[4., 0., 0.], [0., 5., 0.], [-1., 0., 6.]])
+    cartesian = np.array([[1., 0., 0.], [0., 0., 3.], [-0.5, 2.5, 3.]])
+    actual = fractional_vectors(cartesian, lattice)
+    testing.assert_array_almost_equal(actual[2], [0., 0.5, 0.5])
+    testing.assert_array_almost_equal(np.dot(actual, lattice), cartesian)
+
+
+def test_transform_vectors():
+    lattice = np.array([[4., 0., 0.], [0., 5., 0.], [-1., 0., 6.]])
+    matrix = np.array([[1, -1, 0], [1, 1, 0], [0, 0, 2]])
+    vectors = np.array([[0.1, 0.2, -0.1]])
+    actual = transform_vectors(vectors, matrix)
+    testing.assert_array_almost_equal(np.dot(actual, np.dot(matrix, lattice)),
+                                      np.dot(vectors, lattice))
+
+
+def test_overlay_vectors():
+    displacements = VectorSet([1, 2], [[0., 0., 0.1], [0., 0.2, 0.]])
+    forces = VectorSet([2, 3], [[4., 0., 0.], [0., 0., 0.]])
+    actual, styles = overlay_vectors([displacements, forces], size=0.3)
+    testing.assert_array_equal(actual.indices, [1, 2, 2, 3])
+    testing.assert_array_equal(actual.types, [1, 1, 2, 2])
+    testing.assert_array_almost_equal(actual.norms, [0.5, 1., 1., 0.])
+    assert styles == [(0.3, "255 0 0"), (0.3, "0 0 255")]
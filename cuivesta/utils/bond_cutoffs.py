@@ -0,0 +1,138 @@
+# coding: utf-8
+import json
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from pymatgen.core.periodic_table import Element
+
+from cuivesta.utils.neighbors import find_neighbors
+
+# {signature: {"Ba-Ti": "0.00000    3.45000  0  1  1  0  1", ..}, ..}
+_cutoff_cache = {}
+
+sbond_line_format = "0.00000    {:.5f}  0  1  1  0  1"
+
+
+def lattice_signature(species: List[str], lattice: np.ndarray,
+                      decimals: int = 2) -> str:
+    """
+    key of cache: composition and lattice parameters rounded to decimals
+    e.g., "Ba1Ti1O3_3.99_3.99_3.99_90.00_90.00_90.00"
+    """
+    unique_species, counts = np.unique(species, return_counts=True)
+    order = np.argsort([species.index(specie) for specie in unique_species])
+    composition = "".join(f"{unique_species[i]}{counts[i]}" for i in order)
+    lengths = np.linalg.norm(lattice, axis=1)
+    angles = [np.degrees(np.arccos(np.dot(lattice[i], lattice[j])
+                                   / lengths[i] / lengths[j]))
+              for i, j in [(1, 2), (2, 0), (0, 1)]]
+    params = "_".join(f"{value:.{decimals}f}"
+                      for value in list(lengths) + angles)
+    return f"{composition}_{params}"
+
+
+def load_cutoff_cache(filename) -> None:
+    """add cutoffs saved by save_cutoff_cache to the in-memory cache"""
+    if Path(filename).exists():
+        with open(filename) as file:
+            _cutoff_cache.update(json.load(file))
+
+
+def save_cutoff_cache(filename) -> None:
+    with open(filename, "w") as file:
+        json.dump(_cutoff_cache, file, indent=1)
+
+
+def infer_bond_cutoffs(lattice: np.ndarray,
+                       frac_coords: np.ndarray,
+                       species: List[str],
+                       pairs: List[tuple],
+                       shell_tolerance: float = 0.2,
+                       bin_width: float = 0.05,
+                       gap_width: float = 0.3) -> dict:
+    """
+    Infer max bond length of species pairs at the gap after the first
+    coordination shell. Distances of all pairs are taken in one neighbor
+    search, and only those within (1 + shell_tolerance) times the nearest
+    neighbor distance of the center site count as the first shell.
+    Distances of each pair are histogrammed by bin_width and the cutoff is
+    put at the first run of empty bins not narrower than gap_width.
+    Args:
+        pairs: e.g., [('Ba', 'Ti'), ..], pairs not in the first shell of
+               any site are not returned.
+    Return:
+        {('Ba', 'Ti'): max length, ..}
+    """
+    pairs = [pair for pair in pairs
+             if pair[0] in species and pair[1] in species
+             and all(Element.is_valid_symbol(specie) for specie in pair)]
+    if not pairs:
+        return {}
+    unique_species, codes = np.unique(species, return_inverse=True)
+    num_species = len(unique_species)
+
+    # search radius: enough to find the nearest neighbor of any site
+    volume_per_site = abs(np.linalg.det(lattice)) / len(species)
+    cutoff = 2.0 * volume_per_site ** (1 / 3)
+    neighbors = find_neighbors(lattice, frac_coords, cutoff)
+    while np.any(neighbors.counts == 0):
+        cutoff *= 1.5
+        neighbors = find_neighbors(lattice, frac_coords, cutoff)
+    centers = neighbors.centers
+    nearest = np.minimum.reduceat(neighbors.distances, neighbors.indptr[:-1])
+    first_shell = neighbors.distances <= \
+        nearest[centers] * (1.0 + shell_tolerance)
+
+    # histogram of all pairs (species code pairs) at once
+    pair_codes = (codes[centers] * num_species
+                  + codes[neighbors.indices])[first_shell]
+    num_bins = int(np.ceil(cutoff / bin_width)) + 1
+    bins = (neighbors.distances[first_shell] / bin_width).astype(int)
+    histograms = np.bincount(pair_codes * num_bins + bins,
+                             minlength=num_species ** 2 * num_bins)
+    histograms = histograms.reshape(num_species ** 2, num_bins)
+    gap_bins = max(1, int(round(gap_width / bin_width)))
+
+    code_of = {specie: code for code, specie in enumerate(unique_species)}
+    cutoffs = {}
+    for a, b in pairs:
+        histogram = histograms[code_of[a] * num_species + code_of[b]]
+        occupied = np.nonzero(histogram)[0]
+        if len(occupied) == 0:
+            continue
+        gaps = np.nonzero(np.diff(occupied) > gap_bins)[0]
+        last_bin = occupied[gaps[0]] if len(gaps) else occupied[-1]
+        # upper edge of the shell and a half of the gap
+        cutoffs[(a, b)] = round(float((last_bin + 1) * bin_width
+                                      + gap_width / 2), 5)
+    return cutoffs
+
+
+def inferred_sbond_lines(lattice: np.ndarray,
+                         frac_coords: np.ndarray,
+                         species: List[str],
+                         pairs: List[tuple],
+                         cache_file: Optional[str] = None) -> dict:
+    """
+    SBOND lines of pairs inferred by infer_bond_cutoffs, cached per
+    composition and lattice signature (and saved to cache_file if given).
+    Return:
+        {('Ba', 'Ti'): "0.00000    3.45000  0  1  1  0  1", ..}
+    """
+    if cache_file is not None:
+        load_cutoff_cache(cache_file)
+    signature = lattice_signature(species, lattice)
+    cached = _cutoff_cache.setdefault(signature, {})
+    missing = [pair for pair in pairs if "-".join(pair) not in cached]
+    if missing:
+        cutoffs = infer_bond_cutoffs(lattice, frac_coords, species, missing)
+        for pair in missing:
+            # None means not bonded, so that it is not searched again
+            cached["-".join(pair)] = None if pair not in cutoffs \
+                else sbond_line_format.format(cutoffs[pair])
+        if cache_file is not None:
+            save_cutoff_cache(cache_file)
+    return {pair: cached["-".join(pair)] for pair in pairs
+            if cached["-".join(pair)] is not None}
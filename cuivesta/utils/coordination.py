@@ -0,0 +1,81 @@
+# coding: utf-8
+import csv
+import json
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from cuivesta.utils.neighbors import bonded_neighbors
+
+summary_keys = ("index", "species", "cn", "expected_cn", "status",
+                "mean_bond_length")
+
+
+def coordination_numbers(lattice: np.ndarray,
+                         frac_coords: np.ndarray,
+                         species: List[str],
+                         bond_lengths: Dict[tuple, Tuple[float, float]]
+                         ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Coordination numbers with the (min, max) bond lengths of species pairs.
+    Return:
+        coordination numbers np.ndarray(sites) of int,
+        mean bond lengths np.ndarray(sites) (nan for cn = 0)
+    """
+    neighbors = bonded_neighbors(lattice, frac_coords, species, bond_lengths)
+    cn = neighbors.counts
+    total = np.bincount(neighbors.centers, weights=neighbors.distances,
+                        minlength=len(species))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_lengths = total / cn
+    return cn, mean_lengths
+
+
+def expected_coordination_numbers(species: List[str],
+                                  cn: np.ndarray) -> np.ndarray:
+    """the most frequent coordination number among sites of each species"""
+    unique_species, codes = np.unique(species, return_inverse=True)
+    counts = np.zeros((len(unique_species), cn.max() + 1), dtype=int)
+    np.add.at(counts, (codes, cn), 1)
+    return counts.argmax(axis=1)[codes]
+
+
+def coordination_summary(lattice: np.ndarray,
+                         frac_coords: np.ndarray,
+                         species: List[str],
+                         bond_lengths: Dict[tuple, Tuple[float, float]]
+                         ) -> List[dict]:
+    """
+    Per-site coordination. Sites whose coordination number differs from
+    the most frequent one of the species are "under" or "over".
+    Return:
+        [{"index": 1, "species": "Ba", "cn": 12, "expected_cn": 12,
+          "status": "normal", "mean_bond_length": 2.82344}, ..]
+    """
+    cn, mean_lengths = coordination_numbers(lattice, frac_coords, species,
+                                            bond_lengths)
+    expected = expected_coordination_numbers(species, cn)
+    status = np.where(cn < expected, "under",
+                      np.where(cn > expected, "over", "normal"))
+    return [{"index": index,
+             "species": specie,
+             "cn": int(c),
+             "expected_cn": int(e),
+             "status": str(st),
+             "mean_bond_length": None if np.isnan(m) else round(float(m), 5)}
+            for index, (specie, c, e, st, m)
+            in enumerate(zip(species, cn, expected, status, mean_lengths), 1)]
+
+
+def write_coordination_summary(filename, summary: List[dict]) -> None:
+    """write summary as json (*.json) or csv (otherwise)"""
+    if Path(filename).suffix == ".json":
+        with open(filename, "w") as file:
+            json.dump(summary, file, indent=1)
+    else:
+        with open(filename, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=summary_keys)
+            writer.writeheader()
+            writer.writerows(summary)
+    print(f"<vesta_io>: generated {filename}.")
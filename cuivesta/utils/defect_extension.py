@@ -1,11 +1,13 @@
 # coding: utf-8
+import itertools
 from typing import Union
 
 import numpy as np
 
 from pymatgen.core.structure import Structure
 from monty.serialization import loadfn
-from pymatgen.util.coord import pbc_shortest_vectors
+
+from cuivesta.utils.vector_set import VectorSet, fractional_vectors
 
 try:
     from pydefect.core.defect_entry import DefectEntry
@@ -17,10 +19,15 @@ except ImportError:
 
 def get_displacements(final_structure: Structure,
                       initial_structure: Structure,
-                      anchor_atom_index: int = None) -> list:
+                      anchor_atom_index: int = None) -> np.ndarray:
     """
     Note: this function is copied and modified
           from legacy pydefect.util.structure_tool.py
+          Shortest vectors are searched for all sites at once in the same
+          manner as pymatgen's pbc_shortest_vectors (LLL-reduced lattice
+          and its 27 neighboring images).
+    Return:
+        cartesian displacements, np.ndarray(sites x 3)
     """
     if anchor_atom_index:
         drift_frac_coords = final_structure[anchor_atom_index].frac_coords - \
@@ -28,17 +35,16 @@ def get_displacements(final_structure: Structure,
     else:
         drift_frac_coords = np.zeros(3)
 
-    displacement_vectors = []
-    for final_site, initial_site in zip(final_structure, initial_structure):
-        displacement_vector, _ = \
-            pbc_shortest_vectors(lattice=initial_structure.lattice,
-                                 fcoords1=initial_site.frac_coords,
-                                 fcoords2=(final_site.frac_coords
-                                           - drift_frac_coords),
-                                 return_d2=True)
-        displacement_vectors.append(list(displacement_vector[0][0]))
-
-    return displacement_vectors
+    lattice = initial_structure.lattice
+    frac_diff = lattice.get_lll_frac_coords(final_structure.frac_coords
+                                            - drift_frac_coords
+                                            - initial_structure.frac_coords)
+    frac_diff -= np.round(frac_diff)
+    images = np.array(list(itertools.product([-1, 0, 1], repeat=3)))
+    candidates = np.dot(frac_diff[:, None, :] + images[None, :, :],
+                        lattice.lll_matrix)
+    shortest = np.argmin(np.sum(candidates ** 2, axis=2), axis=1)
+    return candidates[np.arange(len(candidates)), shortest]
 
 
 class SDefect:
@@ -68,11 +74,12 @@ class SDefect:
         self.initial_structure = self.de.structure
 
     @property
-    def displacements(self, anchor_atom_index=None):
+    def displacements(self, anchor_atom_index=None) -> VectorSet:
         disp_info = get_displacements(self.final_structure,
                                       self.initial_structure,
                                       anchor_atom_index)
-        return {key: val for key, val in enumerate(disp_info, 1)}
+        return VectorSet.from_array(fractional_vectors(
+            disp_info, self.initial_structure.lattice.matrix))
 
     @classmethod
     def from_defect_entry(cls, s: Structure, filename="defect_entry.json"):
@@ -85,7 +92,7 @@ class SDefect:
                 "",
                 f"defect_center: {self.defect_center}",
                 f"neighboring sites: {self.neighboring_sites}",
-                f"displacements: {self.displacements}"]
+                f"displacements: {self.displacements.to_dict()}"]
         return "\n".join(outs)
 
 
@@ -102,19 +109,18 @@ def replace_dummy_to_xx(target_str: str) -> str:
 
 
 def defect_induced_displacement_vectors(sdefect: SDefect,
-                                        all_site: bool) -> dict:
+                                        all_site: bool) -> VectorSet:
     """
     Args:
         sdefect: SDefect
         all_site(bool) : flag to show all sites
     Return:
-        vectors(dict):
+        vectors(VectorSet):
     """
     if all_site:
         visible_vectors = sdefect.displacements
     else:
-        visible_sites = sdefect.neighboring_sites
-        visible_vectors = {ns+1: sdefect.displacements[ns+1]
-                           for ns in visible_sites}
+        visible_sites = np.asarray(sdefect.neighboring_sites, dtype=int)
+        visible_vectors = sdefect.displacements.select(visible_sites + 1)
     return visible_vectors
 
@@ -0,0 +1,137 @@
+# coding: utf-8
+from typing import Optional, Tuple, List
+
+import numpy as np
+
+from cuivesta.utils.func_tools import sphere_boundary
+from cuivesta.utils.vector_set import VectorSet
+
+
+def image_counts(frac_coords: np.ndarray,
+                 boundary: np.ndarray) -> np.ndarray:
+    """
+    number of periodic images of each site inside BOUND
+    Args:
+        boundary: [x_min, x_max, y_min, y_max, z_min, z_max]
+    Return:
+        np.ndarray(sites) of int
+    """
+    lower, upper = np.asarray(boundary, dtype=float).reshape(3, 2).T
+    # integers n with lower <= f + n <= upper along each axis
+    counts = np.floor(upper - frac_coords) - np.ceil(lower - frac_coords) + 1
+    return np.prod(np.clip(counts, 0, None), axis=1).astype(int)
+
+
+def estimate_display(frac_coords: np.ndarray,
+                     boundary: np.ndarray,
+                     coordination: np.ndarray,
+                     vector_indices: Optional[np.ndarray] = None) -> dict:
+    """
+    Estimate objects drawn by VESTA: atoms are images of sites in BOUND,
+    bonds are half of their coordination numbers, and vectors are drawn
+    on every image of their sites.
+    Args:
+        coordination: coordination numbers of sites, np.ndarray(sites)
+        vector_indices: 1-based site indices of vectors
+    Return:
+        {"atoms": .., "bonds": .., "vectors": .., "total": ..}
+    """
+    counts = image_counts(frac_coords, boundary)
+    atoms = int(counts.sum())
+    bonds = int(np.dot(counts, coordination) // 2)
+    vectors = 0
+    if vector_indices is not None:
+        vectors = int(counts[np.asarray(vector_indices) - 1].sum())
+    return {"atoms": atoms, "bonds": bonds, "vectors": vectors,
+            "total": atoms + bonds + vectors}
+
+
+def _bisect(fits, upper: float, iterations: int = 30) -> float:
+    """largest x in [0, upper] with fits(x), assuming monotone fits"""
+    lower = 0.0
+    for _ in range(iterations):
+        middle = (lower + upper) / 2
+        if fits(middle):
+            lower = middle
+        else:
+            upper = middle
+    return lower
+
+
+def trim_boundary(lattice: np.ndarray,
+                  frac_coords: np.ndarray,
+                  coordination: np.ndarray,
+                  boundary: np.ndarray,
+                  vector_indices: Optional[np.ndarray],
+                  max_displayed: int) -> Tuple[np.ndarray, List[str]]:
+    """
+    Keep estimated atoms + bonds + vectors under max_displayed by, in turn,
+    1. shrinking BOUND about its center down to one cell,
+    2. cutting BOUND to the box of a sphere around its center.
+    Args:
+        vector_indices: 1-based site indices of vectors, e.g., of all sites
+                        with vectors in any of files sharing BOUND
+    Return:
+        boundary, and descriptions of applied trimming
+    """
+    boundary = np.asarray(boundary, dtype=float)
+    actions = []
+
+    def total(_boundary):
+        return estimate_display(frac_coords, _boundary, coordination,
+                                vector_indices)["total"]
+
+    if total(boundary) <= max_displayed:
+        return boundary, actions
+
+    lower, upper = boundary.reshape(3, 2).T
+    center = (lower + upper) / 2
+    extents = upper - lower
+
+    def shrunk(scale):
+        half = np.maximum(np.minimum(extents, 1.0), extents * scale) / 2
+        return np.column_stack([center - half, center + half]).reshape(-1)
+
+    if np.any(extents > 1.0):
+        boundary = shrunk(_bisect(lambda x: total(shrunk(x)) <= max_displayed,
+                                  1.0))
+        actions.append("boundary shrunk to "
+                       + " ".join(f"{b:.3f}" for b in boundary))
+    if total(boundary) > max_displayed:
+        max_radius = np.linalg.norm(np.dot(extents, lattice)) / 2
+
+        def sphere(radius):
+            return sphere_boundary(lattice, frac_coords, center, radius)
+
+        radius = _bisect(lambda x: total(sphere(x)) <= max_displayed,
+                         max_radius)
+        boundary = sphere(radius)
+        actions.append(f"boundary cut to {radius:.3f} A around the center")
+    return boundary, actions
+
+
+def drop_shorter_vectors(frac_coords: np.ndarray,
+                         coordination: np.ndarray,
+                         boundary: np.ndarray,
+                         vectors: VectorSet,
+                         max_displayed: int
+                         ) -> Tuple[VectorSet, List[str]]:
+    """
+    Keep the longer vectors that fit in max_displayed with the atoms and
+    bonds in BOUND.
+    Return:
+        vectors, and descriptions of applied trimming
+    """
+    if estimate_display(frac_coords, boundary, coordination,
+                        vectors.indices)["total"] <= max_displayed:
+        return vectors, []
+    counts = image_counts(frac_coords, boundary)
+    left = max_displayed - estimate_display(frac_coords, boundary,
+                                            coordination)["total"]
+    order = np.argsort(-vectors.norms, kind="stable")
+    costs = np.cumsum(counts[vectors.indices[order] - 1])
+    keep = np.zeros(len(vectors), dtype=bool)
+    keep[order[costs <= left]] = True
+    return vectors.filter(keep), [f"{len(vectors) - keep.sum()} shorter "
+                                  f"vectors dropped"]
+
@@ -1,11 +1,18 @@
 # coding: utf-8
 
-from typing import Union
+import itertools
+import re
+import warnings
+from typing import Union, List
 from fractions import Fraction
 
 import numpy as np
 
 from pymatgen.core.structure import Structure, StructureError
+
+from cuivesta.utils.vector_set import VectorSet
+from cuivesta.utils.neighbors import perpendicular_widths
+from cuivesta.utils.symmetry import equivalent_hkls, canonical_sign
 # from utils.defect_json_generator import SDefect
 from pathlib import Path
 
@@ -17,6 +24,26 @@ def val_to_str_line(val_line: list or tuple) -> str:
     return str_list
 
 
+def val_to_str_lines(line_format: str, columns: list) -> str:
+    """
+    Render many lines by one %-formatting call instead of a loop.
+    '%.6f' gives the same string as format_str used in val_to_str_line.
+    Args:
+        line_format: e.g., '%d %.6f %.6f %.6f'
+        columns: values of each conversion in line_format,
+                 e.g., [indices, x, y, z] as 1d arrays of the same length
+    Return:
+        lines joined by '\n'
+    """
+    num_lines = len(columns[0])
+    if num_lines == 0:
+        return ""
+    values = np.empty((num_lines, len(columns)), dtype=object)
+    for i, column in enumerate(columns):
+        values[:, i] = np.asarray(column).tolist()
+    return "\n".join([line_format] * num_lines) % tuple(values.ravel())
+
+
 def structure_to_dict_for_vesta(s: Structure):
     dict_for_vesta = dict()
     dict_for_vesta["formula"] = s.composition.formula
@@ -28,12 +55,23 @@ def structure_to_dict_for_vesta(s: Structure):
     return dict_for_vesta
 
 
-def structure_diff_vectors(s1: Structure, s2: Structure) -> dict:
+def structure_diff_vectors(s1: Structure, s2: Structure) -> VectorSet:
     """
     generate vesta vector object from diff between POSCAR1 and POSCAR2
      as ([[x.xx(float), x.xx. x.xx], [x.xx, x.xx, x.xx],...])
     """
-    if len(s1) != len(s2):
+    displacement_vectors = multi_structure_diff_vectors(s1, [s2])[0]
+    return VectorSet.from_array(displacement_vectors)
+
+
+def multi_structure_diff_vectors(s1: Structure,
+                                 s2_list: List[Structure]) -> np.ndarray:
+    """
+    generate displacements from all POSCAR2s to one reference POSCAR1
+    Return:
+        array of (number of POSCAR2s x sites x 3)
+    """
+    if any(len(s1) != len(s2) for s2 in s2_list):
         raise StructureError("The number of atoms are different between two "
                              "input structures.")
     # elif s1.lattice != s2.lattice:
@@ -41,9 +79,32 @@ def structure_diff_vectors(s1: Structure, s2: Structure) -> dict:
     #                    "structures. Anchoring the farthest atom is switched "
     #                    "off as it bears erroneous result.")
     #     anchor_atom_index = None
-    displacement_vectors = s1.frac_coords - s2.frac_coords
-    vectors_dict = {key: val for key, val in enumerate(displacement_vectors, 1)}
-    return vectors_dict
+    stacked_frac_coords = np.stack([s2.frac_coords for s2 in s2_list])
+    return s1.frac_coords[None, :, :] - stacked_frac_coords
+
+
+def interpolate_frac_coords(s1: Structure, s2: Structure,
+                            num_frames: int) -> np.ndarray:
+    """
+    generate frac_coords of structures interpolated from POSCAR1 to POSCAR2.
+    Each site moves along the shortest path under periodic boundary condition.
+    The lattice is not interpolated: frames are in the cell of POSCAR1.
+    Return:
+        array of (num_frames x sites x 3) including both end points
+    """
+    if len(s1) != len(s2):
+        raise StructureError("The number of atoms are different between two "
+                             "input structures.")
+    if [site.species_string for site in s1] != \
+            [site.species_string for site in s2]:
+        raise StructureError("The species are different between two "
+                             "input structures.")
+    if num_frames < 2:
+        raise ValueError("number of frames must be larger than 1")
+    displacements = s2.frac_coords - s1.frac_coords
+    displacements -= np.round(displacements)
+    fractions = np.linspace(0.0, 1.0, num_frames)
+    return s1.frac_coords + fractions[:, None, None] * displacements
 
 
 def make_visible_bond_set(pairs: list) -> set:
@@ -54,15 +115,125 @@ def make_visible_bond_set(pairs: list) -> set:
     return set(tuple(bond.split("-")) for bond in pairs)
 
 
+# e.g., "111", "111-3.0", "1,-1,10", "1,-1,0-3.0", "{110}", "{1,-1,2}-2.0"
+plane_pattern = re.compile(
+    r"^(?P<family>\{)?"
+    r"(?:(?P<h>-?\d+),(?P<k>-?\d+),(?P<l>-?\d+)|(?P<digits>\d{3}))"
+    r"(?(family)\})"
+    r"(?:-(?P<d>\d+(?:\.\d*)?))?$")
+
+
+def parse_plane(plane: str) -> tuple:
+    """
+    parse hkl-d string of --planes option. Indices with more than one
+    digit or negative ones are separated by comma, and {..} means the
+    family of symmetry-equivalent planes.
+    Return:
+        ([h, k, l], d or None, family or not)
+    """
+    match = plane_pattern.match(plane.replace(" ", ""))
+    if match is None:
+        raise ValueError(f"{plane} is not hkl or hkl-d of plane, "
+                         f"e.g., 111, 111-3.0, 1,-1,0, or {{110}}.")
+    if match["digits"]:
+        hkl = [int(_) for _ in match["digits"]]
+    else:
+        hkl = [int(match["h"]), int(match["k"]), int(match["l"])]
+    d = float(match["d"]) if match["d"] else None
+    return hkl, d, match["family"] is not None
+
+
 def make_plane_list(plane: str) -> list:
-    hkl = plane.split('-')[0]
-    d = plane.split('-')[-1]
+    hkl, d, family = parse_plane(plane)
+    if family:
+        raise ValueError(f"{plane} needs structure to be expanded, "
+                         f"use expand_plane_list.")
     hkl_list = [float(_) for _ in hkl]
-    if not hkl == d:
-        hkl_list.append(float(d))
+    if d is not None:
+        hkl_list.append(d)
     return hkl_list
 
 
+def expand_plane_list(s: Structure, planes: List[str]) -> List[list]:
+    """
+    make_plane_list for each plane, and {hkl} is expanded to all
+    symmetry-equivalent planes of s sharing the same d (if given)
+    """
+    plane_list = []
+    for plane in planes:
+        hkl, d, family = parse_plane(plane)
+        hkls = equivalent_hkls(s, hkl) if family else [hkl]
+        for _hkl in hkls:
+            hkl_list = [float(_) for _ in _hkl]
+            if d is not None:
+                hkl_list.append(d)
+            plane_list.append(hkl_list)
+    return plane_list
+
+
+def rational_hkl(normal: np.ndarray, max_index: int = 12,
+                 tolerance: float = 0.05) -> np.ndarray:
+    """
+    nearest small integer hkl parallel to normal (in units of the
+    reciprocal lattice vectors): the smallest multiplier up to max_index
+    giving all indices within tolerance of integers, or the closest one
+    """
+    normal = np.asarray(normal, dtype=float)
+    normal = normal / np.abs(normal).max()
+    multipliers = np.arange(1, max_index + 1)[:, None]
+    candidates = multipliers * normal
+    errors = np.abs(candidates - np.rint(candidates)).max(axis=1)
+    within = np.nonzero(errors < tolerance)[0]
+    best = within[0] if len(within) else np.argmin(errors)
+    hkl = np.rint(candidates[best]).astype(int)
+    return hkl // np.gcd.reduce(hkl)
+
+
+def fit_plane_through_sites(lattice: np.ndarray,
+                            frac_coords: np.ndarray,
+                            site_indices: List[int]) -> tuple:
+    """
+    Least-squares plane through sites by SVD of their Cartesian coords,
+    taken at the minimum image from the first site. The normal is
+    rounded to rational hkl and d is the distance of the plane from the
+    origin along the normal of hkl, i.e., the 4th value of 'hkl-d' of
+    --planes. Note that d of --planes defaults to d_hkl, the plane
+    h.x = 1, while the fitted plane h.x = t has d = t * d_hkl.
+    Args:
+        site_indices: 1-based indices of sites (at least 3, not collinear)
+    Return:
+        [h, k, l], d (A), rms distance of sites from the fitted plane (A)
+    """
+    if len(site_indices) < 3:
+        raise ValueError("plane needs at least 3 sites.")
+    indices = np.asarray(site_indices)
+    out_of_range = indices[(indices < 1) | (indices > len(frac_coords))]
+    if len(out_of_range):
+        raise ValueError(f"indices {out_of_range.tolist()} are out of range "
+                         f"of {len(frac_coords)} sites.")
+    selected = frac_coords[indices - 1]
+    relative = selected - selected[0]
+    relative -= np.round(relative)
+    cart = np.dot(selected[0] + relative, lattice)
+    centroid = cart.mean(axis=0)
+    _, singular_values, vt = np.linalg.svd(cart - centroid)
+    # spread (A) of sites in the plane along its narrower direction
+    if singular_values[1] / np.sqrt(len(cart)) < 1e-3:
+        raise ValueError("sites are collinear or coincident, so no plane is "
+                         "fitted.")
+    normal = vt[-1]
+    rms = singular_values[-1] / np.sqrt(len(cart))
+    # h_i = a_i . n for the normal n = sum h_i b_i (b: reciprocal vectors)
+    hkl = rational_hkl(np.dot(lattice, normal))
+    hkl_normal = np.dot(hkl, np.linalg.inv(lattice).T)
+    d = np.dot(centroid, hkl_normal) / np.linalg.norm(hkl_normal)
+    if abs(d) < 1e-8:
+        hkl, d = canonical_sign([hkl])[0], 0.0
+    elif d < 0:
+        hkl, d = -hkl, -d
+    return hkl.tolist(), float(d), float(rms)
+
+
 def plane_option_parse(cl_args: list, path: Path) -> list:
     current_path = path
     str_args = []
@@ -77,21 +248,92 @@ def plane_option_parse(cl_args: list, path: Path) -> list:
     return str_args
 
 
-def vector_option_parse(arg: str, num_sites: int) -> dict:
+def vector_option_parse(arg: str, num_sites: int) -> VectorSet:
+    if Path(arg).suffix in (".npy", ".npz"):
+        return binary_vector_parse(arg, num_sites)
+    return text_vector_parse(arg, num_sites)
+
+
+def text_vector_parse(arg: str, num_sites: int,
+                      chunk_lines: int = 100000) -> VectorSet:
+    """
+    Load vectors from text file chunk by chunk with numpy.
+    3 columns: vectors of all sites (line number is site index)
+    4 columns: 1-based site index + vector
+    Blank lines, comments after '#' and any whitespace are allowed.
+    """
+    chunks = []
     with open(arg, "r") as vct_file:
-        vectors_list = [vct.strip().split() for vct in vct_file.readlines()]
+        while True:
+            lines = list(itertools.islice(vct_file, chunk_lines))
+            if not lines:
+                break
+            with warnings.catch_warnings():  # chunk of only comments
+                warnings.simplefilter("ignore", UserWarning)
+                try:
+                    values = np.loadtxt(lines, comments="#", ndmin=2)
+                except ValueError:
+                    raise StructureError("The number of columns of vectors "
+                                         "must be the same in all lines.")
+            if values.size == 0:
+                continue
+            if chunks and values.shape[1] != chunks[0].shape[1]:
+                raise StructureError("The number of columns of vectors "
+                                     "must be the same in all lines.")
+            chunks.append(values)
+    if not chunks:
+        raise StructureError(f"No vectors are found in {arg}.")
+    values = np.concatenate(chunks) if len(chunks) > 1 else chunks[0]
+
     # add vectors for all sites
-    if (len(vectors_list) == num_sites) and (len(vectors_list[0]) == 3):
-        vectors_dict = {_i: [float(_) for _ in vct]
-                        for _i, vct in enumerate(vectors_list, 1)}
+    if (len(values) == num_sites) and (values.shape[1] == 3):
+        return VectorSet.from_array(values)
     # add vectors for specified site
-    elif len(vectors_list[0]) == 4:
-        vectors_dict = {int(vct[0]): [float(_) for _ in vct[1:]]
-                        for vct in vectors_list}
+    elif values.shape[1] == 4:
+        indices = values[:, 0].astype(int)
+        if np.any(indices != values[:, 0]) or \
+                indices.min() < 1 or indices.max() > num_sites:
+            raise StructureError("Site indices of vectors are out of range.")
+        return VectorSet(indices, values[:, 1:])
+    raise StructureError("The number of vectors are different from number"
+                         "of atoms.")
+
+
+def binary_vector_parse(arg: str, num_sites: int) -> VectorSet:
+    """
+    Load vectors from numpy binary file.
+    *.npy: (sites x 3) array for all sites, or (n x 4) array of
+           1-based site index + vector. Loaded as memory map (not copied).
+    *.npz: "vectors" (sites x 3) array, or "indices" (n) and
+           "vectors" (n x 3) arrays. Members of npz can not be memory mapped.
+    """
+    if Path(arg).suffix == ".npy":
+        array = np.load(arg, mmap_mode="r")
+        if array.ndim == 2 and array.shape[1] == 4:
+            indices, vectors = array[:, 0], array[:, 1:]
+        else:
+            indices, vectors = None, array
     else:
-        raise StructureError("The number of vectors are different from number"
-                             "of atoms.")
-    return vectors_dict
+        with np.load(arg) as npz:
+            vectors = npz["vectors"]
+            indices = npz["indices"] if "indices" in npz.files else None
+
+    if vectors.ndim != 2 or vectors.shape[1] != 3:
+        raise StructureError("The shape of vectors must be (n x 3).")
+    if indices is None:
+        if len(vectors) != num_sites:
+            raise StructureError("The number of vectors are different from "
+                                 "number of atoms.")
+        return VectorSet(np.arange(1, num_sites + 1), vectors)
+    if len(indices) != len(vectors):
+        raise StructureError("The number of indices and vectors are "
+                             "different.")
+    # index column of (n x 4) float arrays, as text_vector_parse
+    int_indices = np.asarray(indices).astype(int)
+    if np.any(int_indices != indices) or (len(int_indices) and (
+            int_indices.min() < 1 or int_indices.max() > num_sites)):
+        raise StructureError("Site indices of vectors are out of range.")
+    return VectorSet(int_indices, vectors)
 
 
 def centering_atom(atom_at_center: np.ndarray,
@@ -104,6 +346,92 @@ def centering_atom(atom_at_center: np.ndarray,
                      total_shift[2], total_shift[2]])
 
 
+def images_within_sphere(lattice: np.ndarray,
+                          frac_coords: np.ndarray,
+                          center: np.ndarray,
+                          radius: float) -> tuple:
+    """
+    periodic images of sites within radius (A) from center (frac coords)
+    Return:
+        frac coords of images np.ndarray(n x 3), site indices (0-based),
+        distances from center
+    """
+    center = np.asarray(center, dtype=float)
+    relative = frac_coords - center
+    relative -= np.round(relative)
+    reach = np.ceil(radius / perpendicular_widths(lattice)).astype(int) + 1
+    offsets = np.array(list(itertools.product(
+        *[range(-r, r + 1) for r in reach])))
+    images = relative[None, :, :] + offsets[:, None, :]
+    distances = np.linalg.norm(np.dot(images, lattice), axis=2)
+    within = distances <= radius
+    site_indices = np.broadcast_to(np.arange(len(frac_coords)),
+                                   within.shape)
+    return center + images[within], site_indices[within], distances[within]
+
+
+def sphere_boundary(lattice: np.ndarray,
+                    frac_coords: np.ndarray,
+                    center: np.ndarray,
+                    radius: float,
+                    padding: float = 1e-3) -> np.ndarray:
+    """
+    smallest BOUND containing every periodic image of sites within radius
+    (A) from center. Without any site, the box circumscribing the sphere,
+    center +- radius / (distance between opposite faces), is returned.
+    Return:
+        np.ndarray([x_min, x_max, y_min, y_max, z_min, z_max])
+    """
+    images, _, _ = images_within_sphere(lattice, frac_coords, center, radius)
+    if len(images):
+        lower, upper = images.min(axis=0) - padding, \
+            images.max(axis=0) + padding
+    else:
+        half_widths = radius / perpendicular_widths(lattice)
+        lower, upper = center - half_widths, center + half_widths
+    return np.column_stack([lower, upper]).reshape(-1)
+
+
+def shell_radius(lattice: np.ndarray,
+                 frac_coords: np.ndarray,
+                 center: np.ndarray,
+                 num_shells: int,
+                 tolerance: float = 0.01) -> float:
+    """
+    radius (A) reaching the num_shells-th shell of sites around center.
+    Distances within tolerance (A) are the same shell, and the site at
+    the center itself is not counted.
+    """
+    radius = np.cbrt(abs(np.linalg.det(lattice)) / len(frac_coords))
+    while True:
+        _, _, distances = images_within_sphere(lattice, frac_coords,
+                                               center, radius)
+        distances = np.sort(distances[distances > tolerance])
+        if len(distances):
+            # start of a new shell
+            starts = distances[np.concatenate(
+                [[True], np.diff(distances) > tolerance])]
+            if len(starts) > num_shells:
+                return float(starts[num_shells - 1] + tolerance)
+        # only the center or too few shells within radius
+        radius *= 1.5
+
+
+def periodic_centroid(frac_coords: np.ndarray,
+                      site_indices: np.ndarray,
+                      reference: np.ndarray = None) -> np.ndarray:
+    """
+    centroid of sites unwrapped to the minimum images around reference
+    (the first of the sites if None), so that sites across the cell
+    boundary are averaged as one cluster
+    """
+    selected = frac_coords[np.asarray(site_indices)]
+    reference = selected[0] if reference is None else np.asarray(reference)
+    relative = selected - reference
+    relative -= np.round(relative)
+    return reference + relative.mean(axis=0)
+
+
 def boundary_option_preparse(sys_arg: str,
                              base_boundary: list = None) -> np.ndarray:
     base_boundary = base_boundary or [0, 1, 0, 1, 0, 1]
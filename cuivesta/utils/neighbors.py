@@ -0,0 +1,190 @@
+# coding: utf-8
+import itertools
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+class NeighborList:
+    """
+    CSR-style periodic neighbor arrays.
+    Neighbors of site i (0-based) are
+        indices[indptr[i]:indptr[i + 1]] at lattice translations
+        images[indptr[i]:indptr[i + 1]] with distances
+        distances[indptr[i]:indptr[i + 1]]
+    i.e., frac_coords[j] + image is within cutoff from frac_coords[i].
+    """
+
+    def __init__(self,
+                 indptr: np.ndarray,
+                 indices: np.ndarray,
+                 images: np.ndarray,
+                 distances: np.ndarray):
+        self.indptr = indptr
+        self.indices = indices
+        self.images = images
+        self.distances = distances
+
+    @property
+    def num_sites(self) -> int:
+        return len(self.indptr) - 1
+
+    @property
+    def counts(self) -> np.ndarray:
+        """number of neighbors of each site"""
+        return np.diff(self.indptr)
+
+    @property
+    def centers(self) -> np.ndarray:
+        """site index (0-based) of each pair, i.e., row index of CSR"""
+        return np.repeat(np.arange(self.num_sites), self.counts)
+
+    def neighbors_of(self, site: int) -> tuple:
+        """(indices, images, distances) of neighbors of site (0-based)"""
+        s = slice(self.indptr[site], self.indptr[site + 1])
+        return self.indices[s], self.images[s], self.distances[s]
+
+    def filter(self, mask: np.ndarray) -> "NeighborList":
+        """keep pairs where mask (np.ndarray(pairs) of bool) is True"""
+        counts = np.bincount(self.centers[mask], minlength=self.num_sites)
+        indptr = np.concatenate([[0], np.cumsum(counts)])
+        return NeighborList(indptr, self.indices[mask], self.images[mask],
+                            self.distances[mask])
+
+    def __len__(self):
+        return len(self.indices)
+
+
+def perpendicular_widths(lattice: np.ndarray) -> np.ndarray:
+    """distances between opposite faces of the cell (works for skewed cell)"""
+    return 1.0 / np.linalg.norm(np.linalg.inv(lattice), axis=0)
+
+
+def find_neighbors(lattice: np.ndarray,
+                   frac_coords: np.ndarray,
+                   cutoff: float,
+                   chunk_size: int = 65536) -> NeighborList:
+    """
+    Find all periodic neighbors within cutoff by the cell-list method.
+    Sites are binned into a grid of cells not thinner than cutoff, so
+    only neighboring bins (and periodic images of them for small or
+    skewed cells) are searched. Cost is O(sites) at constant density.
+    Args:
+        lattice: np.ndarray(3 x 3), lattice vectors as rows
+        frac_coords: np.ndarray(sites x 3)
+        cutoff: in the unit of lattice (A)
+        chunk_size: number of center sites handled at once (memory bound)
+    Return:
+        NeighborList sorted by center site and neighbor site
+    """
+    lattice = np.asarray(lattice, dtype=float)
+    frac_coords = np.asarray(frac_coords, dtype=float).reshape(-1, 3)
+    num_sites = len(frac_coords)
+    if cutoff <= 0.0 or num_sites == 0:
+        return NeighborList(np.zeros(num_sites + 1, dtype=int),
+                            np.zeros(0, dtype=int),
+                            np.zeros((0, 3), dtype=int), np.zeros(0))
+
+    cell_shifts = np.floor(frac_coords).astype(int)
+    wrapped = frac_coords - cell_shifts
+
+    widths = perpendicular_widths(lattice)
+    max_bins = max(1, int(np.ceil(num_sites ** (1 / 3))))
+    num_bins = np.clip(np.floor(widths / cutoff).astype(int), 1, max_bins)
+    reach = np.ceil(cutoff * num_bins / widths).astype(int)
+
+    bins = np.minimum((wrapped * num_bins).astype(int), num_bins - 1)
+    bin_ids = np.ravel_multi_index(bins.T, num_bins)
+    order = np.argsort(bin_ids, kind="stable")
+    bin_counts = np.bincount(bin_ids, minlength=np.prod(num_bins))
+    bin_starts = np.concatenate([[0], np.cumsum(bin_counts)[:-1]])
+
+    stencil = np.array(list(itertools.product(
+        *[range(-r, r + 1) for r in reach])))
+
+    pairs = []
+    for start in range(0, num_sites, chunk_size):
+        centers = np.arange(start, min(start + chunk_size, num_sites))
+        for offset in stencil:
+            target = bins[centers] + offset
+            image = np.floor_divide(target, num_bins)
+            target_ids = np.ravel_multi_index((target - image * num_bins).T,
+                                              num_bins)
+            counts = bin_counts[target_ids]
+            total = counts.sum()
+            if total == 0:
+                continue
+            i = np.repeat(centers, counts)
+            first = np.repeat(bin_starts[target_ids], counts)
+            within = np.arange(total) - np.repeat(np.cumsum(counts) - counts,
+                                                  counts)
+            j = order[first + within]
+            pair_image = np.repeat(image, counts, axis=0)
+            cart = np.dot(wrapped[j] + pair_image - wrapped[i], lattice)
+            dist2 = np.einsum("ij,ij->i", cart, cart)
+            keep = dist2 <= cutoff ** 2
+            keep &= ~((i == j) & ~pair_image.any(axis=1))
+            i, j = i[keep], j[keep]
+            # images relative to the input (not wrapped) frac_coords
+            pairs.append((i, j,
+                          pair_image[keep] + cell_shifts[i] - cell_shifts[j],
+                          np.sqrt(dist2[keep])))
+
+    i, j, images, distances = (np.concatenate(p) for p in zip(*pairs))
+    sort = np.lexsort((distances, j, i))
+    counts = np.bincount(i, minlength=num_sites)
+    indptr = np.concatenate([[0], np.cumsum(counts)])
+    return NeighborList(indptr, j[sort], images[sort], distances[sort])
+
+
+def bonded_neighbors(lattice: np.ndarray,
+                     frac_coords: np.ndarray,
+                     species: List[str],
+                     bond_lengths: Dict[tuple, Tuple[float, float]]
+                     ) -> NeighborList:
+    """
+    Neighbors within the (min, max) length of their species pair, found by
+    one neighbor search with the longest max length. Pairs are symmetric,
+    i.e., ('Ti', 'O') also gives O-Ti neighbors.
+    Args:
+        species: species strings of sites, e.g., ['Ba', 'Ti', 'O', ..]
+        bond_lengths: {('Ti', 'O'): (min, max), ..}
+    """
+    unique_species, codes = np.unique(species, return_inverse=True)
+    code_of = {specie: code for code, specie in enumerate(unique_species)}
+    num_species = len(unique_species)
+    # (min, max) for species codes, -1 as max means no bond
+    min_lengths = np.zeros((num_species, num_species))
+    max_lengths = np.full((num_species, num_species), -1.0)
+    for (a, b), lengths in bond_lengths.items():
+        if a not in code_of or b not in code_of:
+            continue
+        for i, j in [(code_of[a], code_of[b]), (code_of[b], code_of[a])]:
+            min_lengths[i, j], max_lengths[i, j] = lengths
+
+    neighbors = find_neighbors(lattice, frac_coords, max_lengths.max())
+    ci = codes[neighbors.centers]
+    cj = codes[neighbors.indices]
+    return neighbors.filter(
+        (neighbors.distances >= min_lengths[ci, cj])
+        & (neighbors.distances <= max_lengths[ci, cj]))
+
+
+def species_pairs_within(lattice: np.ndarray,
+                         frac_coords: np.ndarray,
+                         species: List[str],
+                         bond_lengths: Dict[tuple, Tuple[float, float]]
+                         ) -> set:
+    """
+    Species pairs which have at least one distance within their range.
+    Args:
+        species: species strings of sites, e.g., ['Ba', 'Ti', 'O', ..]
+        bond_lengths: {('Ti', 'O'): (min, max), ..}
+    Return:
+        keys of bond_lengths found in the structure, e.g., {('Ti', 'O')}
+    """
+    neighbors = bonded_neighbors(lattice, frac_coords, species, bond_lengths)
+    species = np.asarray(species)
+    found = set(zip(species[neighbors.centers].tolist(),
+                    species[neighbors.indices].tolist()))
+    return {pair for pair in bond_lengths if pair in found}
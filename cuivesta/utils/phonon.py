@@ -0,0 +1,139 @@
+# coding: utf-8
+import re
+from typing import List, Optional
+
+import numpy as np
+
+from pymatgen.core.structure import StructureError
+
+from cuivesta.utils.vector_set import fractional_vectors
+
+# e.g., "      - [ -0.06902225155747, -0.00000000000000 ]"
+eigenvector_row = re.compile(r"^\s*- \[\s*(\S+),\s*(\S+)\s*\]")
+# e.g., "- q-position: [    0.0000000,    0.0000000,    0.0000000 ]"
+q_position_row = re.compile(r"^- q-position:\s*\[(.*)\]")
+
+
+def parse_phonon_yaml(filename: str,
+                      qpoint: Optional[int] = None,
+                      modes: Optional[List[int]] = None) -> dict:
+    """
+    Read eigenvectors at one q-point from phonopy band.yaml or qpoints.yaml.
+    The file is streamed line by line and only the requested q-point and
+    modes are stored, so large files are never loaded as python dict.
+    Args:
+        filename: band.yaml or qpoints.yaml written with eigenvectors
+        qpoint: 1-based index of q-point. None means the first Gamma point.
+        modes: 1-based indices of modes. None means all modes.
+    Return:
+        {"q_position": np.ndarray(3), "modes": [1, 2, ..],
+         "frequencies": np.ndarray(modes),
+         "eigenvectors": complex np.ndarray(modes x natom x 3)}
+    """
+    natom = None
+    q_index = 0
+    q_position = None
+    band_index = 0
+    frequencies = {}
+    rows = {}
+    with open(filename, "r") as yaml_file:
+        for line in yaml_file:
+            if natom is None and line.startswith("natom:"):
+                natom = int(line.split()[1])
+                continue
+            q_match = q_position_row.match(line)
+            if q_match:
+                if q_position is not None:
+                    break  # target q-point has been read
+                q_index += 1
+                position = np.array(q_match.group(1).split(","), dtype=float)
+                if (qpoint == q_index) or \
+                        (qpoint is None and not np.any(position)):
+                    q_position = position
+                continue
+            if q_position is None:
+                continue
+            stripped = line.lstrip()
+            if stripped.startswith("frequency:"):
+                band_index += 1
+                if modes is None or band_index in modes:
+                    frequencies[band_index] = float(stripped.split()[1])
+                    rows[band_index] = []
+                continue
+            if band_index in rows:
+                row_match = eigenvector_row.match(line)
+                if row_match:
+                    rows[band_index].append(row_match.groups())
+
+    if q_position is None:
+        raise ValueError(f"q-point is not found in {filename}.")
+    if not rows or any(not row for row in rows.values()):
+        raise ValueError(f"eigenvectors are not found in {filename}.")
+    missing = sorted(set(modes or []) - set(rows))
+    if missing:
+        raise ValueError(f"modes {missing} are not found in {filename}.")
+
+    selected = sorted(rows)
+    values = np.array([rows[mode] for mode in selected], dtype=float)
+    eigenvectors = (values[..., 0] + 1j * values[..., 1]).reshape(
+        len(selected), natom or -1, 3)
+    return {"q_position": q_position,
+            "modes": selected,
+            "frequencies": np.array([frequencies[m] for m in selected]),
+            "eigenvectors": eigenvectors}
+
+
+def bloch_eigenvectors(eigenvectors: np.ndarray,
+                       frac_coords: np.ndarray,
+                       q_position: np.ndarray,
+                       translations: np.ndarray) -> np.ndarray:
+    """
+    Eigenvectors on the images of sites at lattice translations (site-major
+    as supercells), multiplied by the phase exp(2 pi i q.r) of the image
+    position r as phonopy modulations.
+    Args:
+        eigenvectors: complex np.ndarray(modes x natom x 3)
+        frac_coords: np.ndarray(natom x 3)
+        q_position: q-point in reciprocal coords of the cell
+        translations: np.ndarray(images x 3) of int in fractional coords
+    Return:
+        complex np.ndarray(modes x (natom x images) x 3)
+    """
+    positions = frac_coords[:, None, :] + translations[None, :, :]
+    phases = np.exp(2j * np.pi * np.dot(positions, q_position))
+    return (eigenvectors[:, :, None, :] * phases[None, :, :, None]).reshape(
+        len(eigenvectors), -1, 3)
+
+
+def mode_displacement_vectors(eigenvectors: np.ndarray,
+                              masses: np.ndarray,
+                              lattice: np.ndarray,
+                              tolerance: float = 1e-8) -> np.ndarray:
+    """
+    Convert mass-weighted eigenvectors to displacements in fractional
+    coords (see fractional_vectors). Each mode is multiplied by the global
+    phase maximizing the norm of its real part, which is then taken, as
+    phonopy modulations fix the phase. The longest displacement of each
+    mode is normalized to 1 A, and modes whose real parts are all shorter
+    than tolerance are zero.
+    Args:
+        eigenvectors: complex np.ndarray(modes x natom x 3), cartesian
+        masses: np.ndarray(natom)
+        lattice: np.ndarray(3 x 3) of the cell of eigenvectors
+    Return:
+        np.ndarray(modes x natom x 3)
+    """
+    if eigenvectors.shape[1] != len(masses):
+        raise StructureError("The number of atoms are different between "
+                             "structure and eigenvectors.")
+    displacements = eigenvectors / np.sqrt(masses)[None, :, None]
+    # |Re(u exp(i t))|^2 = (|u|^2 + Re(exp(2 i t) sum u^2)) / 2
+    phases = np.exp(-0.5j * np.angle(np.sum(displacements ** 2,
+                                            axis=(1, 2))))
+    displacements = (displacements * phases[:, None, None]).real
+    max_norms = np.linalg.norm(displacements, axis=2).max(axis=1)
+    zero = max_norms < tolerance
+    displacements[zero] = 0.0
+    max_norms[zero] = 1.0
+    return fractional_vectors(displacements / max_norms[:, None, None],
+                              lattice)
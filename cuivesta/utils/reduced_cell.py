@@ -0,0 +1,147 @@
+# coding: utf-8
+import itertools
+from typing import List, Tuple
+
+import numpy as np
+
+from pymatgen.core.lattice import Lattice
+from pymatgen.core.structure import Structure
+
+from cuivesta.utils.func_tools import rational_hkl
+from cuivesta.utils.neighbors import find_neighbors
+from cuivesta.utils.symmetry import symmetry_analyzer
+
+
+def pure_translations(s: Structure, symprec: float = 0.01) -> np.ndarray:
+    """
+    translations of symmetry operations without rotation, i.e., lattice
+    points of the primitive cell inside the cell of s (including 0)
+    """
+    operations = symmetry_analyzer(s, symprec).get_symmetry_operations()
+    translations = np.array([op.translation_vector for op in operations
+                             if np.allclose(op.rotation_matrix, np.eye(3))])
+    return translations - np.floor(translations + 1e-8)
+
+
+def translation_basis(translations: np.ndarray) -> np.ndarray:
+    """
+    basis of the lattice generated by unit vectors and translations, by
+    integer row reduction of them in units of 1 / (number of translations)
+    Return:
+        np.ndarray(3 x 3), rows in fractional coords
+    """
+    denominator = len(translations)
+    rows = np.rint(np.vstack([np.eye(3), translations])
+                   * denominator).astype(int)
+    basis = []
+    for column in range(3):
+        while np.count_nonzero(rows[:, column]) > 1:
+            nonzero = np.nonzero(rows[:, column])[0]
+            pivot = nonzero[np.argmin(np.abs(rows[nonzero, column]))]
+            others = nonzero[nonzero != pivot]
+            rows[others] -= np.outer(rows[others, column]
+                                     // rows[pivot, column], rows[pivot])
+        pivot = np.nonzero(rows[:, column])[0][0]
+        basis.append(rows[pivot])
+        rows = np.delete(rows, pivot, axis=0)
+    return np.array(basis) / denominator
+
+
+def niggli_matrix(lattice: np.ndarray) -> np.ndarray:
+    """integer matrix M with M @ lattice = Niggli-reduced lattice"""
+    reduced = Lattice(lattice).get_niggli_reduced_lattice().matrix
+    return np.rint(np.dot(reduced, np.linalg.inv(lattice))).astype(int)
+
+
+def reduction_matrix(s: Structure, method: str = "primitive",
+                     symprec: float = 0.01) -> np.ndarray:
+    """
+    M with the reduced lattice = M @ s.lattice.matrix
+    Args:
+        method: "primitive" for the Niggli-reduced primitive cell found by
+                the (cached) symmetry analysis, "niggli" for the
+                Niggli-reduced cell of the same sites
+    """
+    matrix = np.eye(3)
+    if method == "primitive":
+        matrix = translation_basis(pure_translations(s, symprec))
+    elif method != "niggli":
+        raise ValueError(f"{method} is neither primitive nor niggli.")
+    lattice = np.dot(matrix, s.lattice.matrix)
+    matrix = np.dot(niggli_matrix(lattice), matrix)
+    # lattice vectors along the old ones (right-handed) where possible
+    largest = matrix[np.arange(3), np.argmax(np.abs(matrix), axis=1)]
+    matrix *= np.sign(largest)[:, None]
+    if np.linalg.det(matrix) < 0:
+        matrix[2] *= -1
+    return matrix + 0.0  # no -0.0
+
+
+def reduce_structure(s: Structure, matrix: np.ndarray,
+                     symprec: float = 0.01) -> Tuple[Structure, np.ndarray]:
+    """
+    Structure of the reduced cell (lattice = M @ s.lattice.matrix).
+    Return:
+        reduced structure, np.ndarray(sites) of bool of the kept sites
+    """
+    lattice = np.dot(matrix, s.lattice.matrix)
+    frac_coords, kept = reduce_arrays(lattice, s.frac_coords, matrix,
+                                      [site.species_string for site in s],
+                                      symprec)
+    species = [site.species for site in s]
+    reduced = Structure(lattice, [species[i] for i in np.nonzero(kept)[0]],
+                        frac_coords)
+    return reduced, kept
+
+
+def reduce_arrays(lattice: np.ndarray,
+                  frac_coords: np.ndarray,
+                  matrix: np.ndarray,
+                  species: List[str],
+                  symprec: float = 0.01) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sites in the reduced cell: frac coords transformed and wrapped into
+    the cell, and images of the same site, i.e., sites of the same species
+    within symprec (A) of each other in the reduced cell, are merged to
+    the first one of them.
+    Args:
+        lattice: the reduced lattice, M @ old lattice
+    Return:
+        frac coords of the kept sites in the reduced cell,
+        np.ndarray(sites) of bool of the kept sites
+    """
+    new_frac_coords = np.dot(frac_coords, np.linalg.inv(matrix))
+    new_frac_coords -= np.floor(new_frac_coords)
+    neighbors = find_neighbors(lattice, new_frac_coords, symprec)
+    species = np.asarray(species)
+    same = species[neighbors.centers] == species[neighbors.indices]
+    first = np.arange(len(frac_coords))
+    np.minimum.at(first, neighbors.centers[same], neighbors.indices[same])
+    kept = first == np.arange(len(frac_coords))
+    # number of reduced cells in the old cell
+    num_cells = 1 / abs(np.linalg.det(matrix))
+    if not np.isclose(len(frac_coords), kept.sum() * num_cells, atol=0.5) \
+            or np.any(~kept[first]):
+        raise ValueError("sites are not mapped onto the reduced cell.")
+    return new_frac_coords[kept], kept
+
+
+def transform_boundary(boundary: np.ndarray,
+                       matrix: np.ndarray) -> np.ndarray:
+    """
+    the smallest BOUND in the transformed cell (lattice = M @ lattice)
+    containing the box of boundary in the old cell
+    """
+    lower, upper = np.asarray(boundary, dtype=float).reshape(3, 2).T
+    corners = np.array(list(itertools.product(*zip(lower, upper))))
+    new_corners = np.dot(corners, np.linalg.inv(matrix))
+    return np.column_stack([new_corners.min(axis=0),
+                            new_corners.max(axis=0)]).reshape(-1)
+
+
+def transform_hkl(hkl: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    """
+    the same plane in the transformed cell: h.x = h.(x' M) = (M h).x'
+    reduced to small integers
+    """
+    return rational_hkl(np.dot(matrix, hkl))
@@ -0,0 +1,296 @@
+# coding: utf-8
+import operator
+import re
+from typing import Callable, List
+
+import numpy as np
+
+from pymatgen.core.structure import Structure
+
+from cuivesta.utils.func_tools import images_within_sphere
+from cuivesta.utils.neighbors import find_neighbors
+
+token_pattern = re.compile(
+    r"\s*(?:"
+    r"(?P<point>[-+]?\d*\.?\d+,[-+]?\d*\.?\d+,[-+]?\d*\.?\d+)"
+    r"|(?P<range>\d+:\d+)"
+    r"|(?P<number>[-+]?\d*\.\d+|[-+]?\d+\.?)"
+    r"|(?P<op><=|>=|==|!=|<|>)"
+    r"|(?P<paren>[()])"
+    r"|(?P<name>[A-Za-z_][A-Za-z0-9_+]*))")
+
+keywords = {"and", "or", "not", "all", "none", "species", "index",
+            "within", "of", "x", "y", "z"}
+
+comparisons = {"<": operator.lt, "<=": operator.le, ">": operator.gt,
+               ">=": operator.ge, "==": operator.eq, "!=": operator.ne}
+
+# fractional coords closer than this are regarded as equal in comparisons
+coord_tolerance = 1e-4
+
+
+class SelectionContext:
+    """arrays of structure on which selections are evaluated"""
+
+    def __init__(self, lattice: np.ndarray, frac_coords: np.ndarray,
+                 species: List[str]):
+        self.lattice = np.asarray(lattice, dtype=float)
+        self.frac_coords = np.asarray(frac_coords, dtype=float)
+        self.species = np.asarray(species)
+
+    @classmethod
+    def from_structure(cls, s: Structure) -> "SelectionContext":
+        return cls(s.lattice.matrix, s.frac_coords,
+                   [site.species_string for site in s])
+
+    @property
+    def num_sites(self) -> int:
+        return len(self.frac_coords)
+
+
+def tokenize(text: str) -> List[tuple]:
+    """[(kind, value), ..] of selection text"""
+    tokens = []
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = token_pattern.match(text, position)
+        if match is None or match.end() == position:
+            raise ValueError(f"cannot parse selection at "
+                             f"'{text[position:]}'.")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+class Selection:
+    """
+    Selection of sites compiled once and evaluated to a boolean mask over
+    all sites at once.
+    e.g., "species O and within 5.0 of 64", "index 1:100", "z > 0.5",
+          "Ti or (O and not x < 0.5)", "12 15 O", "within 3 of 0.5,0.5,0.5"
+    Indices are 1-based, ranges are inclusive and "0" is the last site as
+    --centering. x, y and z are fractional coords compared within
+    coord_tolerance. Terms without operator between them are joined by
+    "or". Indices out of range and species not in the structure are errors.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.position = 0
+        self.evaluate = self._parse_or()
+        if self.position != len(self.tokens):
+            raise ValueError(f"unexpected '{self._peek()[1]}' in "
+                             f"selection '{text}'.")
+
+    def mask(self, context: SelectionContext) -> np.ndarray:
+        """np.ndarray(sites) of bool"""
+        return self.evaluate(context)
+
+    def indices(self, context: SelectionContext) -> np.ndarray:
+        """0-based indices of selected sites"""
+        return np.nonzero(self.mask(context))[0]
+
+    # recursive descent parser, each rule returns f(context) -> mask
+    def _peek(self) -> tuple:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None, None
+
+    def _next(self) -> tuple:
+        token = self._peek()
+        if token[0] is None:
+            raise ValueError(f"selection '{self.text}' ends unexpectedly.")
+        self.position += 1
+        return token
+
+    def _expect(self, value: str):
+        if self._next()[1] != value:
+            raise ValueError(f"'{value}' is expected in selection "
+                             f"'{self.text}'.")
+
+    def _starts_term(self) -> bool:
+        kind, value = self._peek()
+        if kind is None or value in ("and", "or", ")"):
+            return False
+        return kind in ("name", "number", "range", "paren", "point")
+
+    def _parse_or(self) -> Callable:
+        terms = [self._parse_and()]
+        while self._peek()[1] == "or" or self._starts_term():
+            if self._peek()[1] == "or":
+                self._next()
+            terms.append(self._parse_and())
+        if len(terms) == 1:
+            return terms[0]
+        return lambda c: np.logical_or.reduce([term(c) for term in terms])
+
+    def _parse_and(self) -> Callable:
+        terms = [self._parse_not()]
+        while self._peek()[1] == "and":
+            self._next()
+            terms.append(self._parse_not())
+        if len(terms) == 1:
+            return terms[0]
+        return lambda c: np.logical_and.reduce([term(c) for term in terms])
+
+    def _parse_not(self) -> Callable:
+        if self._peek()[1] == "not":
+            self._next()
+            term = self._parse_not()
+            return lambda c: ~term(c)
+        return self._parse_atom()
+
+    def _parse_atom(self) -> Callable:
+        kind, value = self._next()
+        if value == "(":
+            term = self._parse_or()
+            self._expect(")")
+            return term
+        if value == "all":
+            return lambda c: np.ones(c.num_sites, dtype=bool)
+        if value == "none":
+            return lambda c: np.zeros(c.num_sites, dtype=bool)
+        if value == "species":
+            return self._species_mask(self._names())
+        if value == "index":
+            return self._index_mask(self._indices())
+        if value == "within":
+            return self._parse_within()
+        if value in ("x", "y", "z"):
+            axis = "xyz".index(value)
+            op_kind, op = self._next()
+            if op_kind != "op":
+                raise ValueError(f"comparison is expected after {value}.")
+            threshold = float(self._next()[1])
+            return lambda c: compare_coords(c.frac_coords[:, axis], op,
+                                            threshold)
+        if kind in ("number", "range"):
+            self.position -= 1
+            return self._index_mask(self._indices())
+        if kind == "name" and value not in keywords:
+            self.position -= 1
+            return self._species_mask(self._names())
+        raise ValueError(f"unexpected '{value}' in selection '{self.text}'.")
+
+    def _names(self) -> List[str]:
+        names = []
+        while self._peek()[0] == "name" and self._peek()[1] not in keywords:
+            names.append(self._next()[1])
+        if not names:
+            raise ValueError(f"species is expected in '{self.text}'.")
+        return names
+
+    def _indices(self) -> List[tuple]:
+        """1-based inclusive (start, end) ranges"""
+        ranges = []
+        while self._peek()[0] in ("number", "range"):
+            value = self._next()[1]
+            if ":" in value:
+                start, end = value.split(":")
+                ranges.append((int(start), int(end)))
+            else:
+                if not value.isdigit():
+                    raise ValueError(f"index {value} is not integer.")
+                ranges.append((int(value), int(value)))
+        return ranges
+
+    def _parse_within(self) -> Callable:
+        radius = float(self._next()[1])
+        self._expect("of")
+        if self._peek()[0] == "point":
+            point = np.array(self._next()[1].split(","), dtype=float)
+            return lambda c: within_of_point(c, radius, point)
+        target = self._parse_atom()
+        return lambda c: within_of_mask(c, radius, target(c))
+
+    @staticmethod
+    def _species_mask(names: List[str]) -> Callable:
+        def species_mask(c):
+            unknown = sorted(set(names) - set(c.species))
+            if unknown:
+                raise ValueError(f"species {' '.join(unknown)} are not "
+                                 f"found in {' '.join(np.unique(c.species))}.")
+            return np.isin(c.species, names)
+        return species_mask
+
+    @staticmethod
+    def _index_mask(ranges: List[tuple]) -> Callable:
+        def index_mask(c):
+            indices = np.arange(1, c.num_sites + 1)
+            mask = np.zeros(c.num_sites, dtype=bool)
+            for start, end in ranges:
+                if start == end == 0:  # the last site as --centering
+                    mask[-1] = True
+                    continue
+                if not 1 <= start <= end <= c.num_sites:
+                    raise ValueError(f"index {start}:{end} is out of range "
+                                     f"of {c.num_sites} sites.")
+                mask |= (indices >= start) & (indices <= end)
+            return mask
+        return index_mask
+
+
+def compare_coords(values: np.ndarray, op: str,
+                   threshold: float) -> np.ndarray:
+    """comparison of frac coords, equal within coord_tolerance"""
+    close = np.isclose(values, threshold, rtol=0, atol=coord_tolerance)
+    if op == "==":
+        return close
+    if op == "!=":
+        return ~close
+    if op in ("<=", ">="):
+        return comparisons[op](values, threshold) | close
+    return comparisons[op](values, threshold) & ~close
+
+
+def within_of_mask(context: SelectionContext, radius: float,
+                   target: np.ndarray) -> np.ndarray:
+    """sites within radius (A) from any target site (including targets)"""
+    neighbors = find_neighbors(context.lattice, context.frac_coords, radius)
+    mask = target.copy()
+    mask[neighbors.indices[target[neighbors.centers]]] = True
+    return mask
+
+
+def within_of_point(context: SelectionContext, radius: float,
+                    point: np.ndarray) -> np.ndarray:
+    """sites with any periodic image within radius (A) from point"""
+    _, site_indices, _ = images_within_sphere(
+        context.lattice, context.frac_coords, point, radius)
+    mask = np.zeros(context.num_sites, dtype=bool)
+    mask[site_indices] = True
+    return mask
+
+
+def selection_mask(s: Structure, text: str) -> np.ndarray:
+    """np.ndarray(sites) of bool of sites selected by text"""
+    return Selection(text).mask(SelectionContext.from_structure(s))
+
+
+# kept next to Selection: func_tools cannot import this module, which
+# imports images_within_sphere from func_tools
+def select_sites(s: Structure, tokens: List[str],
+                 radius: float = None) -> np.ndarray:
+    """
+    Select sites by selection tokens joined with spaces, e.g., ['2', 'O'],
+    ['species O and z > 0.5'], or points in fractional coords (e.g.,
+    '0.5,0.5,0.5'). With radius (A), sites within radius from the points
+    (or from the first selected site without points) are selected instead.
+    Return:
+        0-based indices of selected sites, sorted
+    """
+    text = " ".join(tokens)
+    context = SelectionContext.from_structure(s)
+    points = [value for kind, value in tokenize(text) if kind == "point"]
+    if radius is not None and points:
+        text = " or ".join(f"within {radius} of {point}" for point in points)
+    elif radius is not None:
+        first = Selection(text).indices(context)[:1] + 1
+        text = f"within {radius} of index {' '.join(map(str, first))}"
+    selected = Selection(text).indices(context)
+    if len(selected) == 0:
+        raise ValueError("no site is selected.")
+    return selected
@@ -0,0 +1,108 @@
+# coding: utf-8
+import itertools
+from typing import Optional, Tuple
+
+import numpy as np
+
+from pymatgen.core.structure import Structure
+
+from cuivesta.utils.vector_set import VectorSet, transform_vectors
+
+
+def parse_supercell_matrix(text: str) -> np.ndarray:
+    """
+    e.g., "3x3x2" or "3 3 2" for diagonal, "2" for 2x2x2, and
+    "1 -1 0 1 1 0 0 0 1" (or comma separated) for general matrix whose
+    rows are the new lattice vectors in units of the old ones
+    Return:
+        np.ndarray(3 x 3) of int
+    """
+    values = [int(_) for _ in text.replace("x", " ").replace(",", " ").split()]
+    if len(values) == 1:
+        matrix = np.eye(3, dtype=int) * values[0]
+    elif len(values) == 3:
+        matrix = np.diag(values)
+    elif len(values) == 9:
+        matrix = np.array(values).reshape(3, 3)
+    else:
+        raise ValueError(f"{text} is neither 1, 3 nor 9 integers.")
+    if round(np.linalg.det(matrix)) == 0:
+        raise ValueError(f"supercell matrix {text} is singular.")
+    return matrix
+
+
+def lattice_translations(matrix: np.ndarray) -> np.ndarray:
+    """
+    lattice points of the old cell inside the new cell
+    Return:
+        np.ndarray(|det| x 3) of int in the old fractional coords
+    """
+    matrix = np.asarray(matrix)
+    corners = np.dot(np.array(list(itertools.product([0, 1], repeat=3))),
+                     matrix)
+    ranges = [np.arange(lower, upper + 1) for lower, upper
+              in zip(corners.min(axis=0), corners.max(axis=0))]
+    candidates = np.array(list(itertools.product(*ranges)))
+    frac = np.dot(candidates, np.linalg.inv(matrix))
+    inside = np.all((frac > -1e-8) & (frac < 1 - 1e-8), axis=1)
+    translations = candidates[inside]
+    if len(translations) != abs(round(np.linalg.det(matrix))):
+        raise ValueError("lattice points in the supercell are not found.")
+    return translations
+
+
+def supercell_arrays(lattice: np.ndarray,
+                     frac_coords: np.ndarray,
+                     matrix: np.ndarray
+                     ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Tile sites over the supercell whose lattice is matrix @ lattice.
+    Images of a site are consecutive (site-major) as pymatgen supercells.
+    Return:
+        lattice, frac coords of the supercell,
+        0-based index of the original site of each new site
+    """
+    translations = lattice_translations(matrix)
+    images = frac_coords[:, None, :] + translations[None, :, :]
+    new_frac_coords = np.dot(images.reshape(-1, 3), np.linalg.inv(matrix))
+    site_map = np.repeat(np.arange(len(frac_coords)), len(translations))
+    return np.dot(matrix, lattice), new_frac_coords, site_map
+
+
+def supercell_frames(frames: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    """frac coords of frames (frames x sites x 3) tiled as supercell_arrays"""
+    translations = lattice_translations(matrix)
+    images = frames[:, :, None, :] + translations[None, None, :, :]
+    return np.dot(images.reshape(len(frames), -1, 3), np.linalg.inv(matrix))
+
+
+def tile_vectors(vectors: VectorSet, matrix: np.ndarray,
+                 image_vectors: Optional[np.ndarray] = None) -> VectorSet:
+    """
+    vectors on every image of their sites in the supercell (fractional
+    coords of the supercell, see transform_vectors)
+    Args:
+        image_vectors: np.ndarray((sites x images) x 3) of vectors of each
+                       image instead of the copies, e.g., phonon
+                       displacements with Bloch phases
+    """
+    tiled = vectors.tile(int(round(abs(np.linalg.det(matrix)))))
+    tiled_vectors = tiled.vectors if image_vectors is None \
+        else image_vectors[tiled.indices - 1]
+    return VectorSet(tiled.indices, transform_vectors(tiled_vectors, matrix),
+                     tiled.types)
+
+
+def make_supercell(s: Structure,
+                   matrix: np.ndarray) -> Tuple[Structure, np.ndarray]:
+    """
+    Supercell built from the tiled arrays in one Structure construction.
+    Return:
+        supercell, 0-based index of the original site of each new site
+    """
+    lattice, frac_coords, site_map = supercell_arrays(s.lattice.matrix,
+                                                      s.frac_coords, matrix)
+    species = [site.species for site in s]
+    supercell = Structure(lattice, [species[i] for i in site_map],
+                          frac_coords)
+    return supercell, site_map
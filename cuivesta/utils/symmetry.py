@@ -0,0 +1,126 @@
+# coding: utf-8
+from typing import List
+
+import numpy as np
+
+from pymatgen.core.structure import Structure
+from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
+
+from cuivesta.utils.neighbors import find_neighbors
+
+# {(structure key, symprec): SpacegroupAnalyzer}
+_analyzer_cache = {}
+
+
+def structure_key(s: Structure) -> tuple:
+    """hashable key of lattice, species and positions of structure"""
+    return (np.round(s.lattice.matrix, 6).tobytes(),
+            tuple(site.species_string for site in s),
+            np.round(s.frac_coords, 6).tobytes())
+
+
+def symmetry_analyzer(s: Structure,
+                      symprec: float = 0.01) -> SpacegroupAnalyzer:
+    """SpacegroupAnalyzer analyzed once per structure and symprec"""
+    key = (structure_key(s), symprec)
+    if key not in _analyzer_cache:
+        _analyzer_cache[key] = SpacegroupAnalyzer(s, symprec=symprec)
+    return _analyzer_cache[key]
+
+
+def frac_rotations(s: Structure, symprec: float = 0.01) -> np.ndarray:
+    """rotation parts of space group operations in fractional coords"""
+    operations = symmetry_analyzer(s, symprec).get_symmetry_operations()
+    return np.array([op.rotation_matrix for op in operations])
+
+
+def canonical_sign(hkls: np.ndarray) -> np.ndarray:
+    """flip rows so that the first nonzero index is positive"""
+    hkls = np.asarray(hkls)
+    first = hkls[np.arange(len(hkls)), np.argmax(hkls != 0, axis=1)]
+    return np.where(first[:, None] < 0, -hkls, hkls)
+
+
+def equivalent_hkls(s: Structure, hkl: List[int],
+                    symprec: float = 0.01) -> np.ndarray:
+    """
+    symmetry-equivalent planes of hkl, i.e., the family {hkl}.
+    hkl and -hkl are the same family member.
+    Return:
+        np.ndarray(n x 3) of int sorted in descending order
+    """
+    rotations = frac_rotations(s, symprec)
+    # planes are covariant: h' = h R for all R in the group
+    hkls = np.rint(np.einsum("j,njk->nk", hkl, rotations)).astype(int)
+    hkls = np.unique(canonical_sign(hkls), axis=0)
+    return hkls[np.lexsort(hkls.T[::-1])[::-1]]
+
+
+def site_symmetry_operations(s: Structure, center: np.ndarray,
+                             symprec: float = 0.01,
+                             tolerance: float = 0.1) -> tuple:
+    """
+    operations of the space group of s fixing center (frac coords) up to
+    lattice translations, i.e., the point group around center
+    Return:
+        rotations np.ndarray(n x 3 x 3), translations np.ndarray(n x 3)
+    """
+    operations = symmetry_analyzer(s, symprec).get_symmetry_operations()
+    rotations = np.array([op.rotation_matrix for op in operations])
+    translations = np.array([op.translation_vector for op in operations])
+    if center is None:
+        return rotations, translations
+    center = np.asarray(center, dtype=float)
+    shifts = np.einsum("njk,k->nj", rotations, center) + translations \
+        - center
+    shifts -= np.round(shifts)
+    fixed = np.linalg.norm(np.dot(shifts, s.lattice.matrix), axis=1) \
+        < tolerance
+    return rotations[fixed], translations[fixed]
+
+
+def site_permutations(lattice: np.ndarray,
+                      frac_coords: np.ndarray,
+                      species: List[str],
+                      rotations: np.ndarray,
+                      translations: np.ndarray,
+                      tolerance: float = 0.1) -> np.ndarray:
+    """
+    Site mapped by each operation, found for all operations at once by
+    one neighbor search between sites and their mapped positions.
+    Return:
+        np.ndarray(operations x sites) of 0-based index (-1 if not found)
+    """
+    num_sites = len(frac_coords)
+    mapped = np.einsum("njk,sk->nsj", rotations, frac_coords) \
+        + translations[:, None, :]
+    neighbors = find_neighbors(lattice,
+                               np.vstack([frac_coords,
+                                          mapped.reshape(-1, 3)]),
+                               tolerance)
+    centers, indices = neighbors.centers, neighbors.indices
+    species = np.asarray(species)
+    pair = (centers < num_sites) & (indices >= num_sites)
+    centers, images = centers[pair], indices[pair] - num_sites
+    same = species[centers] == species[images % num_sites]
+    permutations = np.full((len(rotations), num_sites), -1)
+    permutations[images[same] // num_sites,
+                 images[same] % num_sites] = centers[same]
+    return permutations
+
+
+def site_orbits(s: Structure, center: np.ndarray = None,
+                symprec: float = 0.01, tolerance: float = 0.1) -> np.ndarray:
+    """
+    Orbits of sites under the point group around center (frac coords),
+    or under the space group if center is None.
+    Return:
+        np.ndarray(sites) of the smallest 0-based index in the orbit
+    """
+    rotations, translations = site_symmetry_operations(s, center, symprec,
+                                                       tolerance)
+    permutations = site_permutations(
+        s.lattice.matrix, s.frac_coords, [site.species_string for site in s],
+        rotations, translations, tolerance)
+    sites = np.arange(len(s))
+    return np.where(permutations >= 0, permutations, sites).min(axis=0)
@@ -0,0 +1,238 @@
+# coding: utf-8
+import re
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from pymatgen.core.structure import Structure
+
+chunk_size = 1 << 20  # 1 MB
+
+
+def rfind_in_file(file, pattern: bytes, end: Optional[int] = None) -> int:
+    """
+    Search pattern backward from the end (or the given offset) of a binary
+    file by reading fixed-size chunks, so only the tail is read.
+    Return:
+        offset of the last pattern found before end, or -1
+    """
+    if end is None:
+        file.seek(0, 2)
+        end = file.tell()
+    overlap = len(pattern) - 1
+    position = end
+    tail = b""
+    while position > 0:
+        start = max(0, position - chunk_size)
+        file.seek(start)
+        chunk = file.read(position - start) + tail
+        found = chunk.rfind(pattern)
+        if found >= 0:
+            return start + found
+        tail = chunk[:overlap]
+        position = start
+    return -1
+
+
+def read_until(file, start: int, pattern: bytes) -> bytes:
+    """read binary file forward from start until pattern is found"""
+    file.seek(start)
+    buffer = b""
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            return buffer
+        search_from = max(0, len(buffer) - len(pattern))
+        buffer += chunk
+        found = buffer.find(pattern, search_from)
+        if found >= 0:
+            return buffer[:found]
+
+
+def is_outcar(filename) -> bool:
+    return "OUTCAR" in Path(filename).name
+
+
+def is_vasprun(filename) -> bool:
+    name = Path(filename).name
+    return "vasprun" in name and ".xml" in name
+
+
+# e.g., "<rc><c>Mg</c><c>   1</c></rc>" in <array name="atoms" >
+atom_row = re.compile(rb"<rc><c>\s*([^<\s]+)\s*</c><c>\s*\d+\s*</c></rc>")
+# e.g., "   VRHFIN =Mg: s2p0"
+vrhfin_row = re.compile(rb"VRHFIN\s*=\s*([A-Za-z]+)\s*:")
+
+
+def _v_rows_to_array(text: bytes) -> np.ndarray:
+    """ '<v> x y z </v>' rows -> np.ndarray(rows x 3) """
+    values = text.replace(b"<v>", b" ").replace(b"</v>", b" ").split()
+    return np.array(values, dtype=float).reshape(-1, 3)
+
+
+def _tail_block_offset(file, pattern: bytes, ionic_step: int) -> int:
+    """offset of ionic_step-th (negative, -1: last) block from the end"""
+    offset = None
+    for _ in range(-ionic_step):
+        offset = rfind_in_file(file, pattern, offset)
+        if offset < 0:
+            raise ValueError(f"ionic step {ionic_step} is not found.")
+    return offset
+
+
+def vasprun_forces(filename, ionic_step: int = -1) -> np.ndarray:
+    """
+    Read forces of one ionic step in vasprun.xml without building its DOM.
+    Args:
+        ionic_step: 1-based index from the beginning, or negative index
+                    from the end (-1: final step).
+                    Negative steps are found by seeking from the file end,
+                    positive steps by incremental (iterparse) reading.
+    Return:
+        np.ndarray(sites x 3) in eV/A
+    """
+    if ionic_step < 0:
+        with open(filename, "rb") as file:
+            offset = _tail_block_offset(file, b'<varray name="forces"',
+                                        ionic_step)
+            block = read_until(file, offset, b"</varray>")
+        return _v_rows_to_array(block[block.index(b">") + 1:])
+
+    if ionic_step == 0:
+        raise ValueError("ionic step is 1-based index.")
+    count = 0
+    context = ET.iterparse(str(filename), events=("start", "end"))
+    _, root = next(context)
+    for event, elem in context:
+        if event != "end":
+            continue
+        if elem.tag == "varray" and elem.get("name") == "forces":
+            count += 1
+            if count == ionic_step:
+                return np.array([v.text.split() for v in elem], dtype=float)
+        elif elem.tag == "calculation":
+            root.clear()  # drop parsed ionic steps
+    raise ValueError(f"ionic step {ionic_step} is not found.")
+
+
+def outcar_forces(filename, ionic_step: int = -1) -> np.ndarray:
+    """
+    Read forces of one ionic step in OUTCAR.
+    Args:
+        ionic_step: 1-based index from the beginning, or negative index
+                    from the end (-1: final step)
+    Return:
+        np.ndarray(sites x 3) in eV/A
+    """
+    return _outcar_position_force_block(filename, ionic_step)[:, 3:]
+
+
+def _outcar_position_force_block(filename, ionic_step: int) -> np.ndarray:
+    """ 'POSITION ... TOTAL-FORCE' block as np.ndarray(sites x 6) """
+    pattern = b"TOTAL-FORCE"
+    with open(filename, "rb") as file:
+        if ionic_step < 0:
+            offset = _tail_block_offset(file, pattern, ionic_step)
+        elif ionic_step > 0:
+            count = 0
+            offset = 0
+            for line in file:
+                if pattern in line:
+                    count += 1
+                    if count == ionic_step:
+                        break
+                offset += len(line)
+            else:
+                raise ValueError(f"ionic step {ionic_step} is not found.")
+        else:
+            raise ValueError("ionic step is 1-based index.")
+        # header line, dashes line, rows.., dashes line
+        file.seek(offset)
+        file.readline()
+        file.readline()
+        block = read_until(file, file.tell(), b" ---")
+    return np.array(block.split(), dtype=float).reshape(-1, 6)
+
+
+def forces_from_file(filename, ionic_step: int = -1) -> np.ndarray:
+    """read forces from vasprun.xml or OUTCAR"""
+    if is_outcar(filename):
+        return outcar_forces(filename, ionic_step)
+    if is_vasprun(filename):
+        return vasprun_forces(filename, ionic_step)
+    raise ValueError(f"{filename} is neither vasprun.xml nor OUTCAR.")
+
+
+def vasprun_final_structure_arrays(filename) -> dict:
+    """
+    Read the last structure in vasprun.xml by seeking from the file end.
+    Species are read from <atominfo> at the head of the file.
+    Return:
+        {"lattice": np.ndarray(3 x 3), "species": [..],
+         "frac_coords": np.ndarray(sites x 3)}
+    """
+    with open(filename, "rb") as file:
+        atominfo = read_until(file, 0, b"</atominfo>")
+        offset = rfind_in_file(file, b"<structure")
+        if offset < 0:
+            raise ValueError(f"structure is not found in {filename}.")
+        block = read_until(file, offset, b"</structure>")
+    species = [m.decode() for m in atom_row.findall(atominfo)]
+    return {"lattice": _named_varray(block, b"basis"),
+            "species": species,
+            "frac_coords": _named_varray(block, b"positions")}
+
+
+def _named_varray(block: bytes, name: bytes) -> np.ndarray:
+    start = block.index(b'<varray name="' + name + b'"')
+    start = block.index(b">", start) + 1
+    return _v_rows_to_array(block[start:block.index(b"</varray>", start)])
+
+
+def outcar_final_structure_arrays(filename) -> dict:
+    """
+    Read the last ionic positions in OUTCAR by seeking from the file end.
+    Lattice is the last 'direct lattice vectors' printed before them and
+    species are read from the head of the file.
+    Return:
+        {"lattice": np.ndarray(3 x 3), "species": [..],
+         "frac_coords": np.ndarray(sites x 3)}
+    """
+    with open(filename, "rb") as file:
+        head = read_until(file, 0, b"ions per type")
+        file.seek(len(head))
+        num_per_type = file.readline().split(b"=")[-1].split()
+        force_offset = rfind_in_file(file, b"TOTAL-FORCE")
+        lattice_offset = rfind_in_file(file, b"direct lattice vectors",
+                                       force_offset)
+        if force_offset < 0 or lattice_offset < 0:
+            raise ValueError(f"positions are not found in {filename}.")
+        file.seek(lattice_offset)
+        file.readline()
+        lattice = np.array([file.readline().split()[:3] for _ in range(3)],
+                           dtype=float)
+    cart_coords = _outcar_position_force_block(filename, -1)[:, :3]
+    types = [m.decode() for m in vrhfin_row.findall(head)]
+    species = [specie for specie, num in zip(types, num_per_type)
+               for _ in range(int(num))]
+    return {"lattice": lattice,
+            "species": species,
+            "frac_coords": np.linalg.solve(lattice.T, cart_coords.T).T}
+
+
+def structure_from_file(filename) -> Structure:
+    """
+    Read structure. The final structure of vasprun.xml or OUTCAR is read
+    by seeking from the file end instead of parsing all ionic steps.
+    Other files are read by Structure.from_file.
+    """
+    if is_vasprun(filename):
+        arrays = vasprun_final_structure_arrays(filename)
+    elif is_outcar(filename):
+        arrays = outcar_final_structure_arrays(filename)
+    else:
+        return Structure.from_file(filename)
+    return Structure(arrays["lattice"], arrays["species"],
+                     arrays["frac_coords"])
@@ -0,0 +1,254 @@
+# coding: utf-8
+from typing import Union, Optional, List, Tuple
+
+import numpy as np
+
+from cuivesta.options import vector_palette
+
+
+class VectorSet:
+    """
+    Array-backed set of vectors attached to sites.
+    e.g., indices = [1, 3], vectors = [[0.0, 0.0, 0.1], [0.1, 0.0, 0.0]]
+    means {1: [0.0, 0.0, 0.1], 3: [0.1, 0.0, 0.0]}
+    """
+
+    def __init__(self, indices: np.ndarray, vectors: np.ndarray,
+                 types: Optional[np.ndarray] = None):
+        """
+        Args:
+            indices: 1-based site indices, np.ndarray(n)
+            vectors: np.ndarray(n x 3). float arrays (also np.memmap)
+                     are kept without copy.
+            types: 1-based indices of shared vector types (VECTT),
+                   np.ndarray(n). None means one type per vector.
+        """
+        self.indices = np.asarray(indices, dtype=int).reshape(-1)
+        self.vectors = np.asarray(vectors, dtype=float).reshape(-1, 3)
+        if len(self.indices) != len(self.vectors):
+            raise ValueError("number of indices and vectors are different")
+        self.types = None
+        if types is not None:
+            self.types = np.asarray(types, dtype=int).reshape(-1)
+            if len(self.types) != len(self.indices):
+                raise ValueError("number of types and vectors are different")
+
+    def with_types(self, types: Optional[np.ndarray]) -> "VectorSet":
+        return VectorSet(self.indices, self.vectors, types)
+
+    @classmethod
+    def from_array(cls, vectors: np.ndarray) -> "VectorSet":
+        """vectors of all sites: np.ndarray(sites x 3)"""
+        return cls(np.arange(1, len(vectors) + 1), vectors)
+
+    @classmethod
+    def from_dict(cls, vectors_dict: dict) -> "VectorSet":
+        """ e.g., {1: [x.xx, x.xx, x.xx], 2: [..], ..} """
+        return cls(np.fromiter(vectors_dict.keys(), dtype=int,
+                               count=len(vectors_dict)),
+                   np.array(list(vectors_dict.values()), dtype=float))
+
+    @classmethod
+    def empty(cls) -> "VectorSet":
+        return cls(np.zeros(0, dtype=int), np.zeros((0, 3)))
+
+    def to_dict(self) -> dict:
+        return {index: vector for index, vector
+                in zip(self.indices.tolist(), self.vectors.tolist())}
+
+    @property
+    def norms(self) -> np.ndarray:
+        return np.linalg.norm(self.vectors, axis=1)
+
+    def filter(self, mask: np.ndarray) -> "VectorSet":
+        """keep vectors where mask (np.ndarray(n) of bool) is True"""
+        types = None if self.types is None else self.types[mask]
+        return VectorSet(self.indices[mask], self.vectors[mask], types)
+
+    def select(self, site_indices) -> "VectorSet":
+        """keep vectors at the given 1-based site indices"""
+        return self.filter(np.isin(self.indices, site_indices))
+
+    def take_sites(self, site_mask: np.ndarray) -> "VectorSet":
+        """
+        keep vectors at sites where site_mask (np.ndarray(sites) of bool)
+        is True, and renumber indices to those among the kept sites
+        """
+        kept = self.filter(site_mask[self.indices - 1])
+        new_indices = np.cumsum(site_mask)[kept.indices - 1]
+        return VectorSet(new_indices, kept.vectors, kept.types)
+
+    def tile(self, num_images: int) -> "VectorSet":
+        """
+        copy vectors to num_images consecutive sites replacing each site,
+        i.e., site-major images of supercells
+        """
+        indices = ((self.indices[:, None] - 1) * num_images
+                   + np.arange(num_images)).reshape(-1) + 1
+        types = None if self.types is None \
+            else np.repeat(self.types, num_images)
+        return VectorSet(indices, np.repeat(self.vectors, num_images, axis=0),
+                         types)
+
+    def scale(self, factor: Union[float, np.ndarray]) -> "VectorSet":
+        """multiply vectors by scalar or by np.ndarray(n) of factors"""
+        factor = np.asarray(factor, dtype=float)
+        if factor.ndim == 1:
+            factor = factor[:, None]
+        return VectorSet(self.indices, self.vectors * factor, self.types)
+
+    def merge(self, other: "VectorSet") -> "VectorSet":
+        """
+        union sorted by index, vectors of other win at the same site.
+        types are kept only when both have types.
+        """
+        indices = np.concatenate([other.indices, self.indices])
+        vectors = np.concatenate([other.vectors, self.vectors])
+        # np.unique returns first occurrence, i.e., that of other
+        unique_indices, first = np.unique(indices, return_index=True)
+        types = None
+        if self.types is not None and other.types is not None:
+            types = np.concatenate([other.types, self.types])[first]
+        return VectorSet(unique_indices, vectors[first], types)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __iter__(self):
+        return zip(self.indices.tolist(), self.vectors)
+
+    def __eq__(self, other):
+        if not isinstance(other, VectorSet):
+            return NotImplemented
+        same_types = (self.types is None and other.types is None) or \
+            (self.types is not None and other.types is not None
+             and np.array_equal(self.types, other.types))
+        return (np.array_equal(self.indices, other.indices)
+                and np.array_equal(self.vectors, other.vectors)
+                and same_types)
+
+    def __repr__(self):
+        return f"VectorSet({self.to_dict()})"
+
+
+# Components of VECTR written by cuivesta are displacements in fractional
+# coords, i.e., in units of the lattice vectors, as structure_diff_vectors.
+# Cartesian sources (forces, phonon modes, defect displacements) are
+# converted by fractional_vectors, and vectors of transformed cells
+# (supercell, reduced cell) by transform_vectors.
+def fractional_vectors(cartesian: np.ndarray,
+                       lattice: np.ndarray) -> np.ndarray:
+    """cartesian vectors (n x 3) in fractional coords of lattice"""
+    return np.dot(cartesian, np.linalg.inv(lattice))
+
+
+def transform_vectors(vectors: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    """
+    fractional vectors (n x 3) of a cell in fractional coords of the cell
+    whose lattice is matrix @ lattice, keeping the cartesian vectors
+    """
+    return np.dot(vectors, np.linalg.inv(matrix))
+
+
+def _palette_color(index: int) -> str:
+    return vector_palette[index % len(vector_palette)]
+
+
+def magnitude_classes(vectors: VectorSet,
+                      num_bins: int = 4,
+                      size: float = 0.5
+                      ) -> Tuple[VectorSet, List[Tuple[float, str]]]:
+    """
+    Group vectors into shared types by bins of their norms.
+    Longer bins are drawn thicker: sizes run from size/2 to size*3/2.
+    Return:
+        VectorSet with types, styles (size, color) of each type
+    """
+    norms = vectors.norms
+    max_norm = norms.max() if len(norms) else 0.0
+    if max_norm > 0.0:
+        types = np.minimum((norms / max_norm * num_bins).astype(int),
+                           num_bins - 1) + 1
+    else:
+        types = np.ones(len(norms), dtype=int)
+    sizes = size * np.linspace(0.5, 1.5, num_bins) if num_bins > 1 \
+        else np.array([size])
+    styles = [(round(float(sizes[i]), 6), _palette_color(i))
+              for i in range(num_bins)]
+    return vectors.with_types(types), styles
+
+
+def species_classes(vectors: VectorSet,
+                    species: List[str],
+                    size: float = 0.5
+                    ) -> Tuple[VectorSet, List[Tuple[float, str]]]:
+    """
+    Group vectors into shared types by species of the sites.
+    Args:
+        species: species strings of all sites, e.g., ['Ba', 'Ti', 'O', ..]
+    Return:
+        VectorSet with types, styles (size, color) of each type
+    """
+    site_species = np.asarray(species)[vectors.indices - 1]
+    unique_species, types = np.unique(site_species, return_inverse=True)
+    styles = [(size, _palette_color(i)) for i in range(len(unique_species))]
+    return vectors.with_types(types + 1), styles
+
+
+def orbit_representatives(vectors: VectorSet,
+                          orbits: np.ndarray) -> VectorSet:
+    """
+    keep the first vector of each orbit
+    Args:
+        orbits: orbit labels of all sites, np.ndarray(sites)
+    """
+    _, first = np.unique(orbits[vectors.indices - 1], return_index=True)
+    keep = np.zeros(len(vectors), dtype=bool)
+    keep[first] = True
+    return vectors.filter(keep)
+
+
+def orbit_classes(vectors: VectorSet,
+                  orbits: np.ndarray,
+                  size: float = 0.5
+                  ) -> Tuple[VectorSet, List[Tuple[float, str]]]:
+    """
+    Group vectors into shared types by symmetry orbits of the sites.
+    Args:
+        orbits: orbit labels of all sites, np.ndarray(sites)
+    Return:
+        VectorSet with types, styles (size, color) of each type
+    """
+    _, types = np.unique(orbits[vectors.indices - 1], return_inverse=True)
+    return vectors.with_types(types + 1), type_styles(types.max() + 1
+                                                      if len(types) else 0,
+                                                      size)
+
+
+def type_styles(num_types: int,
+                size: float = 0.5) -> List[Tuple[float, str]]:
+    """styles (size, color) of num_types vector types in palette order"""
+    return [(size, _palette_color(i)) for i in range(num_types)]
+
+
+def overlay_vectors(layers: List[VectorSet],
+                    size: float = 0.5
+                    ) -> Tuple[VectorSet, List[Tuple[float, str]]]:
+    """
+    Stack vector fields of several sources into one VectorSet.
+    Each source becomes one vector type with its own color, and vectors
+    are normalized together so that the longest one of each source is 1.
+    Return:
+        VectorSet with types, styles (size, color) of each type
+    """
+    lengths = [len(layer) for layer in layers]
+    types = np.repeat(np.arange(1, len(layers) + 1), lengths)
+    indices = np.concatenate([layer.indices for layer in layers])
+    vectors = np.concatenate([layer.vectors for layer in layers])
+    norms = np.linalg.norm(vectors, axis=1)
+    max_norms = np.zeros(len(layers) + 1)
+    np.maximum.at(max_norms, types, norms)
+    max_norms[max_norms == 0.0] = 1.0
+    styles = [(size, _palette_color(i)) for i in range(len(layers))]
+    return VectorSet(indices, vectors / max_norms[types][:, None],
+                     types), styles